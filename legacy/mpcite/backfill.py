@@ -0,0 +1,165 @@
+"""
+Multiprocess record generation for large backfills.
+
+Rebuilding every record (for example after a change to the title or keyword
+templates) is dominated by record construction and XML serialization, which
+`DOIBuilder.process_item` does serially. Here that work is spread over a process
+pool instead:
+
+- every worker builds its own DOIBuilder from the parent's config, and therefore
+  holds its own Mongo clients
+- workers return shards of records already serialized to E-Link XML
+- the parent hands shards to the pool and submits them in order as they are built,
+  with at most `max_pending_shards` shards in flight (queued, being built or waiting
+  for submission) at a time, so a slow E-Link stalls the workers instead of piling up
+  payloads in the parent
+- a shard that cannot be built is counted and logged, and the others go on
+"""
+import collections
+import logging
+import multiprocessing
+from multiprocessing.pool import AsyncResult
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from mpcite.models import ELinkGetResponseModel
+from mpcite.utility import ELinkAdapter
+
+logger = logging.getLogger(__name__)
+
+# builder owned by the current worker process, set up by _init_worker
+_worker_builder = None
+
+
+def _init_worker(builder_config: dict):
+    global _worker_builder
+    from mpcite.doi_builder import DOIBuilder
+
+    _worker_builder = DOIBuilder.from_dict(builder_config)
+    _worker_builder.connect()
+
+
+ShardResult = Tuple[Dict[str, str], bytes, Dict[str, str]]
+
+
+def build_shard(mp_ids: List[str]) -> ShardResult:
+    """
+    Construct and serialize the E-Link records of one shard. Runs in a worker process.
+
+    Args:
+        mp_ids: materials ids of this shard
+
+    Returns:
+        (mp_id -> fingerprint of the serialized records, E-Link XML payload,
+         mp_id -> error for ids that failed)
+    """
+    records: List[dict] = []
+    errors: Dict[str, str] = dict()
+    for mp_id in mp_ids:
+        try:
+            elink_record = _worker_builder.generate_elink_model(mp_id=mp_id)
+            records.append(
+                ELinkGetResponseModel.custom_to_dict(elink_record=elink_record)
+            )
+        except Exception as e:
+            errors[mp_id] = str(e)
+    data = ELinkAdapter.prep_posting_data(records) if len(records) > 0 else b""
+    fingerprints = {
+        r["accession_num"]: ELinkGetResponseModel.get_fingerprint(r) for r in records
+    }
+    return fingerprints, data, errors
+
+
+def run_backfill(
+    builder,
+    mp_ids: List[str],
+    num_workers: Optional[int] = None,
+    shard_size: int = 100,
+    max_pending_shards: Optional[int] = None,
+    build: Callable[[List[str]], ShardResult] = build_shard,
+) -> Dict[str, int]:
+    """
+    Rebuild and submit the records of `mp_ids` using a pool of worker processes.
+
+    Args:
+        builder: DOIBuilder that submits the shards. Workers are built from its config.
+        mp_ids: materials ids to rebuild
+        num_workers: number of worker processes, defaults to the number of CPUs
+        shard_size: number of records per worker task and per E-Link POST
+        max_pending_shards: bound on shards in flight, defaults to twice the number of workers
+        build: function the workers run on every shard, must be importable by them
+
+    Returns:
+        counts of shards, records submitted, records that failed to build, shards that
+        failed to build and shards that failed to submit
+    """
+    num_workers = num_workers or multiprocessing.cpu_count()
+    max_pending_shards = max_pending_shards or 2 * num_workers
+    counts = {
+        "shards": 0,
+        "submitted": 0,
+        "build_errors": 0,
+        "shard_errors": 0,
+        "submit_errors": 0,
+    }
+    builder.log_info_msg(
+        f"Backfilling [{len(mp_ids)}] records in shards of {shard_size} "
+        f"using {num_workers} workers"
+    )
+    tracker = builder.progress.tracker("backfill", total=len(mp_ids))
+
+    def submit_shard(shard: List[str], result: AsyncResult):
+        counts["shards"] += 1
+        try:
+            fingerprints, data, errors = result.get()
+        except Exception as e:
+            counts["shard_errors"] += 1
+            builder.has_error = True
+            builder.log_err_msg(f"Cannot build shard starting at [{shard[0]}]: {e}")
+            tracker.update(len(shard))
+            return
+        counts["build_errors"] += len(errors)
+        tracker.update(len(fingerprints) + len(errors), nbytes=len(data))
+        for mp_id, error in errors.items():
+            logger.error(f"Cannot build record for [{mp_id}]: {error}")
+        if len(fingerprints) == 0:
+            return
+        builder.report.records_submitted += len(fingerprints)
+        builder.report.payload_bytes += len(data)
+        builder.report.elink_requests += 1
+        if builder.dry_run:
+            return
+        try:
+            builder.submit_elink_data(data=data, fingerprints=fingerprints)
+            counts["submitted"] += len(fingerprints)
+        except Exception as e:
+            counts["submit_errors"] += 1
+            builder.has_error = True
+            builder.log_err_msg(
+                f"Failed to POST shard starting at [{next(iter(fingerprints))}]: {e}"
+            )
+
+    # spawn rather than fork, so no worker inherits the parent's Mongo clients
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(
+        processes=num_workers, initializer=_init_worker, initargs=(builder.as_dict(),)
+    ) as pool:
+        # shards are only handed to the pool from this thread, once an earlier one was
+        # submitted, so an error or an interrupt never leaves the pool waiting on us
+        pending: Deque[Tuple[List[str], AsyncResult]] = collections.deque()
+        for i in range(0, len(mp_ids), shard_size):
+            if len(pending) >= max_pending_shards:
+                submit_shard(*pending.popleft())
+            shard = mp_ids[i : i + shard_size]
+            pending.append((shard, pool.apply_async(build, (shard,))))
+        while len(pending) > 0:
+            submit_shard(*pending.popleft())
+    tracker.close()
+    builder.log_info_msg(
+        f"Backfill done. Submitted [{counts['submitted']}] records in "
+        f"[{counts['shards']}] shards. [{counts['build_errors']}] records and "
+        f"[{counts['shard_errors']}] shards failed to build, "
+        f"[{counts['submit_errors']}] shards failed to submit"
+    )
+    for line in builder.report.summary_lines():
+        builder.log_info_msg(line)
+    return counts
@@ -0,0 +1,186 @@
+"""
+Streaming parser for the bibtex that OSTI Explorer exports.
+
+OSTI writes one `@type{osti_<id>,` entry after another, with one `key = {value},` field
+per line, where values are braced (possibly with nested braces and newlines), quoted,
+plain numbers, or empty (`key = ,`). This module parses exactly that format and yields
+entries one at a time, in the same shape as bibtexparser v1 (lower case field names,
+`ENTRYTYPE` and `ID`). Any entry that does not fit the format is handed to bibtexparser
+instead, so the result is the same as bibtexparser's, only faster.
+"""
+import logging
+import re
+from typing import Collection, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_ENTRY_START = re.compile(r"^@", re.MULTILINE)
+_HEADER = re.compile(r"@\s*(\w+)\s*\{\s*([^,\s]+)\s*,")
+_KEY = re.compile(r"\s*([A-Za-z][\w\-:.]*)\s*=\s*")
+_NUMBER = re.compile(r"\d+")
+_SEPARATOR = re.compile(r"\s*,?\s*")
+_BRACE = re.compile(r"[{}]|\\[{}]")
+_QUOTE = re.compile(r'[{}"]|\\[{}"]')
+
+
+class MalformedEntryError(ValueError):
+    pass
+
+
+def iter_bibtex_entries(
+    data: str, fields: Optional[Collection[str]] = None
+) -> Iterator[Dict[str, str]]:
+    """
+    Parse entries one by one
+
+    Args:
+        data: bibtex text, as returned by OSTI Explorer
+        fields: lower case names of the fields to extract, None for all fields.
+            ENTRYTYPE and ID are always extracted.
+
+    Returns:
+        iterator of entries
+    """
+    pos = 0
+    while True:
+        start = _ENTRY_START.search(data, pos)
+        if start is None:
+            return
+        try:
+            entry, pos = parse_entry(data, start.start(), fields=fields)
+            yield entry
+        except MalformedEntryError as e:
+            # hand everything up to the next line starting with "@" to bibtexparser
+            logger.debug(f"Falling back to bibtexparser: {e}")
+            following = _ENTRY_START.search(data, start.start() + 1)
+            pos = len(data) if following is None else following.start()
+            yield from _fallback(data[start.start() : pos], fields=fields)
+
+
+def parse_entry(
+    text: str, pos: int = 0, fields: Optional[Collection[str]] = None
+) -> Tuple[Dict[str, str], int]:
+    """
+    Parse a single entry in OSTI's format
+
+    Args:
+        text: bibtex text
+        pos: position of the "@" starting the entry
+        fields: lower case names of the fields to extract, None for all fields
+
+    Returns:
+        the entry, and the position right after it
+
+    Raises:
+        MalformedEntryError if the entry is not in OSTI's format
+    """
+    header = _HEADER.match(text, pos)
+    if header is None:
+        raise MalformedEntryError("cannot parse entry header")
+    entry = {"ENTRYTYPE": header.group(1).lower(), "ID": header.group(2)}
+    pos = header.end()
+    n = len(text)
+    while True:
+        pos = _SEPARATOR.match(text, pos).end()
+        if pos >= n:
+            raise MalformedEntryError(f"unterminated entry {entry['ID']}")
+        if text[pos] == "}":
+            return entry, pos + 1
+        key_match = _KEY.match(text, pos)
+        if key_match is None:
+            raise MalformedEntryError(f"cannot parse field of {entry['ID']}")
+        key = key_match.group(1).lower()
+        pos = key_match.end()
+        char = text[pos] if pos < n else ""
+        if char == "{":
+            value_end = _closing_brace(text, pos)
+            value = text[pos + 1 : value_end]
+            pos = value_end + 1
+        elif char == '"':
+            value_end = _closing_quote(text, pos)
+            value = text[pos + 1 : value_end]
+            pos = value_end + 1
+        elif char == "," or char == "\n":
+            # empty field, e.g. "journal = ,", which is dropped
+            continue
+        else:
+            number = _NUMBER.match(text, pos)
+            if number is None:
+                raise MalformedEntryError(f"unsupported value of {key}")
+            value = number.group(0)
+            pos = number.end()
+        rest = text[pos : pos + 16].lstrip(" \t")
+        if rest[:1] not in (",", "}", "\n", "\r"):
+            # string concatenation or other syntax this parser does not handle
+            raise MalformedEntryError(f"unsupported value of {key}")
+        if fields is None or key in fields:
+            entry[key] = value
+
+
+def dumps_entry(entry: Dict[str, str]) -> str:
+    """
+    Write a single entry exactly like bibtexparser.dumps does with its default writer,
+    i.e. with fields sorted alphabetically and one space of indentation
+
+    Args:
+        entry: entry as returned by iter_bibtex_entries
+
+    Returns:
+        bibtex string
+    """
+    fields = sorted(k for k in entry if k not in ("ENTRYTYPE", "ID"))
+    return (
+        "@"
+        + entry["ENTRYTYPE"]
+        + "{"
+        + entry["ID"]
+        + "".join(",\n " + k + " = {" + entry[k] + "}" for k in fields)
+        + "\n}\n"
+    )
+
+
+def _closing_brace(text: str, pos: int) -> int:
+    depth = 0
+    for match in _BRACE.finditer(text, pos):
+        char = match.group(0)
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return match.start()
+        else:
+            # escaped brace, bibtexparser decides how to treat those
+            raise MalformedEntryError("escaped brace")
+    raise MalformedEntryError("unbalanced braces")
+
+
+def _closing_quote(text: str, pos: int) -> int:
+    depth = 0
+    for match in _QUOTE.finditer(text, pos + 1):
+        char = match.group(0)
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+        elif char == '"' and depth == 0:
+            return match.start()
+        elif char != '"':
+            raise MalformedEntryError("escaped quote or brace")
+    raise MalformedEntryError("unterminated quote")
+
+
+def _fallback(
+    text: str, fields: Optional[Collection[str]] = None
+) -> Iterator[Dict[str, str]]:
+    import bibtexparser
+
+    text = "\n".join(line for line in text.splitlines() if "= ," not in line)
+    for entry in bibtexparser.loads(text).entries:
+        if fields is not None:
+            entry = {
+                k: v
+                for k, v in entry.items()
+                if k in fields or k in ("ENTRYTYPE", "ID")
+            }
+        yield entry
@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+
+from maggma.stores import Store
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread safe LRU cache with an optional time to live, keeping hit and miss statistics
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 10000,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            maxsize: maximum number of entries, the least recently used ones are evicted
+            ttl: seconds after which an entry expires, None to never expire
+            clock: time source
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = _MISSING) -> Any:
+        with self._lock:
+            entry = self._data.get(key, None)
+            if entry is not None and (
+                self.ttl is None or self.clock() - entry[1] < self.ttl
+            ):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (value, self.clock())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class StoreLookup:
+    """
+    Look up documents of a Store by its key, through an LRUCache if one is given.
+    Documents that do not exist are cached as well.
+    """
+
+    def __init__(self, store: Store, cache: Optional[LRUCache] = None):
+        self.store = store
+        self.cache = cache
+
+    def get(self, key_value: Hashable) -> Optional[dict]:
+        """
+        Args:
+            key_value: value of store.key of the document to find
+
+        Returns:
+            the document, or None if it does not exist
+        """
+        if self.cache is None:
+            return self.store.query_one(criteria={self.store.key: key_value})
+        doc = self.cache.get(key_value)
+        if doc is _MISSING:
+            doc = self.store.query_one(criteria={self.store.key: key_value})
+            self.cache.put(key_value, doc)
+        return doc
+
+    def prime(self, docs: Iterable[dict]):
+        """
+        Put documents that were read or written in bulk into the cache
+
+        Args:
+            docs: documents of the store
+        """
+        if self.cache is None:
+            return
+        for doc in docs:
+            self.cache.put(doc[self.store.key], doc)
+
+    def stats(self) -> Optional[Dict[str, int]]:
+        return None if self.cache is None else self.cache.stats()
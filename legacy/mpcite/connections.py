@@ -0,0 +1,110 @@
+"""
+Stores built from the builder config, sharing one MongoClient per server.
+
+Deserializing every store of the config with MontyDecoder imports its class dynamically
+and does not check anything until the store is first used, and every MongoStore then
+opens a client and a connection pool of its own, even when all of them live on the same
+cluster. `store_from_dict` builds MongoStores directly, checks that their config is
+complete, and hands them a collection of the client that `MongoClientRegistry` keeps for
+their server and credentials. Other stores, e.g. MemoryStores in tests, still go through
+MontyDecoder.
+
+The registry is mp_cite.clients.MongoClients, so the clients are the same as those of
+mp_cite: every client has the registry's pool options, e.g. from the mongo_pool config
+of the builder, and reports to its PoolMetrics. The registry owns the clients: closing
+an attached store only lets go of its collection, and the clients are closed by closing
+the registry, see DOIBuilder.finalize.
+
+The stores serialize exactly as before, so config files do not change.
+"""
+import json
+from typing import Optional
+
+from maggma.core import Store
+from maggma.stores import MongoStore
+from mp_cite.clients import MongoClients, PoolOptions
+from pymongo import MongoClient
+from pymongo.collection import Collection
+
+
+class MongoClientRegistry(MongoClients):
+    def __init__(self, options: PoolOptions = PoolOptions()):
+        """
+        Args:
+            options: pool options of every client
+        """
+        super().__init__()
+        self.options = options
+
+    def client(self, store: MongoStore) -> MongoClient:
+        """
+        Returns:
+            the client for the server and credentials of `store`, created on first use
+        """
+        if store.uri is not None:
+            return self.get(store.uri, self.options, **store.mongoclient_kwargs)
+        if store.username != "":
+            return self.get(
+                store.host,
+                self.options,
+                port=store.port,
+                username=store.username,
+                password=store.password,
+                authSource=store.auth_source,
+                **store.mongoclient_kwargs,
+            )
+        return self.get(
+            store.host, self.options, port=store.port, **store.mongoclient_kwargs
+        )
+
+    def collection(self, store: MongoStore) -> Collection:
+        """
+        Returns:
+            the collection of `store`, through the shared client of its server
+        """
+        return self.client(store)[store.database][store.collection_name]
+
+    def attach(self, store: MongoStore):
+        """
+        Connect `store` through the shared client of its server. The store reconnects
+        through the registry, and closing it leaves the client open.
+        """
+
+        def connect(force_reset: bool = False):
+            if store._coll is None or force_reset:
+                store._coll = self.collection(store)
+
+        def close():
+            store._coll = None
+
+        store.connect = connect
+        store.close = close
+        connect(force_reset=True)
+
+
+def store_from_dict(d: dict, registry: Optional[MongoClientRegistry] = None) -> Store:
+    """
+    Build a store from its serialized form, e.g. MongoStore.as_dict()
+
+    Args:
+        d: serialized store
+        registry: clients to share between MongoStores, None for a client per store
+
+    Returns:
+        the store, connected through the registry if it is a MongoStore
+    """
+    if d.get("@class", None) != "MongoStore" or d.get("ssh_tunnel", None) is not None:
+        from monty.json import MontyDecoder
+
+        return json.loads(json.dumps(d), cls=MontyDecoder)
+    params = {k: v for k, v in d.items() if not k.startswith("@")}
+    if not params.get("collection_name", None):
+        raise ValueError(f"MongoStore config without collection_name: {params}")
+    if not params.get("database", None) and params.get("uri", None) is None:
+        raise ValueError(
+            f"MongoStore config of [{params['collection_name']}] without database"
+        )
+    store = MongoStore(**params)
+    if registry is not None:
+        registry.attach(store)
+    return store
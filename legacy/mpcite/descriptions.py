@@ -0,0 +1,79 @@
+"""
+Content-addressed store of material descriptions.
+
+Most robocrys descriptions, and the default description of materials without one, are
+shared by many materials, yet each DOI record used to carry its own copy inside its
+bibtex. Descriptions are stored here once, keyed by the hash of their text, and DOI
+records only keep the hash in `description_hash`. Comparing a record with the current
+robocrys description then starts with comparing two hashes.
+
+Hashes are computed on whitespace normalized text, so the copy of a description that
+comes back from OSTI Explorer, reflowed, hashes the same as the one that was submitted.
+"""
+import hashlib
+from typing import Dict, Iterable, List, Set
+
+from maggma.core import Store
+
+# E-Link abstract character limit
+DESCRIPTION_LIMIT = 12000
+
+
+def description_hash(description: str) -> str:
+    return hashlib.sha256(" ".join(description.split()).encode()).hexdigest()
+
+
+class DescriptionStore:
+    def __init__(self, store: Store):
+        """
+        Args:
+            store: store of the descriptions, keyed by description_hash
+        """
+        self.store = store
+        # hashes known to be in the store, most runs see the same few descriptions
+        self._known: Set[str] = set()
+
+    def put_many(self, descriptions: Iterable[str]) -> List[str]:
+        """
+        Store descriptions that are not stored yet
+
+        Args:
+            descriptions: description texts
+
+        Returns:
+            hash of every description, in order
+        """
+        by_hash: Dict[str, str] = dict()
+        hashes = []
+        for description in descriptions:
+            h = description_hash(description)
+            hashes.append(h)
+            if h not in self._known:
+                by_hash.setdefault(h, description)
+        if len(by_hash) > 0:
+            existing = self.store.distinct(
+                self.store.key, criteria={self.store.key: {"$in": list(by_hash)}}
+            )
+            self._known.update(existing)
+            new = [
+                {self.store.key: h, "description": text, "length": len(text)}
+                for h, text in by_hash.items()
+                if h not in self._known
+            ]
+            if len(new) > 0:
+                self.store.update(new)
+            self._known.update(by_hash)
+        return hashes
+
+    def get_many(self, hashes: Iterable[str]) -> Dict[str, str]:
+        """
+        Returns:
+            description_hash -> description, for the hashes that are stored
+        """
+        return {
+            doc[self.store.key]: doc["description"]
+            for doc in self.store.query(
+                criteria={self.store.key: {"$in": list(set(hashes))}},
+                properties=[self.store.key, "description"],
+            )
+        }
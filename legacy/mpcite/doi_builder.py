@@ -1,26 +1,49 @@
 from maggma.core.builder import Builder
+from maggma.utils import grouper
 from typing import Iterable, List
 from mpcite.utility import ELinkAdapter, ExplorerAdapter
+from mpcite.backfill import run_backfill
+from mpcite.cache import LRUCache, StoreLookup
+from mpcite.bibtex import dumps_entry
+from mpcite.watcher import MaterialsWatcher
+from mpcite.job_queue import DOIJobQueue
+from mpcite.sharding import ShardCoordinator, ShardSpec
+from mpcite.status import DOIStatusSummary
+from mpcite.progress import ProgressReporter
+from mpcite.pipeline import run_pipeline
+from mpcite.descriptions import (
+    DESCRIPTION_LIMIT,
+    DescriptionStore,
+    description_hash,
+)
+from mpcite.failures import FailureIndex, categorize
+from mpcite.validation import split_valid
+from mpcite.url_check import URLChecker
+from mpcite.connections import MongoClientRegistry, store_from_dict
+from mp_cite.clients import PoolOptions
 from mpcite.models import (
     DOIRecordModel,
+    ElinkResponseStatusEnum,
+    FailureCategoryEnum,
+    FailureRecordModel,
     ELinkGetResponseModel,
     MaterialModel,
     ELinkPostResponseModel,
     ConnectionModel,
     RoboCrysModel,
     DOIRecordStatusEnum,
+    RunReportModel,
+    ExplorerRecord,
 )
 from urllib3.exceptions import HTTPError
 import datetime
-from tqdm import tqdm
-from maggma.stores import Store
-from monty.json import MontyDecoder
+from maggma.stores import MemoryStore, MongoStore, Store
 import json
-import bibtexparser
-import nbformat
-from nbconvert.preprocessors import ExecutePreprocessor
 from pathlib import Path
 from difflib import SequenceMatcher
+from contextlib import contextmanager
+import logging
+import time
 from typing import Optional, Dict, Tuple, Union
 
 
@@ -35,23 +58,118 @@ class DOIBuilder(Builder):
         max_doi_requests=1000,
         sync=True,
         report_emails=None,
+        dry_run=False,
+        lookup_cache_size=0,
+        lookup_cache_ttl=None,
+        explorer_format="bibtex",
+        job_store: Optional[Store] = None,
+        shard: Optional[ShardSpec] = None,
+        shard_summary_store: Optional[Store] = None,
+        run_id: Optional[str] = None,
+        summary_store: Optional[Store] = None,
+        progress: Optional[dict] = None,
+        sync_chunk_size: int = 500,
+        descriptions_store: Optional[Store] = None,
+        failures_store: Optional[Store] = None,
+        check_urls: bool = False,
+        url_checks_store: Optional[Store] = None,
+        seconds_per_request: Optional[float] = None,
+        clients: Optional[MongoClientRegistry] = None,
+        mongo_pool: Optional[dict] = None,
         **kwargs,
     ):
         super().__init__(
-            sources=[materials_store, robocrys_store], targets=[doi_store], **kwargs
+            sources=[materials_store, robocrys_store],
+            targets=[
+                store
+                for store in (
+                    doi_store,
+                    job_store,
+                    shard_summary_store,
+                    summary_store,
+                    descriptions_store,
+                    failures_store,
+                    url_checks_store,
+                )
+                if store is not None
+            ],
+            **kwargs,
         )
         # set connections
         self.materials_store = materials_store
         self.robocrys_store = robocrys_store
         self.doi_store = doi_store
+        # shared MongoClients of the stores built by from_dict, closed by finalize, and
+        # their pool options, see mp_cite.clients.PoolOptions
+        self.clients = clients
+        self.mongo_pool = mongo_pool
         self.elink = elink
         self.explorer = explorer
         self.elink_adapter = ELinkAdapter(elink)
         self.explorer_adapter = ExplorerAdapter(explorer)
+        # progress events of long loops, see mpcite.progress
+        self.progress_config = progress
+        self.progress = ProgressReporter.from_config(progress, log=self.logger)
+        self.elink_adapter.progress = self.progress
+        self.explorer_adapter.progress = self.progress
+        # shared work queue, if builders on several processes or hosts drain it together
+        self.job_store = job_store
+        self.job_queue = None if job_store is None else DOIJobQueue(store=job_store)
+        # part of the mp_id space this builder is responsible for, None for all of it
+        self.shard = shard
+        self.shard_summary_store = shard_summary_store
+        self.run_id = (
+            datetime.datetime.now().strftime("%Y-%m-%d") if run_id is None else run_id
+        )
+        # summary of the DOI store kept up to date by update_doi_store, see mpcite.status
+        self.summary_store = summary_store
+        # materials last_updated up to which changed materials were revalidated, to
+        # be saved at the end of a successful run, see select_changed_materials
+        self.revalidated_until: Optional[datetime.datetime] = None
+        # changed materials selected for revalidation and not submitted yet
+        self.revalidation_pending: set = set()
+        # abstracts stored once by content hash rather than in every bibtex
+        self.descriptions_store = descriptions_store
+        self.description_store = (
+            None
+            if descriptions_store is None
+            else DescriptionStore(store=descriptions_store)
+        )
+        # E-Link rejections, to skip resubmissions that would be rejected again
+        self.failures_store = failures_store
+        self.failure_index = (
+            None if failures_store is None else FailureIndex(store=failures_store)
+        )
+        # HEAD probes of site URLs before submission, cached in url_checks_store
+        self.check_urls = check_urls
+        self.url_checks_store = url_checks_store
+        self.url_checker = (
+            URLChecker(cache_store=url_checks_store) if check_urls else None
+        )
+
+        # per material lookups, cached for the duration of a run if enabled
+        self.lookup_cache_size = lookup_cache_size
+        self.lookup_cache_ttl = lookup_cache_ttl
+        self.materials_lookup = self._make_lookup(materials_store)
+        self.robocrys_lookup = self._make_lookup(robocrys_store)
+        self.doi_lookup = self._make_lookup(doi_store)
 
         # set flags
         self.max_doi_requests = max_doi_requests
         self.sync = sync
+        # 0 to download everything before syncing, see download_and_sync
+        self.sync_chunk_size = sync_chunk_size
+        self.dry_run = dry_run
+        # E-Link POST latency for the estimate of runs that do not POST, i.e. dry runs
+        self.seconds_per_request = seconds_per_request
+        # whether doi_store is the copy of a dry run, see use_scratch_doi_store
+        self.scratch_doi_store = False
+        self._run_doi_store = None
+        assert explorer_format in (
+            "bibtex",
+            "json",
+        ), f"Error: unknown explorer_format {explorer_format}"
+        self.explorer_format = explorer_format
 
         self.report_emails = (
             ["wuxiaohua1011@berkeley.edu", "phuck@lbl.gov"]
@@ -61,10 +179,135 @@ class DOIBuilder(Builder):
         self.email_messages = []
         self.has_error = False
         self.config_file_path = None
+        self.report = RunReportModel(dry_run=dry_run)
 
         # set logging
         self.logger.debug("DOI Builder Succesfully instantiated")
 
+    def run(self, log_level=logging.DEBUG):
+        """
+        Run the builder serially, timing every stage of the run.
+
+        In a dry run, every stage runs but nothing is written to the DOI store or POSTed to
+        E-Link. The projected submission is reported at the end instead. The stages work
+        on a copy of the DOI store, see use_scratch_doi_store, so the selection sees
+        what the sync would have written.
+        """
+        root = logging.getLogger()
+        root.setLevel(log_level)
+        handler = logging.StreamHandler()
+        handler.setFormatter(
+            logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+        )
+        root.addHandler(handler)
+
+        self.report = RunReportModel(dry_run=self.dry_run)
+        self.connect()
+        if self.dry_run:
+            self.use_scratch_doi_store()
+        try:
+            items = self.get_items()
+            self.report.records_selected = len(items)
+            for chunk in grouper(self.progress.track(items, "items"), self.chunk_size):
+                with self.stage("assembly"):
+                    processed_items = [self.process_item(item) for item in chunk]
+                self.update_targets(
+                    [item for item in processed_items if item is not None]
+                )
+            with self.stage("finalize"):
+                self.finalize()
+        finally:
+            self.drop_scratch_doi_store()
+
+    def use_scratch_doi_store(self):
+        """
+        Replace the DOI store by a scratch copy of it, which update_doi_store writes to
+        in a dry run. A MongoStore is copied by its server with $out, into a collection
+        next to it, in a single aggregation. Other stores are copied into a MemoryStore.
+        """
+        store = self.doi_store
+        name = f"{store.collection_name}_dry_run"
+        if isinstance(store, MongoStore):
+            store._collection.aggregate([{"$match": {}}, {"$out": name}])
+            scratch = MongoStore.from_collection(store._collection.database[name])
+            scratch.key = store.key
+            scratch.ensure_index(store.key)
+        else:
+            scratch = MemoryStore(collection_name=name, key=store.key)
+            scratch.connect()
+            docs = list(store.query())
+            if len(docs) > 0:
+                scratch.update(docs=docs, key=store.key)
+        self.logger.info(f"[DRY RUN] Working on a copy of the DOI store in [{name}]")
+        self._run_doi_store = store
+        self.doi_store = scratch
+        self.doi_lookup = self._make_lookup(scratch)
+        self.scratch_doi_store = True
+
+    def drop_scratch_doi_store(self):
+        """
+        Drop the copy of use_scratch_doi_store and put the DOI store back, if the DOI
+        store is a copy
+        """
+        if not self.scratch_doi_store:
+            return
+        if isinstance(self.doi_store, MongoStore):
+            self.doi_store._collection.drop()
+        self.doi_store = self._run_doi_store
+        self.doi_lookup = self._make_lookup(self.doi_store)
+        self._run_doi_store = None
+        self.scratch_doi_store = False
+
+    def _make_lookup(self, store: Store) -> StoreLookup:
+        cache = (
+            LRUCache(maxsize=self.lookup_cache_size, ttl=self.lookup_cache_ttl)
+            if self.lookup_cache_size > 0
+            else None
+        )
+        return StoreLookup(store=store, cache=cache)
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Accumulate the time spent in a stage of the run into the run report
+
+        Args:
+            name: name of the stage
+        """
+        tic = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.report.stage_timings[name] = (
+                self.report.stage_timings.get(name, 0.0) + time.perf_counter() - tic
+            )
+
+    def update_doi_store(self, docs: List[dict]):
+        """
+        Write DOI records to the DOI store, unless this is a dry run
+
+        Args:
+            docs: DOI records to write
+
+        Returns:
+            None
+        """
+        if self.dry_run and not self.scratch_doi_store:
+            self.logger.info(f"[DRY RUN] Not writing [{len(docs)}] DOI records")
+            return
+        if self.summary_store is not None and not self.dry_run:
+            # record by record, so the summary sees what each write replaced
+            self.status_summary.write(
+                self.doi_store._collection, docs=docs, key=self.doi_store.key
+            )
+        else:
+            self.doi_store.update(key=self.doi_store.key, docs=docs)
+        self.doi_lookup.prime(docs)
+
+    @property
+    def status_summary(self) -> DOIStatusSummary:
+        return DOIStatusSummary(collection=self.summary_store._collection)
+
     def get_items(self) -> Iterable:
         """
         1. download and sync from elink
@@ -83,6 +326,34 @@ class DOIBuilder(Builder):
             self.log_info_msg("Data Synced")
         else:
             self.log_info_msg("Not Syncing in this run")
+        with self.stage("selection"):
+            return self.select_items()
+
+    def select_items(self) -> List[str]:
+        """
+        Select the mp_ids to update or register in this run, see get_items
+
+        Returns:
+            list of mp_ids
+        """
+        curr_update_ids = [
+            mp_id for _, mp_ids in self.select_item_groups() for mp_id in mp_ids
+        ][: self.max_doi_requests]
+        self.log_info_msg(
+            msg=f"Updating/registering items with mp_id \n{curr_update_ids}"
+        )
+        return curr_update_ids
+
+    def select_item_groups(self) -> List[Tuple[int, List[str]]]:
+        """
+        Select the mp_ids to update or register, grouped by priority, see get_items
+
+        Returns:
+            list of (priority, mp_ids), highest priority first
+        """
+        groups: List[Tuple[int, List[str]]] = []
+        self.revalidated_until = None
+        self.revalidation_pending = set()
         today = datetime.datetime.now()
         d = today - datetime.timedelta(days=2)
         curr_update_ids = set(
@@ -97,7 +368,16 @@ class DOIBuilder(Builder):
                 },
             )
         )
+        curr_update_ids = self.owned(curr_update_ids)
         self.log_info_msg(f"[{len(curr_update_ids)}] requires priority updates")
+        groups.append((2, list(curr_update_ids)))
+        if len(curr_update_ids) < self.max_doi_requests:
+            changed_ids = set(self.select_changed_materials()) - curr_update_ids
+            curr_update_ids = curr_update_ids.union(changed_ids)
+            self.log_info_msg(
+                f"[{len(changed_ids)}] changed since they were last validated"
+            )
+            groups.append((1, list(changed_ids)))
         if len(curr_update_ids) < self.max_doi_requests:
             # send all other data with valid = False
             normal_updates = (
@@ -115,8 +395,10 @@ class DOIBuilder(Builder):
                 )
                 - curr_update_ids
             )
+            normal_updates = self.owned(normal_updates)
             curr_update_ids = curr_update_ids.union(normal_updates)
             self.log_info_msg(f"[{len(normal_updates)}] requires normal updates")
+            groups.append((1, list(normal_updates)))
         if len(curr_update_ids) < self.max_doi_requests:
             new_materials_ids = set(
                 self.materials_store.distinct(
@@ -124,14 +406,108 @@ class DOIBuilder(Builder):
                     criteria={"$and": [{"sbxd.id": "core"}, {"sbxn": "core"}]},
                 )
             ) - set(self.doi_store.distinct(field=self.doi_store.key))
+            new_materials_ids = self.owned(new_materials_ids)
             curr_update_ids = curr_update_ids.union(new_materials_ids)
             self.log_info_msg(f"[{len(new_materials_ids)}] requires new registration")
-        curr_update_ids = list(curr_update_ids)[: self.max_doi_requests]
-        self.log_info_msg(
-            msg=f"Updating/registering items with mp_id \n{curr_update_ids}"
+            groups.append((0, list(new_materials_ids)))
+        return groups
+
+    def select_changed_materials(self, batch_size: int = 1000) -> List[str]:
+        """
+        Select the materials that changed after their DOI record was last validated, by
+        joining the materials' last_updated with the DOI records' last_validated_on.
+
+        Only materials updated after the revalidation watermark are considered, found
+        through an index on last_updated, so the work after a release scales with the
+        number of materials the release changed. The watermark is kept in the summary
+        store, one per shard, without one the last two days are considered. It only
+        moves past the materials of this builder's shard, and only once all of them
+        were submitted, see save_revalidation_watermark.
+
+        Args:
+            batch_size: number of materials per DOI store query
+
+        Returns:
+            mp_ids of materials of this builder's shard to revalidate
+        """
+        since = self.revalidation_watermark()
+        self.materials_store.ensure_index("last_updated")
+        changed: Dict[str, datetime.datetime] = {
+            doc[self.materials_store.key]: doc["last_updated"]
+            for doc in self.materials_store.query(
+                criteria={"last_updated": {"$gt": since}, "sbxn": "core"},
+                properties=[self.materials_store.key, "last_updated"],
+            )
+        }
+        owned = self.owned(changed)
+        changed = {mp_id: changed[mp_id] for mp_id in owned}
+        stale: List[str] = []
+        mp_ids = list(changed)
+        for i in range(0, len(mp_ids), batch_size):
+            for doc in self.doi_store.query(
+                criteria={self.doi_store.key: {"$in": mp_ids[i : i + batch_size]}},
+                properties=[self.doi_store.key, "last_validated_on"],
+            ):
+                mp_id = doc[self.doi_store.key]
+                last_validated_on = doc.get("last_validated_on", None)
+                if last_validated_on is None or changed[mp_id] > last_validated_on:
+                    stale.append(mp_id)
+        self.revalidated_until = max(changed.values(), default=since)
+        self.revalidation_pending = set(stale)
+        return stale
+
+    @property
+    def revalidation_watermark_id(self) -> str:
+        if self.shard is None:
+            return "revalidation_watermark"
+        return f"revalidation_watermark#{self.shard.shard_id}"
+
+    def revalidation_watermark(self) -> datetime.datetime:
+        fallback = datetime.datetime.now() - datetime.timedelta(days=2)
+        if self.summary_store is None:
+            return fallback
+        doc = self.summary_store.query_one(
+            criteria={"summary_id": self.revalidation_watermark_id}
         )
+        return fallback if doc is None else doc["watermark"]
 
-        return curr_update_ids
+    def save_revalidation_watermark(self):
+        """
+        Move the revalidation watermark of this builder's shard forward, if the whole
+        run succeeded and every changed material selected was submitted
+        """
+        if (
+            self.summary_store is None
+            or self.revalidated_until is None
+            or self.has_error
+            or self.dry_run
+        ):
+            return
+        if len(self.revalidation_pending) > 0:
+            self.log_info_msg(
+                f"[{len(self.revalidation_pending)}] changed materials were not "
+                "submitted, keeping the revalidation watermark"
+            )
+            return
+        self.summary_store.update(
+            docs=[
+                {
+                    "summary_id": self.revalidation_watermark_id,
+                    "watermark": self.revalidated_until,
+                }
+            ],
+            key="summary_id",
+        )
+
+    def owned(self, mp_ids: Iterable[str]) -> set:
+        """
+        Args:
+            mp_ids: materials ids
+
+        Returns:
+            the subset of mp_ids in the shard of this builder
+        """
+        return set(mp_ids if self.shard is None else self.shard.filter(mp_ids))
 
     def process_item(self, item: str) -> Optional[Dict]:
         """
@@ -160,30 +536,239 @@ class DOIBuilder(Builder):
         """
         try:
             self.log_info_msg(f"POSTing [{len(items)}] records to Elink")
-            elink_post_data: List[dict] = []
-            for item in tqdm(items):
-                if len(item) == 0:
-                    continue
-                if item.get("elink_post_record", None) is not None:
-                    elink_post_data.append(
-                        ELinkGetResponseModel.custom_to_dict(
-                            elink_record=item["elink_post_record"]
-                        )
-                    )
-            self.post_to_elink(elink_post_data=elink_post_data)
+            self.submit_items(items)
         except Exception as e:
             self.has_error = True
             self.log_err_msg(msg=f"Failed to POST. No updates done. Error: \n{e}")
 
+    def submit_items(self, items: List[dict]):
+        """
+        POST the records of processed items that changed since their last submission
+
+        Args:
+            items: items as returned by process_item
+
+        Returns:
+            None
+        """
+        elink_post_data: List[dict] = []
+        for item in items:
+            if len(item) == 0:
+                continue
+            if item.get("elink_post_record", None) is not None:
+                elink_post_data.append(
+                    ELinkGetResponseModel.custom_to_dict(
+                        elink_record=item["elink_post_record"]
+                    )
+                )
+        mp_ids = {r["accession_num"] for r in elink_post_data}
+        elink_post_data = self.filter_unchanged(elink_post_data)
+        elink_post_data = self.filter_blocked(elink_post_data)
+        elink_post_data = self.filter_invalid(elink_post_data)
+        elink_post_data = self.filter_unreachable(elink_post_data)
+        self.post_to_elink(elink_post_data=elink_post_data)
+        self.revalidation_pending -= mp_ids
+
+    def filter_unchanged(self, elink_post_data: List[dict]) -> List[dict]:
+        """
+        Drop records whose content E-Link has already acknowledged, by comparing their
+        fingerprint with the one stored on their DOI record
+
+        Args:
+            elink_post_data: records to be POSTed
+
+        Returns:
+            records whose content changed since their last acknowledged submission
+        """
+        acknowledged: Dict[str, dict] = {
+            doc[self.doi_store.key]: doc
+            for doc in self.doi_store.query(
+                criteria={
+                    self.doi_store.key: {
+                        "$in": [r["accession_num"] for r in elink_post_data]
+                    }
+                }
+            )
+        }
+        changed: List[dict] = []
+        validated: List[dict] = []
+        for r in elink_post_data:
+            doc = acknowledged.get(r["accession_num"], dict())
+            if doc.get("fingerprint") != ELinkGetResponseModel.get_fingerprint(r):
+                changed.append(r)
+            else:
+                doc.pop("_id", None)
+                validated.append(doc)
+        unchanged = len(validated)
+        self.report.records_unchanged += unchanged
+        if unchanged > 0:
+            # their content was checked against E-Link's, so they count as validated
+            now = datetime.datetime.now()
+            for doc in validated:
+                doc["last_validated_on"] = now
+            self.update_doi_store(validated)
+            self.log_info_msg(
+                f"Skipping [{unchanged}] records that E-Link already has, "
+                f"POSTing [{len(changed)}] changed records"
+            )
+        return changed
+
+    def filter_blocked(self, elink_post_data: List[dict]) -> List[dict]:
+        """
+        Drop records that E-Link rejected before, for a reason that resubmitting the
+        same content cannot fix, see FailureIndex.blocked
+
+        Args:
+            elink_post_data: records to be POSTed
+
+        Returns:
+            records that may be accepted
+        """
+        if self.failure_index is None or len(elink_post_data) == 0:
+            return elink_post_data
+        blocked = self.failure_index.blocked(
+            {
+                r["accession_num"]: ELinkGetResponseModel.get_fingerprint(r)
+                for r in elink_post_data
+            }
+        )
+        if len(blocked) == 0:
+            return elink_post_data
+        self.report.records_blocked += len(blocked)
+        categories: Dict[str, int] = dict()
+        for category in blocked.values():
+            categories[category.value] = categories.get(category.value, 0) + 1
+        self.log_info_msg(
+            f"Skipping [{len(blocked)}] records E-Link would reject again: "
+            + ", ".join(f"[{n}] {c}" for c, n in sorted(categories.items()))
+        )
+        return [r for r in elink_post_data if r["accession_num"] not in blocked]
+
+    def filter_invalid(self, elink_post_data: List[dict]) -> List[dict]:
+        """
+        Drop records that E-Link would refuse, checking them locally, see
+        mpcite.validation. The rejected records go to the failure index.
+
+        Args:
+            elink_post_data: records to be POSTed
+
+        Returns:
+            records that passed the checks
+        """
+        with self.stage("validation"):
+            valid, rejected = split_valid(
+                elink_post_data,
+                fingerprints={
+                    r["accession_num"]: ELinkGetResponseModel.get_fingerprint(r)
+                    for r in elink_post_data
+                    if r.get("accession_num", None)
+                },
+            )
+        if len(rejected) == 0:
+            return valid
+        self.report.records_rejected += len(rejected)
+        for failure in rejected:
+            self.logger.error(f"[{failure.material_id}] {failure.status_message}")
+        self.log_err_msg(
+            f"[{len(rejected)}] records failed the checks before submission"
+        )
+        if self.failure_index is not None and not self.dry_run:
+            self.failure_index.ensure_indexes()
+            self.failure_index.record(rejected)
+        return valid
+
+    def filter_unreachable(self, elink_post_data: List[dict]) -> List[dict]:
+        """
+        Drop records whose site URL is not reachable, probing the URLs of all records at
+        once, see mpcite.url_check. The dropped records go to the failure index.
+
+        Args:
+            elink_post_data: records to be POSTed
+
+        Returns:
+            records whose site URL is reachable, or could not be checked
+        """
+        if self.url_checker is None or len(elink_post_data) == 0:
+            return elink_post_data
+        with self.stage("url_check"):
+            reachable = self.url_checker.check(r["site_url"] for r in elink_post_data)
+        unreachable = [r for r in elink_post_data if reachable[r["site_url"]] is False]
+        if len(unreachable) == 0:
+            return elink_post_data
+        self.report.records_rejected += len(unreachable)
+        self.log_err_msg(
+            f"[{len(unreachable)}] records have an unreachable site URL: "
+            f"{[r['accession_num'] for r in unreachable]}"
+        )
+        if self.failure_index is not None and not self.dry_run:
+            self.failure_index.ensure_indexes()
+            self.failure_index.record(
+                [
+                    FailureRecordModel(
+                        material_id=r["accession_num"],
+                        category=FailureCategoryEnum.INVALID_URL,
+                        status_message="Unreachable before submission: "
+                        f"{r['site_url']}",
+                        osti_id=r.get("osti_id", None),
+                        fingerprint=ELinkGetResponseModel.get_fingerprint(r),
+                    )
+                    for r in unreachable
+                ]
+            )
+        return [r for r in elink_post_data if reachable[r["site_url"]] is not False]
+
     def finalize(self):
+        self.save_revalidation_watermark()
         self.log_info_msg(f"DOI store now has {self.doi_store.count()} records")
         self.log_info_msg(
             f"[{self.doi_store.count(criteria={'valid': True})}] are valid. "
             f"[{self.doi_store.count(criteria={'valid': False})}] are invalid"
         )
+        # latency of the POSTs of this run only, the limiter also times the GETs of the
+        # sync and Explorer shares its host
+        seconds_per_request = self.elink_adapter.mean_latency.get(
+            "POST", self.seconds_per_request
+        )
+        if seconds_per_request is None and self.report.elink_requests > 0:
+            self.log_info_msg(
+                "No E-Link POST was timed, set seconds_per_request for an estimate"
+            )
+        if seconds_per_request is not None:
+            self.report.seconds_per_request = seconds_per_request
+            self.report.estimated_wall_time = (
+                seconds_per_request * self.report.elink_requests
+            )
+            self.report.estimated_request_seconds = self.report.estimated_wall_time
+        for line in self.report.summary_lines():
+            self.log_info_msg(line)
+        for name, lookup in [
+            ("materials", self.materials_lookup),
+            ("robocrys", self.robocrys_lookup),
+            ("doi", self.doi_lookup),
+        ]:
+            stats = lookup.stats()
+            if stats is not None:
+                self.log_info_msg(
+                    f"Lookup cache [{name}]: [{stats['hits']}] hits, "
+                    f"[{stats['misses']}] misses, [{stats['evictions']}] evictions"
+                )
 
-        self.send_email()
+        if self.shard is not None and self.shard_summary_store is not None:
+            ShardCoordinator(self.shard_summary_store).record(
+                run_id=self.run_id, shard=self.shard, report=self.report
+            )
+            self.log_info_msg(
+                f"Recorded report of shard [{self.shard.shard_id}] of run [{self.run_id}]"
+            )
+        if self.dry_run:
+            self.log_info_msg("[DRY RUN] Not sending report email")
+        else:
+            self.send_email()
+        # before the stores are closed
+        self.drop_scratch_doi_store()
         super(DOIBuilder, self).finalize()
+        if self.clients is not None:
+            self.clients.close()
 
     def as_dict(self) -> dict:
         return {
@@ -195,6 +780,36 @@ class DOIBuilder(Builder):
             # "elsevier": self.elsevier.dict(),
             "max_doi_requests": self.max_doi_requests,
             "sync": self.sync,
+            "report_emails": self.report_emails,
+            "dry_run": self.dry_run,
+            "lookup_cache_size": self.lookup_cache_size,
+            "lookup_cache_ttl": self.lookup_cache_ttl,
+            "explorer_format": self.explorer_format,
+            "jobs_collection": None
+            if self.job_store is None
+            else self.job_store.as_dict(),
+            "shard": None if self.shard is None else self.shard.as_dict(),
+            "shard_summaries_collection": None
+            if self.shard_summary_store is None
+            else self.shard_summary_store.as_dict(),
+            "run_id": self.run_id,
+            "summary_collection": None
+            if self.summary_store is None
+            else self.summary_store.as_dict(),
+            "progress": self.progress_config,
+            "sync_chunk_size": self.sync_chunk_size,
+            "descriptions_collection": None
+            if self.descriptions_store is None
+            else self.descriptions_store.as_dict(),
+            "failures_collection": None
+            if self.failures_store is None
+            else self.failures_store.as_dict(),
+            "check_urls": self.check_urls,
+            "url_checks_collection": None
+            if self.url_checks_store is None
+            else self.url_checks_store.as_dict(),
+            "seconds_per_request": self.seconds_per_request,
+            "mongo_pool": self.mongo_pool,
         }
 
     @classmethod
@@ -211,17 +826,55 @@ class DOIBuilder(Builder):
         explorer = ConnectionModel.parse_obj(d["explorer"])
         # elsevier = ConnectionModel.parse_obj(d["elsevier"])
 
-        materials_store = json.loads(
-            json.dumps(d["materials_collection"]), cls=MontyDecoder
-        )
-        robocrys_store = json.loads(
-            json.dumps(d["robocrys_collection"]), cls=MontyDecoder
+        # stores on the same server share one client, see mpcite.connections
+        mongo_pool = d.get("mongo_pool", None)
+        clients = MongoClientRegistry(
+            options=PoolOptions.from_dict(dict() if mongo_pool is None else mongo_pool)
         )
-        doi_store = json.loads(json.dumps(d["dois_collection"]), cls=MontyDecoder)
-        report_emails = d["report_emails"]
+        materials_store = store_from_dict(d["materials_collection"], clients)
+        robocrys_store = store_from_dict(d["robocrys_collection"], clients)
+        doi_store = store_from_dict(d["dois_collection"], clients)
+        report_emails = d.get("report_emails", None)
 
         max_doi_requests = d["max_doi_requests"]
         sync = d["sync"]
+        dry_run = d.get("dry_run", False)
+        lookup_cache_size = d.get("lookup_cache_size", 0)
+        lookup_cache_ttl = d.get("lookup_cache_ttl", None)
+        explorer_format = d.get("explorer_format", "bibtex")
+        job_store = (
+            store_from_dict(d["jobs_collection"], clients)
+            if d.get("jobs_collection", None) is not None
+            else None
+        )
+        summary_store = (
+            store_from_dict(d["summary_collection"], clients)
+            if d.get("summary_collection", None) is not None
+            else None
+        )
+        descriptions_store = (
+            store_from_dict(d["descriptions_collection"], clients)
+            if d.get("descriptions_collection", None) is not None
+            else None
+        )
+        failures_store = (
+            store_from_dict(d["failures_collection"], clients)
+            if d.get("failures_collection", None) is not None
+            else None
+        )
+        url_checks_store = (
+            store_from_dict(d["url_checks_collection"], clients)
+            if d.get("url_checks_collection", None) is not None
+            else None
+        )
+        shard = (
+            ShardSpec.from_dict(d["shard"]) if d.get("shard", None) is not None else None
+        )
+        shard_summary_store = (
+            store_from_dict(d["shard_summaries_collection"], clients)
+            if d.get("shard_summaries_collection", None) is not None
+            else None
+        )
         bld = DOIBuilder(
             materials_store=materials_store,
             robocrys_store=robocrys_store,
@@ -231,24 +884,111 @@ class DOIBuilder(Builder):
             max_doi_requests=max_doi_requests,
             sync=sync,
             report_emails=report_emails,
+            dry_run=dry_run,
+            lookup_cache_size=lookup_cache_size,
+            lookup_cache_ttl=lookup_cache_ttl,
+            explorer_format=explorer_format,
+            job_store=job_store,
+            shard=shard,
+            shard_summary_store=shard_summary_store,
+            run_id=d.get("run_id", None),
+            summary_store=summary_store,
+            progress=d.get("progress", None),
+            sync_chunk_size=d.get("sync_chunk_size", 500),
+            descriptions_store=descriptions_store,
+            failures_store=failures_store,
+            check_urls=d.get("check_urls", False),
+            url_checks_store=url_checks_store,
+            seconds_per_request=d.get("seconds_per_request", None),
+            clients=clients,
+            mongo_pool=mongo_pool,
         )
         return bld
 
     def download_and_sync(self):
+        """
+        Download E-Link and Explorer records of all core materials, and sync the DOI store
+        and robocrys validity with them.
+
+        With a sync_chunk_size, the materials are synced in chunks by a pipeline of three
+        stages: E-Link download, Explorer download and the DOI store sync. Explorer records
+        of a chunk are requested as soon as its E-Link records arrive, and the chunk is
+        synced right after, while the next chunks are downloading. Otherwise, everything is
+        downloaded before anything is synced.
+        """
         try:
             self.log_info_msg("Start Syncing. This will take long")
             all_keys = self.materials_store.distinct(
                 field=self.materials_store.key, criteria={"sbxn": "core"}
             )  # this might fail in the future
+            all_keys = list(self.owned(all_keys))
 
             self.log_info_msg(f"[{len(all_keys)}] requires syncing")
-            elink_dict, bibtex_dict = self.download_data(all_keys)
-            self.sync_local_doi_collection(elink_dict, bibtex_dict)
-            self.sync_robocrystal(elink_dict)
+            if self.sync_chunk_size > 0:
+                with self.stage("sync"):
+                    self.pipelined_sync(all_keys)
+            else:
+                elink_dict, bibtex_dict = self.download_data(all_keys)
+                with self.stage("sync_doi_collection"):
+                    self.sync_local_doi_collection(elink_dict, bibtex_dict)
+                with self.stage("sync_robocrys"):
+                    self.sync_robocrystal(elink_dict)
             self.log_info_msg("Sync Successfull")
         except Exception as e:
             self.log_err_msg(f"Something Failed: {e}")
 
+    def pipelined_sync(self, keys: List[str]) -> int:
+        """
+        Download and sync `keys` chunk by chunk, overlapping the downloads of a chunk with
+        the sync of the previous ones, see mpcite.pipeline
+
+        Args:
+            keys: accession numbers
+
+        Returns:
+            number of records synced
+        """
+
+        def download_elink(chunk: List[str]) -> Dict[str, ELinkGetResponseModel]:
+            return ELinkAdapter.list_to_dict(
+                self.elink_adapter.get_multiple(mp_ids=chunk, chunk_size=100)
+            )
+
+        def download_explorer(elink_dict: Dict[str, ELinkGetResponseModel]):
+            return elink_dict, self.download_explorer(list(elink_dict.values()))
+
+        def sync(downloaded) -> int:
+            elink_dict, bibtex_dict = downloaded
+            self.sync_local_doi_collection(elink_dict, bibtex_dict)
+            self.sync_robocrystal(elink_dict)
+            tracker.update(len(elink_dict))
+            return len(elink_dict)
+
+        chunks = [
+            keys[i : i + self.sync_chunk_size]
+            for i in range(0, len(keys), self.sync_chunk_size)
+        ]
+        tracker = self.progress.tracker("sync", total=len(keys))
+        try:
+            synced, busy = run_pipeline(
+                source=chunks,
+                stages=[
+                    ("download_elink", download_elink),
+                    ("download_bibtex", download_explorer),
+                    ("sync_doi_collection", sync),
+                ],
+            )
+        finally:
+            tracker.close()
+        for name, seconds in busy.items():
+            self.report.stage_timings[name] = (
+                self.report.stage_timings.get(name, 0.0) + seconds
+            )
+        self.log_info_msg(
+            f"Downloaded & Synced [{sum(synced)}] records in [{len(chunks)}] chunks"
+        )
+        return sum(synced)
+
     def log_info_msg(self, msg):
         self.logger.info(msg)
         self.email_messages.append(msg)
@@ -259,42 +999,72 @@ class DOIBuilder(Builder):
 
     def download_data(
         self, keys: List[str]
-    ) -> Tuple[Dict[str, ELinkGetResponseModel], Dict[str, dict]]:
+    ) -> Tuple[
+        Dict[str, ELinkGetResponseModel], Dict[str, Union[dict, ExplorerRecord]]
+    ]:
         """
         Download data from elink and explorer given a set of accession numbers
         Args:
             keys: accession numbers
 
         Returns:
-            Elink and bibtex record in mp_id -> record dictionary format
+            Elink and explorer record in mp_id -> record dictionary format. Explorer
+            records are bibtex entries, or compact JSON records if explorer_format is json
         """
-        elink_records = self.elink_adapter.get_multiple(mp_ids=keys, chunk_size=100)
+        with self.stage("download_elink"):
+            elink_records = self.elink_adapter.get_multiple(
+                mp_ids=keys, chunk_size=100
+            )
         elink_records_dict = ELinkAdapter.list_to_dict(
             elink_records
         )  # mp_id -> elink_record
         self.log_info_msg(
             f"Found and downloaded [{len(elink_records_dict)}] records from ELink."
         )
+        self.log_info_msg(f"Downloading Explorer records as {self.explorer_format}")
+        with self.stage("download_bibtex"):
+            bibtex_dict = self.download_explorer(list(elink_records_dict.values()))
+        self.log_info_msg(
+            f"Found and downded [{len(bibtex_dict)}] records from Explorer."
+        )
+        return elink_records_dict, bibtex_dict
+
+    def download_explorer(
+        self, elink_records: List[ELinkGetResponseModel]
+    ) -> Dict[str, Union[dict, ExplorerRecord]]:
+        """
+        Download the Explorer records matching E-Link records
+
+        Args:
+            elink_records: E-Link records
+
+        Returns:
+            mp_id -> bibtex entry, or compact JSON record if explorer_format is json.
+            Empty if Explorer could not be reached.
+        """
         try:
-            self.log_info_msg("Downloading Bibtex")
-            bibtex_dict_raw = self.explorer_adapter.get_multiple_bibtex(
-                osti_ids=[r.osti_id for r in elink_records], chunk_size=100
-            )
-            bibtex_dict = dict()
-            for elink in elink_records_dict.values():
-                if elink.osti_id in bibtex_dict_raw:
-                    bibtex_dict[elink.accession_num] = bibtex_dict_raw[elink.osti_id]
-            self.log_info_msg(
-                f"Found and downded [{len(bibtex_dict)}] records from Explorer."
-            )
+            if self.explorer_format == "json":
+                bibtex_dict_raw = self.explorer_adapter.get_multiple_json(
+                    osti_ids=[r.osti_id for r in elink_records], chunk_size=100
+                )
+            else:
+                bibtex_dict_raw = self.explorer_adapter.get_multiple_bibtex(
+                    osti_ids=[r.osti_id for r in elink_records], chunk_size=100
+                )
         except HTTPError:
-            bibtex_dict = dict()
+            return dict()
         except Exception as e:
             raise HTTPError(f"Downloading Bibtex Failed {e}")
-        return elink_records_dict, bibtex_dict
+        bibtex_dict = dict()
+        for elink in elink_records:
+            if elink.osti_id in bibtex_dict_raw:
+                bibtex_dict[elink.accession_num] = bibtex_dict_raw[elink.osti_id]
+        return bibtex_dict
 
     def sync_local_doi_collection(
-        self, elink_dict: Dict[str, ELinkGetResponseModel], bibtex_dict: Dict[str, dict]
+        self,
+        elink_dict: Dict[str, ELinkGetResponseModel],
+        bibtex_dict: Dict[str, Union[dict, ExplorerRecord]],
     ):
         """
         Given Elink data and explorer, sync local DOI collection by overwriting.
@@ -305,7 +1075,7 @@ class DOIBuilder(Builder):
         Returns:
             None
         """
-        self.log_info_msg("Syncing DOI collection using data from elink")
+        self.logger.info("Syncing DOI collection using data from elink")
         doi_records: Dict[str, DOIRecordModel] = {
             DOIRecordModel.parse_obj(record).material_id: DOIRecordModel.parse_obj(
                 record
@@ -314,42 +1084,58 @@ class DOIBuilder(Builder):
                 criteria={self.doi_store.key: {"$in": list(elink_dict.keys())}}
             )
         }
-        for mp_id, elink in tqdm(elink_dict.items()):
+        abstracts: Dict[str, str] = dict()
+        for mp_id, elink in self.progress.track(elink_dict.items(), "sync_doi"):
             doi_record: DOIRecordModel = DOIRecordModel(
                 material_id=mp_id,
                 doi=elink.doi["#text"],
                 bibtex=None,
                 status=elink.doi["@status"],
                 valid=False if mp_id not in doi_records else doi_records[mp_id].valid,
-                last_validated_on=datetime.datetime.now(),
+                # only a submission or filter_unchanged validates a record, a sync
+                # must not hide the changes made to its material since
+                last_validated_on=datetime.datetime.min
+                if mp_id not in doi_records
+                else doi_records[mp_id].last_validated_on,
                 created_at=datetime.datetime.now()
                 if mp_id not in doi_records
                 else doi_records[mp_id].created_at,
                 last_updated=datetime.datetime.now()
                 if mp_id not in doi_records
                 else doi_records[mp_id].last_updated,
+                fingerprint=None
+                if mp_id not in doi_records
+                else doi_records[mp_id].fingerprint,
             )
-            bibtex_entry: dict = bibtex_dict.get(doi_record.material_id, None)
-            doi_record.bibtex = (
-                self._create_bibtex_string(bibtex_entry)
-                if bibtex_entry is not None
-                else None
-            )
+            entry = bibtex_dict.get(doi_record.material_id, None)
+            if isinstance(entry, ExplorerRecord):
+                abstract = entry.description
+            else:
+                abstract = None if entry is None else entry.get("abstractnote", None)
+            if abstract:
+                doi_record.description_hash = description_hash(abstract)
+                if self.description_store is not None:
+                    abstracts[mp_id] = abstract
+                    entry = (
+                        entry._replace(description="")
+                        if isinstance(entry, ExplorerRecord)
+                        else {k: v for k, v in entry.items() if k != "abstractnote"}
+                    )
+            if isinstance(entry, ExplorerRecord):
+                # no bibtex is rendered, see DOIRecordModel.get_bibtex
+                doi_record.explorer_record = entry._asdict()
+            else:
+                doi_record.bibtex = self._create_bibtex_string(entry)
             doi_records[mp_id] = doi_record
-        self.log_info_msg("Updating Local DOI Collection. Please wait. ")
-        self.doi_store.update(
-            key=self.doi_store.key,
-            docs=[record.dict() for record in doi_records.values()],
-        )
-        self.log_info_msg(
-            f"Downloaded & Synced [{len(doi_records)}] records from elink"
-        )
+        if len(abstracts) > 0 and not self.dry_run:
+            self.description_store.put_many(abstracts.values())
+        self.logger.info("Updating Local DOI Collection. Please wait. ")
+        self.update_doi_store(docs=[record.dict() for record in doi_records.values()])
+        self.logger.info(f"Downloaded & Synced [{len(doi_records)}] records from elink")
 
     @staticmethod
     def _create_bibtex_string(entry: dict):
-        db = bibtexparser.bibdatabase.BibDatabase()
-        db.entries = [entry]
-        return bibtexparser.dumps(db) if entry is not None else None
+        return dumps_entry(entry) if entry is not None else None
 
     def sync_robocrystal(self, elink_dict: Dict[str, ELinkGetResponseModel]):
         """
@@ -365,13 +1151,17 @@ class DOIBuilder(Builder):
             None
 
         """
-        self.log_info_msg("Syncing Robo Crystal Description")
+        self.logger.info("Syncing Robo Crystal Description")
         all_keys = list(elink_dict.keys())
-        robos: Dict[str, RoboCrysModel] = {
-            RoboCrysModel.parse_obj(robo).material_id: RoboCrysModel.parse_obj(robo)
-            for robo in self.robocrys_store.query(
+        robo_docs = list(
+            self.robocrys_store.query(
                 criteria={self.robocrys_store.key: {"$in": all_keys}}
             )
+        )
+        self.robocrys_lookup.prime(robo_docs)
+        robos: Dict[str, RoboCrysModel] = {
+            RoboCrysModel.parse_obj(robo).material_id: RoboCrysModel.parse_obj(robo)
+            for robo in robo_docs
         }
         doi_records: Dict[str, DOIRecordModel] = {
             DOIRecordModel.parse_obj(record).material_id: DOIRecordModel.parse_obj(
@@ -382,25 +1172,53 @@ class DOIBuilder(Builder):
             )
         }
 
+        # hashes of the descriptions as submitted, to compare with the ones in Explorer
+        robo_hashes: Dict[str, str] = {
+            mpid: description_hash(robo.description[:DESCRIPTION_LIMIT])
+            for mpid, robo in robos.items()
+            if robo.description is not None
+        }
+        stored_abstracts = (
+            dict()
+            if self.description_store is None
+            else self.description_store.get_many(
+                record.description_hash
+                for mpid, record in doi_records.items()
+                if record.description_hash is not None
+                and record.description_hash != robo_hashes.get(mpid, None)
+            )
+        )
+
         def set_doi_status_helper(record: DOIRecordModel):
             if record.status == DOIRecordStatusEnum.COMPLETED.value:
                 record.valid = True
             else:
                 record.valid = False
 
-        for mpid, doi_record in tqdm(doi_records.items()):
+        for mpid, doi_record in self.progress.track(
+            doi_records.items(), "sync_robocrys"
+        ):
             try:
-                doi_record_abstract = doi_record.get_bibtex_abstract()
                 robo: Union[RoboCrysModel, str] = robos.get(doi_record.material_id, "")
-                doi_record_abstract = (
-                    "" if doi_record_abstract is None else doi_record_abstract
-                )
 
                 if type(robo) == str and robo == "":
                     set_doi_status_helper(doi_record)
                 elif type(robo) == RoboCrysModel and robo.description is None:
                     set_doi_status_helper(doi_record)
+                elif doi_record.description_hash is not None and (
+                    doi_record.description_hash == robo_hashes[mpid]
+                ):
+                    # same text as in Explorer, no need to compare them
+                    set_doi_status_helper(doi_record)
                 else:
+                    doi_record_abstract = stored_abstracts.get(
+                        doi_record.description_hash, None
+                    )
+                    if doi_record_abstract is None:
+                        doi_record_abstract = doi_record.get_abstract()
+                    doi_record_abstract = (
+                        "" if doi_record_abstract is None else doi_record_abstract
+                    )
                     if (
                         doi_record_abstract == ""
                         or SequenceMatcher(
@@ -413,6 +1231,9 @@ class DOIBuilder(Builder):
                             f"[{doi_record.material_id}]'s abstract needs to be updated"
                         )
                         doi_record.valid = False
+                        if doi_record.status == DOIRecordStatusEnum.COMPLETED.value:
+                            # E-Link does not show the content it acknowledged, resend it
+                            doi_record.fingerprint = None
                     else:
                         set_doi_status_helper(doi_record)
 
@@ -420,12 +1241,11 @@ class DOIBuilder(Builder):
                 self.log_err_msg(
                     f"Skipping {mpid}.because something bad happened: {e} "
                 )
-        self.log_info_msg("Updating Local DOI Collection. Please wait. ")
-        self.doi_store.update(
-            key=self.doi_store.key,
-            docs=[doi_record.dict() for doi_record in doi_records.values()],
+        self.logger.info("Updating Local DOI Collection. Please wait. ")
+        self.update_doi_store(
+            docs=[doi_record.dict() for doi_record in doi_records.values()]
         )
-        self.log_info_msg("Robo Crystal updated")
+        self.logger.info("Robo Crystal updated")
 
     def generate_elink_model(self, mp_id: str) -> ELinkGetResponseModel:
         """
@@ -435,9 +1255,7 @@ class DOIBuilder(Builder):
         :return:
             instance of ELinkGetResponseModel
         """
-        material = MaterialModel.parse_obj(
-            self.materials_store.query_one(criteria={self.materials_store.key: mp_id})
-        )
+        material = MaterialModel.parse_obj(self.materials_lookup.get(mp_id))
         elink_record = ELinkGetResponseModel(
             osti_id=self.get_osti_id(mp_id=material.task_id),
             title=ELinkGetResponseModel.get_title(material=material),
@@ -461,9 +1279,7 @@ class DOIBuilder(Builder):
             description in string
         """
         description = RoboCrysModel.get_default_description()
-        robo_result = self.robocrys_store.query_one(
-            criteria={self.robocrys_store.key: mp_id}
-        )
+        robo_result = self.robocrys_lookup.get(mp_id)
         if robo_result is None:
             return description
         else:
@@ -471,9 +1287,7 @@ class DOIBuilder(Builder):
             robo_description = robo_result.description
             if robo_description is None:
                 return description
-            return robo_description[
-                :12000
-            ]  # 12000 is the Elink Abstract character limit
+            return robo_description[:DESCRIPTION_LIMIT]
 
     def get_osti_id(self, mp_id) -> str:
         """
@@ -489,14 +1303,176 @@ class DOIBuilder(Builder):
         Returns:
             OSTI ID in string
         """
-        doi_entry = self.doi_store.query_one(criteria={self.doi_store.key: mp_id})
+        doi_entry = self.doi_lookup.get(mp_id)
         if doi_entry is None:
             return ""
         else:
             return doi_entry["doi"].split("/")[-1]
 
+    def backfill(
+        self,
+        mp_ids: Optional[List[str]] = None,
+        num_workers: Optional[int] = None,
+        shard_size: int = 100,
+        max_pending_shards: Optional[int] = None,
+    ) -> Dict[str, int]:
+        """
+        Rebuild and resubmit records in bulk, spreading record construction and serialization
+        over a pool of worker processes. See mpcite.backfill for details.
+
+        Args:
+            mp_ids: materials ids to rebuild, defaults to every material in the DOI store
+            num_workers: number of worker processes, defaults to the number of CPUs
+            shard_size: number of records per worker task and per E-Link POST
+            max_pending_shards: bound on shards in flight, defaults to twice the number of workers
+
+        Returns:
+            counts of shards, records submitted and failures
+        """
+        if mp_ids is None:
+            mp_ids = self.doi_store.distinct(field=self.doi_store.key)
+        mp_ids = sorted(self.owned(mp_ids))
+        return run_backfill(
+            builder=self,
+            mp_ids=mp_ids,
+            num_workers=num_workers,
+            shard_size=shard_size,
+            max_pending_shards=max_pending_shards,
+        )
+
+    def enqueue_jobs(self) -> int:
+        """
+        Sync if enabled, then add every material that needs to be registered or updated to
+        the job queue, with the priorities of get_items
+
+        Returns:
+            number of jobs added or put back in the queue
+        """
+        assert self.job_queue is not None, "Error: no jobs_collection configured"
+        if self.sync:
+            self.download_and_sync()
+        self.job_queue.ensure_indexes()
+        enqueued = 0
+        with self.stage("selection"):
+            for priority, mp_ids in self.select_item_groups():
+                enqueued += self.job_queue.enqueue(mp_ids, priority=priority)
+        # the queue keeps the changed materials until a worker submitted them
+        self.revalidation_pending = set()
+        self.save_revalidation_watermark()
+        self.log_info_msg(f"Enqueued [{enqueued}] jobs")
+        return enqueued
+
+    def drain_jobs(self, batch_size: Optional[int] = None) -> Dict[str, int]:
+        """
+        Claim jobs from the job queue batch by batch, build and POST their records, until
+        the queue is empty or max_doi_requests jobs were claimed. Can run in any number of
+        processes at the same time.
+
+        Args:
+            batch_size: number of jobs claimed and POSTed at once, defaults to chunk_size
+
+        Returns:
+            number of jobs done and failed by this worker
+        """
+        assert self.job_queue is not None, "Error: no jobs_collection configured"
+        batch_size = self.chunk_size if batch_size is None else batch_size
+        counts = {"done": 0, "failed": 0}
+        self.job_queue.reap()
+        claimed = 0
+        while claimed < self.max_doi_requests:
+            jobs = self.job_queue.claim(
+                limit=min(batch_size, self.max_doi_requests - claimed)
+            )
+            if len(jobs) == 0:
+                break
+            claimed += len(jobs)
+            self.report.records_selected += len(jobs)
+            items, built = [], []
+            for job in jobs:
+                try:
+                    with self.stage("assembly"):
+                        items.append(self.process_item(job.material_id))
+                    built.append(job.material_id)
+                except Exception as e:
+                    self.log_err_msg(f"Cannot build record for [{job.material_id}]: {e}")
+                    counts["failed"] += self.job_queue.fail([job.material_id], str(e))
+            try:
+                self.submit_items(items)
+                counts["done"] += self.job_queue.complete(built)
+            except Exception as e:
+                self.has_error = True
+                self.log_err_msg(f"Failed to POST [{len(built)}] jobs: {e}")
+                counts["failed"] += self.job_queue.fail(built, str(e))
+        self.log_info_msg(
+            f"Drained [{counts['done']}] jobs, [{counts['failed']}] failed. "
+            f"Queue: {self.job_queue.counts()}"
+        )
+        return counts
+
+    def watch(
+        self,
+        batch_size: int = 100,
+        max_wait: float = 60.0,
+        resume_token_path: Optional[str] = None,
+        max_batches: Optional[int] = None,
+    ):
+        """
+        Register or update DOIs of core materials as they appear in the materials store,
+        following its change stream instead of diffing the whole catalog. See
+        mpcite.watcher.MaterialsWatcher.
+
+        Args:
+            batch_size: maximum number of materials per submission
+            max_wait: maximum number of seconds a material waits for its batch to fill up
+            resume_token_path: file to keep the change stream resume token in
+            max_batches: stop after submitting this many batches, None to run forever
+
+        Returns:
+            None
+        """
+        watcher = MaterialsWatcher(
+            builder=self,
+            batch_size=batch_size,
+            max_wait=max_wait,
+            resume_token_path=resume_token_path,
+        )
+        watcher.run(max_batches=max_batches)
+
     def post_to_elink(self, elink_post_data: List[dict]):
-        data: bytes = ELinkAdapter.prep_posting_data(elink_post_data)
+        if len(elink_post_data) == 0:
+            return
+        with self.stage("serialization"):
+            data: bytes = ELinkAdapter.prep_posting_data(elink_post_data)
+            fingerprints = {
+                r["accession_num"]: ELinkGetResponseModel.get_fingerprint(r)
+                for r in elink_post_data
+            }
+        self.report.records_submitted += len(elink_post_data)
+        self.report.payload_bytes += len(data)
+        self.report.elink_requests += 1
+        if self.dry_run:
+            self.logger.info(
+                f"[DRY RUN] Not POSTing [{len(elink_post_data)}] records ({len(data)} bytes)"
+            )
+            return
+        with self.stage("submission"):
+            self.submit_elink_data(data=data, fingerprints=fingerprints)
+
+    def submit_elink_data(
+        self, data: bytes, fingerprints: Optional[Dict[str, str]] = None
+    ):
+        """
+        POST records already serialized to E-Link XML and record the responses in the DOI store
+
+        Args:
+            data: xml payload, as generated by ELinkAdapter.prep_posting_data
+            fingerprints: mp_id -> fingerprint of the submitted records, stored on the DOI
+                records that E-Link accepted
+
+        Returns:
+            None
+        """
+        fingerprints = dict() if fingerprints is None else fingerprints
         elink_post_responses: List[ELinkPostResponseModel] = self.elink_adapter.post(
             data=data
         )
@@ -514,7 +1490,8 @@ class DOIBuilder(Builder):
                 obj = DOIRecordModel.parse_obj(record)
                 records[obj.material_id] = obj
         # do comparison. if the record is not local dois, make sure to add it
-        for e_p in tqdm(elink_post_responses):
+        failures: List[FailureRecordModel] = []
+        for e_p in elink_post_responses:
             record: DOIRecordModel = records.get(
                 e_p.accession_num,
                 DOIRecordModel(
@@ -528,18 +1505,45 @@ class DOIBuilder(Builder):
             )
             record.last_validated_on = datetime.datetime.now()
             record.last_updated = datetime.datetime.now()
-            record.error = (
-                f"Unkonwn error happend when pushing to ELINK. "
-                f"Material ID = {record.material_id} | DOi = {record.doi}"
-                if record.status == DOIRecordStatusEnum.FAILURE
-                else None
+            failed = (
+                e_p.status == ElinkResponseStatusEnum.FAILED
+                or record.status == DOIRecordStatusEnum.FAILURE
             )
+            record.error = None
+            if failed:
+                category = categorize(e_p.status_message)
+                record.error = (
+                    f"{category.value}: {e_p.status_message}"
+                    if e_p.status_message
+                    else f"{category.value}: E-Link rejected the record. "
+                    f"Material ID = {record.material_id} | DOI = {record.doi}"
+                )
+                failures.append(
+                    FailureRecordModel(
+                        material_id=record.material_id,
+                        category=category,
+                        status_message=e_p.status_message,
+                        osti_id=e_p.osti_id,
+                        fingerprint=fingerprints.get(record.material_id, None),
+                    )
+                )
+            else:
+                record.fingerprint = fingerprints.get(
+                    record.material_id, record.fingerprint
+                )
             if e_p.accession_num not in records:
                 records[record.material_id] = record
         self.log_info_msg("Updating Local DOI Collection. Please wait. ")
-        self.doi_store.update(
-            key=self.doi_store.key, docs=[record.dict() for record in records.values()]
-        )
+        self.update_doi_store(docs=[record.dict() for record in records.values()])
+        if self.failure_index is not None:
+            self.failure_index.ensure_indexes()
+            self.failure_index.record(failures)
+            failed_ids = {f.material_id for f in failures}
+            self.failure_index.resolve(
+                e_p.accession_num
+                for e_p in elink_post_responses
+                if e_p.accession_num not in failed_ids
+            )
 
     def send_email(self):
         try:
@@ -579,7 +1583,11 @@ class DOIBuilder(Builder):
             self.log_err_msg(f"Error sending email: {e}")
 
     def generate_report(self):
+        # executing the notebook needs nbconvert and a jupyter kernel, which only the
+        # report needs, so they are only imported here
+        import nbformat
         from nbconvert import HTMLExporter
+        from nbconvert.preprocessors import ExecutePreprocessor
 
         self.log_info_msg("Generating Report")
         base = Path(__file__).parent
@@ -0,0 +1,154 @@
+"""
+Index of the records E-Link rejected, for triage and for skipping hopeless retries.
+
+Every rejection is kept as a FailureRecordModel in the failures collection, one document
+per material, with the category of the failure, the status message of E-Link, the number
+of rejections and when they were first and last seen. Accepted submissions remove their
+material from the index.
+
+Some failures cannot go away by resubmitting the same content, e.g. an abstract over the
+E-Link length limit. `blocked` finds the records whose content is unchanged since such a
+failure, so they are not resubmitted every night:
+
+- ABSTRACT_TOO_LONG is blocked until the content of the record changes
+- INVALID_URL is blocked until the content changes or `url_retry_days` passed, since the
+  page of a material can come up with a later release
+- other categories are always retried, records failing the checks of mpcite.validation
+  are caught by them again before any request
+"""
+import datetime
+from typing import Dict, Iterable, List, Optional
+
+from maggma.stores import Store
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+
+from mpcite.models import FailureCategoryEnum, FailureRecordModel
+from mpcite.utility import ELinkAdapter
+
+CATEGORY_OF_MESSAGE = {
+    ELinkAdapter.INVALID_URL_STATUS_MESSAGE.strip(): FailureCategoryEnum.INVALID_URL,
+    ELinkAdapter.MAXIMUM_ABSTRACT_LENGTH_MESSAGE.strip(): (
+        FailureCategoryEnum.ABSTRACT_TOO_LONG
+    ),
+}
+
+
+def categorize(status_message: Optional[str]) -> FailureCategoryEnum:
+    if status_message is None:
+        return FailureCategoryEnum.UNKNOWN
+    return CATEGORY_OF_MESSAGE.get(
+        status_message.strip(), FailureCategoryEnum.UNKNOWN
+    )
+
+
+class FailureIndex:
+    def __init__(self, store: Store, url_retry_days: float = 7.0):
+        """
+        Args:
+            store: store of the failures collection, keyed by material_id
+            url_retry_days: days after which a record rejected for its URL is retried
+        """
+        self.store = store
+        self.url_retry_days = url_retry_days
+
+    @property
+    def collection(self):
+        return self.store._collection
+
+    def ensure_indexes(self):
+        self.collection.create_index(self.store.key, unique=True)
+        self.collection.create_index(
+            [("category", ASCENDING), ("last_seen", DESCENDING)]
+        )
+
+    def record(self, failures: List[FailureRecordModel]):
+        """
+        Add rejections to the index, counting the attempts of records rejected before
+        """
+        if len(failures) == 0:
+            return
+        now = datetime.datetime.now()
+        self.collection.bulk_write(
+            [
+                UpdateOne(
+                    {self.store.key: failure.material_id},
+                    {
+                        "$set": {
+                            **failure.dict(
+                                exclude={"material_id", "attempts", "first_seen"}
+                            ),
+                            "last_seen": now,
+                        },
+                        "$setOnInsert": {"first_seen": now},
+                        "$inc": {"attempts": 1},
+                    },
+                    upsert=True,
+                )
+                for failure in failures
+            ],
+            ordered=False,
+        )
+
+    def resolve(self, mp_ids: Iterable[str]):
+        """
+        Remove records that E-Link accepted from the index
+        """
+        mp_ids = list(mp_ids)
+        if len(mp_ids) > 0:
+            self.collection.delete_many({self.store.key: {"$in": mp_ids}})
+
+    def blocked(self, fingerprints: Dict[str, str]) -> Dict[str, FailureCategoryEnum]:
+        """
+        Find the records that would be rejected again
+
+        Args:
+            fingerprints: mp_id -> fingerprint of the records about to be submitted
+
+        Returns:
+            mp_id -> category of the failure, for the records to skip
+        """
+        if len(fingerprints) == 0:
+            return dict()
+        url_retry_after = datetime.datetime.now() - datetime.timedelta(
+            days=self.url_retry_days
+        )
+        blocked = dict()
+        for doc in self.collection.find(
+            {
+                self.store.key: {"$in": list(fingerprints)},
+                "$or": [
+                    {"category": FailureCategoryEnum.ABSTRACT_TOO_LONG.value},
+                    {
+                        "category": FailureCategoryEnum.INVALID_URL.value,
+                        "last_seen": {"$gt": url_retry_after},
+                    },
+                ],
+            },
+            {"_id": 0, self.store.key: 1, "category": 1, "fingerprint": 1},
+        ):
+            mp_id = doc[self.store.key]
+            if doc.get("fingerprint") == fingerprints[mp_id]:
+                blocked[mp_id] = FailureCategoryEnum(doc["category"])
+        return blocked
+
+    def query(
+        self, category: Optional[FailureCategoryEnum] = None, limit: int = 0
+    ) -> List[FailureRecordModel]:
+        """
+        Failures of a category, or of all categories, most recent first
+        """
+        criteria = dict() if category is None else {"category": category.value}
+        return [
+            FailureRecordModel.parse_obj(doc)
+            for doc in self.collection.find(criteria, {"_id": 0})
+            .sort("last_seen", DESCENDING)
+            .limit(limit)
+        ]
+
+    def counts(self) -> Dict[str, int]:
+        return {
+            doc["_id"]: doc["count"]
+            for doc in self.collection.aggregate(
+                [{"$group": {"_id": "$category", "count": {"$sum": 1}}}]
+            )
+        }
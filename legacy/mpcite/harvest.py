@@ -0,0 +1,150 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from urllib3.exceptions import HTTPError
+
+from mpcite.rate_limiter import CircuitOpenError
+
+
+class ChunkPlanner:
+    """
+    Sizes the chunks of ids sent in a single request.
+
+    A chunk never makes the request URL longer than `max_url_length`. Within that bound its
+    size grows while responses come back faster than `target_latency` and shrinks when they
+    do not, or when a chunk fails.
+    """
+
+    def __init__(
+        self,
+        initial_size: int = 100,
+        min_size: int = 1,
+        max_size: int = 500,
+        step: int = 10,
+        max_url_length: int = 4000,
+        target_latency: float = 10.0,
+        base_url_length: int = 0,
+        separator_length: int = 1,
+    ):
+        """
+        Args:
+            initial_size: number of ids in the first chunks
+            min_size: smallest chunk size
+            max_size: largest chunk size
+            step: number of ids added to the chunk size after a fast response
+            max_url_length: maximum length of a request URL
+            target_latency: seconds a single request should take at most
+            base_url_length: length of the request URL without any ids
+            separator_length: length of the separator between two ids in the URL
+        """
+        self.size = initial_size
+        self.min_size = min_size
+        self.max_size = max_size
+        self.step = step
+        self.max_url_length = max_url_length
+        self.target_latency = target_latency
+        self.base_url_length = base_url_length
+        self.separator_length = separator_length
+        self._lock = threading.Lock()
+
+    def take(self, pending: Deque[str]) -> List[str]:
+        """
+        Pop the next chunk off `pending`
+
+        Args:
+            pending: ids left to request
+
+        Returns:
+            the next chunk, never empty if `pending` is not
+        """
+        chunk: List[str] = []
+        length = self.base_url_length
+        while pending and len(chunk) < self.size:
+            added = len(pending[0]) + (self.separator_length if chunk else 0)
+            if chunk and length + added > self.max_url_length:
+                break
+            length += added
+            chunk.append(pending.popleft())
+        return chunk
+
+    def observe(self, size: int, latency: float):
+        """
+        Adapt the chunk size to the latency of a request of `size` ids
+        """
+        with self._lock:
+            if latency > self.target_latency:
+                self.size = max(self.min_size, min(self.size, size) * 3 // 4)
+            elif size >= self.size:
+                self.size = min(self.max_size, self.size + self.step)
+
+    def shrink(self):
+        with self._lock:
+            self.size = max(self.min_size, self.size // 2)
+
+
+def harvest(
+    fetch: Callable[[List[str]], Dict],
+    ids: List[str],
+    planner: ChunkPlanner,
+    max_workers: int = 4,
+    logger: Optional[logging.Logger] = None,
+) -> Tuple[Dict, List[str]]:
+    """
+    Fetch `ids` in chunks, with up to `max_workers` requests in flight.
+
+    A chunk that fails with an HTTPError is split in half and both halves are retried,
+    so a single bad id only loses itself. Requests are still subject to the rate limiter of
+    the adapter that `fetch` belongs to.
+
+    Args:
+        fetch: function requesting one chunk of ids, returning a dictionary of results
+        ids: ids to fetch
+        planner: sizes the chunks
+        max_workers: maximum number of concurrent requests
+        logger: logger for failed chunks
+
+    Returns:
+        merged results of all chunks, and the ids that could not be fetched
+    """
+    logger = logging.getLogger(__name__) if logger is None else logger
+    pending: Deque[str] = deque(ids)
+    retries: Deque[List[str]] = deque()
+    in_flight: Dict[Future, List[str]] = dict()
+    result: Dict = dict()
+    failed: List[str] = []
+
+    def timed_fetch(chunk: List[str]) -> Tuple[Dict, float]:
+        tic = time.perf_counter()
+        return fetch(chunk), time.perf_counter() - tic
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or retries or in_flight:
+            while len(in_flight) < max_workers and (pending or retries):
+                chunk = retries.popleft() if retries else planner.take(pending)
+                in_flight[executor.submit(timed_fetch, chunk)] = chunk
+            done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+            for future in done:
+                chunk = in_flight.pop(future)
+                try:
+                    chunk_result, latency = future.result()
+                except CircuitOpenError as e:
+                    logger.error(f"Failed to fetch [{len(chunk)}] ids: {e}")
+                    failed.extend(chunk)
+                    continue
+                except HTTPError as e:
+                    planner.shrink()
+                    if len(chunk) > 1:
+                        half = len(chunk) // 2
+                        retries.append(chunk[:half])
+                        retries.append(chunk[half:])
+                    else:
+                        logger.error(f"Failed to fetch [{chunk[0]}], skipping: {e}")
+                        failed.extend(chunk)
+                    continue
+                planner.observe(size=len(chunk), latency=latency)
+                result.update(chunk_result)
+    return result, failed
@@ -0,0 +1,260 @@
+"""
+Mongo backed queue of DOI registration and update jobs.
+
+Every material to register or update is a document in the jobs collection, see
+DOIJobModel. Workers claim jobs atomically with `find_one_and_update`, which takes a
+lease on the job for `lease_seconds`. A job is only ever held by one worker at a time, so
+several builders, on one host or many, can drain the same queue without submitting a
+record twice. If a worker dies, its lease expires and the job can be claimed again, until
+it has been attempted `max_attempts` times.
+"""
+import datetime
+import logging
+import os
+import socket
+import uuid
+from typing import Dict, Iterable, List, Optional
+
+from maggma.stores import Store
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from mpcite.models import DOIJobModel, DOIJobStateEnum
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+class DOIJobQueue:
+    def __init__(
+        self,
+        store: Store,
+        lease_seconds: float = 600.0,
+        max_attempts: int = 5,
+        owner: Optional[str] = None,
+    ):
+        """
+        Args:
+            store: store of the jobs collection, keyed by material_id
+            lease_seconds: seconds a claimed job is held before another worker can claim it
+            max_attempts: number of claims after which a job is given up on
+            owner: name of this worker, defaults to host, pid and a random suffix
+        """
+        self.store = store
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.owner = (
+            f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+            if owner is None
+            else owner
+        )
+
+    @property
+    def collection(self):
+        return self.store._collection
+
+    def ensure_indexes(self):
+        self.collection.create_index(self.store.key, unique=True)
+        self.collection.create_index(
+            [("state", ASCENDING), ("priority", DESCENDING), ("created_at", ASCENDING)]
+        )
+        self.collection.create_index("lease_expires")
+
+    def enqueue(self, mp_ids: Iterable[str], priority: int = 0) -> int:
+        """
+        Add jobs for `mp_ids`. Finished jobs are put back in the queue, jobs still in the
+        queue keep their place but get the higher of both priorities.
+
+        Args:
+            mp_ids: materials ids to register or update
+            priority: priority of the jobs
+
+        Returns:
+            number of jobs added or put back in the queue
+        """
+        mp_ids = list(mp_ids)
+        if len(mp_ids) == 0:
+            return 0
+        key = self.store.key
+        now = datetime.datetime.now()
+        requeued = self.collection.update_many(
+            {
+                key: {"$in": mp_ids},
+                "state": {
+                    "$in": [DOIJobStateEnum.DONE.value, DOIJobStateEnum.FAILED.value]
+                },
+            },
+            {
+                "$set": {
+                    "state": DOIJobStateEnum.PENDING.value,
+                    "priority": priority,
+                    "attempts": 0,
+                    "lease_owner": None,
+                    "lease_expires": None,
+                    "last_error": None,
+                    "updated_at": now,
+                }
+            },
+        ).modified_count
+        operations = []
+        for mp_id in mp_ids:
+            job = DOIJobModel(material_id=mp_id, priority=priority).dict()
+            del job["material_id"], job["priority"]
+            operations.append(
+                UpdateOne(
+                    {key: mp_id},
+                    {"$setOnInsert": job, "$max": {"priority": priority}},
+                    upsert=True,
+                )
+            )
+        try:
+            inserted = self.collection.bulk_write(
+                operations, ordered=False
+            ).upserted_count
+        except BulkWriteError as e:
+            # another process inserted the same job concurrently, which is fine
+            if any(
+                error["code"] != DUPLICATE_KEY_ERROR
+                for error in e.details["writeErrors"]
+            ):
+                raise
+            inserted = e.details["nUpserted"]
+        return requeued + inserted
+
+    def claim(self, limit: int = 1) -> List[DOIJobModel]:
+        """
+        Claim up to `limit` jobs, highest priority and oldest first. Pending jobs and jobs
+        whose lease expired can be claimed.
+
+        Args:
+            limit: maximum number of jobs to claim
+
+        Returns:
+            the claimed jobs
+        """
+        jobs: List[DOIJobModel] = []
+        while len(jobs) < limit:
+            now = datetime.datetime.now()
+            doc = self.collection.find_one_and_update(
+                {
+                    "$or": [
+                        {"state": DOIJobStateEnum.PENDING.value},
+                        {
+                            "state": DOIJobStateEnum.CLAIMED.value,
+                            "lease_expires": {"$lt": now},
+                        },
+                    ],
+                    "attempts": {"$lt": self.max_attempts},
+                },
+                {
+                    "$set": {
+                        "state": DOIJobStateEnum.CLAIMED.value,
+                        "lease_owner": self.owner,
+                        "lease_expires": now
+                        + datetime.timedelta(seconds=self.lease_seconds),
+                        "updated_at": now,
+                    },
+                    "$inc": {"attempts": 1},
+                },
+                sort=[("priority", DESCENDING), ("created_at", ASCENDING)],
+                return_document=ReturnDocument.AFTER,
+            )
+            if doc is None:
+                break
+            jobs.append(DOIJobModel.parse_obj(doc))
+        return jobs
+
+    def complete(self, mp_ids: Iterable[str]) -> int:
+        """
+        Mark jobs held by this worker as done
+
+        Returns:
+            number of jobs marked as done
+        """
+        return self.collection.update_many(
+            self._held(mp_ids),
+            {
+                "$set": {
+                    "state": DOIJobStateEnum.DONE.value,
+                    "lease_owner": None,
+                    "lease_expires": None,
+                    "last_error": None,
+                    "updated_at": datetime.datetime.now(),
+                }
+            },
+        ).modified_count
+
+    def fail(self, mp_ids: Iterable[str], error: str) -> int:
+        """
+        Release jobs held by this worker after a failed attempt. They go back in the queue,
+        unless they have been attempted `max_attempts` times already.
+
+        Returns:
+            number of jobs released
+        """
+        released = 0
+        for exhausted in (True, False):
+            criteria = self._held(mp_ids)
+            criteria["attempts"] = (
+                {"$gte": self.max_attempts} if exhausted else {"$lt": self.max_attempts}
+            )
+            state = DOIJobStateEnum.FAILED if exhausted else DOIJobStateEnum.PENDING
+            released += self.collection.update_many(
+                criteria,
+                {
+                    "$set": {
+                        "state": state.value,
+                        "lease_owner": None,
+                        "lease_expires": None,
+                        "last_error": error,
+                        "updated_at": datetime.datetime.now(),
+                    }
+                },
+            ).modified_count
+        return released
+
+    def reap(self) -> int:
+        """
+        Give up on jobs whose lease expired after their last allowed attempt, typically
+        because their worker kept crashing on them
+
+        Returns:
+            number of jobs marked as failed
+        """
+        now = datetime.datetime.now()
+        return self.collection.update_many(
+            {
+                "state": DOIJobStateEnum.CLAIMED.value,
+                "lease_expires": {"$lt": now},
+                "attempts": {"$gte": self.max_attempts},
+            },
+            {
+                "$set": {
+                    "state": DOIJobStateEnum.FAILED.value,
+                    "lease_owner": None,
+                    "lease_expires": None,
+                    "last_error": "Lease expired on the last attempt",
+                    "updated_at": now,
+                }
+            },
+        ).modified_count
+
+    def counts(self) -> Dict[str, int]:
+        """
+        Returns:
+            number of jobs in each state
+        """
+        counts = {state.value: 0 for state in DOIJobStateEnum}
+        for doc in self.collection.aggregate(
+            [{"$group": {"_id": "$state", "count": {"$sum": 1}}}]
+        ):
+            counts[doc["_id"]] = doc["count"]
+        return counts
+
+    def _held(self, mp_ids: Iterable[str]) -> dict:
+        return {
+            self.store.key: {"$in": list(mp_ids)},
+            "state": DOIJobStateEnum.CLAIMED.value,
+            "lease_owner": self.owner,
+        }
@@ -1,10 +1,27 @@
+"""
+Command line entry point.
+
+Only the standard library is imported at module level. The builder, maggma, monty and
+the other heavy dependencies are imported once the arguments are parsed, and only by
+the code paths that need them, so --help and --health return quickly.
+"""
 import argparse
-from mpcite.doi_builder import DOIBuilder
 from pathlib import Path
 import json
 import logging
+import sys
 import time
-from monty.json import MontyDecoder
+from typing import List
+
+REQUIRED_CONFIG_KEYS = (
+    "materials_collection",
+    "robocrys_collection",
+    "dois_collection",
+    "elink",
+    "explorer",
+    "max_doi_requests",
+    "sync",
+)
 
 
 def str2bool(v):
@@ -18,6 +35,36 @@ def str2bool(v):
         raise argparse.ArgumentTypeError("Boolean value expected.")
 
 
+def health_check(config: dict, timeout: float = 5.0) -> List[str]:
+    """
+    Check that the config is complete and that E-Link and OSTI Explorer respond, without
+    building the builder or connecting to Mongo
+
+    Args:
+        config: builder config, as in the config file
+        timeout: seconds to wait for each endpoint
+
+    Returns:
+        list of problems, empty if healthy
+    """
+    problems = [
+        f"Missing config key {key}" for key in REQUIRED_CONFIG_KEYS if key not in config
+    ]
+    import requests
+
+    for name in ("elink", "explorer"):
+        endpoint = config.get(name, {}).get("endpoint", None)
+        if endpoint is None:
+            continue
+        try:
+            r = requests.head(endpoint, timeout=timeout, allow_redirects=True)
+            if r.status_code >= 500:
+                problems.append(f"{name} endpoint {endpoint} returned {r.status_code}")
+        except requests.RequestException as e:
+            problems.append(f"{name} endpoint {endpoint} is unreachable: {e}")
+    return problems
+
+
 def main():
     parser = argparse.ArgumentParser(description="Parse Arguments for DOI Builder")
     parser.add_argument(
@@ -29,16 +76,158 @@ def main():
     parser.add_argument(
         "-debug", "--debug", type=str2bool, help="Debug option (T/F)", default="F"
     )
+    parser.add_argument(
+        "-backfill",
+        "--backfill",
+        type=str2bool,
+        help="Rebuild and resubmit every record in the DOI store using a process pool (T/F)",
+        default="F",
+    )
+    parser.add_argument(
+        "-workers",
+        "--workers",
+        type=int,
+        help="Number of worker processes for --backfill, defaults to the number of CPUs",
+        default=None,
+    )
+    parser.add_argument(
+        "-dry_run",
+        "--dry_run",
+        type=str2bool,
+        help="Run every stage without writing to the DOI store or POSTing to E-Link, "
+        "and report the projected submission (T/F)",
+        default="F",
+    )
+    parser.add_argument(
+        "-watch",
+        "--watch",
+        type=str2bool,
+        help="Keep running and register new core materials as they are added (T/F)",
+        default="F",
+    )
+    parser.add_argument(
+        "-resume_token",
+        "--resume_token",
+        help="File to keep the change stream resume token of --watch in",
+        default=None,
+    )
+    parser.add_argument(
+        "-jobs",
+        "--jobs",
+        choices=["enqueue", "drain"],
+        help="Fill the shared job queue, or claim and submit jobs from it. "
+        "Requires jobs_collection in the config file",
+        default=None,
+    )
+    parser.add_argument(
+        "-shard",
+        "--shard",
+        help='Only work on shard i of N of the mp_ids, as "i/N" or "i/N:range"',
+        default=None,
+    )
+    parser.add_argument(
+        "-run_id",
+        "--run_id",
+        help="Id under which the shards of a run record their reports, "
+        "defaults to today's date",
+        default=None,
+    )
+    parser.add_argument(
+        "-merge_run",
+        "--merge_run",
+        help="Print the merged report of all shards of this run id and exit",
+        default=None,
+    )
+    parser.add_argument(
+        "-health",
+        "--health",
+        type=str2bool,
+        help="Check the config file and the E-Link and Explorer endpoints, then exit (T/F)",
+        default="F",
+    )
+    parser.add_argument(
+        "-status",
+        "--status",
+        type=str2bool,
+        help="Print DOI counts, the oldest pending records and recent failures from the "
+        "precomputed summary, then exit (T/F)",
+        default="F",
+    )
+    parser.add_argument(
+        "-rebuild",
+        "--rebuild",
+        type=str2bool,
+        help="With --status, recompute the summary from the DOI store first (T/F)",
+        default="F",
+    )
     args = parser.parse_args()
     assert args.config_file_path is not None, "Please provide a configuration file path"
     config_file = Path(args.config_file_path)
-    bld: DOIBuilder = json.load(config_file.open("r"), cls=MontyDecoder)
+    if args.health:
+        problems = health_check(json.load(config_file.open("r")))
+        print("\n".join(problems) if problems else "OK")
+        sys.exit(1 if problems else 0)
+    if args.status and not args.rebuild:
+        from mpcite.status import DOIStatusSummary, collection_from_config, summary_lines
+
+        config = json.load(config_file.open("r"))
+        assert (
+            config.get("summary_collection", None) is not None
+        ), "Please configure summary_collection"
+        summary = DOIStatusSummary(
+            collection_from_config(config["summary_collection"])
+        ).read()
+        print("\n".join(summary_lines(summary)))
+        return
+
+    from mpcite.doi_builder import DOIBuilder
+    from mpcite.sharding import ShardCoordinator, ShardSpec
+
+    bld: DOIBuilder = DOIBuilder.from_dict(json.load(config_file.open("r")))
     bld.config_file_path = config_file.as_posix()
+    if args.dry_run:
+        bld.dry_run = True
+    if args.shard is not None:
+        bld.shard = ShardSpec.parse(args.shard)
+    if args.run_id is not None:
+        bld.run_id = args.run_id
+    log_level = logging.DEBUG if args.debug is not None and args.debug else logging.INFO
     tic = time.perf_counter()
-    if args.debug is not None and args.debug:
-        bld.run(log_level=logging.DEBUG)
+    if args.status:
+        from mpcite.status import summary_lines
+
+        assert bld.summary_store is not None, "Please configure summary_collection"
+        bld.summary_store.connect()
+        bld.doi_store.connect()
+        summary = bld.status_summary.rebuild(bld.doi_store._collection)
+        print("\n".join(summary_lines(summary)))
+    elif args.merge_run is not None:
+        assert (
+            bld.shard_summary_store is not None
+        ), "Please configure shard_summaries_collection"
+        bld.shard_summary_store.connect()
+        report = ShardCoordinator(bld.shard_summary_store).merge(args.merge_run)
+        if report is None:
+            print(f"No shard reported for run [{args.merge_run}]")
+        else:
+            print("\n".join(report.summary_lines()))
+    elif args.backfill:
+        logging.basicConfig(level=log_level)
+        bld.connect()
+        bld.backfill(num_workers=args.workers)
+    elif args.jobs is not None:
+        logging.basicConfig(level=log_level)
+        bld.connect()
+        if args.jobs == "enqueue":
+            bld.enqueue_jobs()
+        else:
+            bld.drain_jobs()
+    elif args.watch:
+        logging.basicConfig(level=log_level)
+        bld.connect()
+        bld.watch(resume_token_path=args.resume_token)
     else:
-        bld.run(log_level=logging.INFO)
+        bld.run(log_level=log_level)
     toc = time.perf_counter()
     print(f"Program run took {toc - tic:0.4f} seconds")
 
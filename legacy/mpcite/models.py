@@ -1,8 +1,10 @@
 from pydantic import BaseModel, Field
-from typing import List, Dict, Optional
+from typing import Any, ClassVar, List, Dict, NamedTuple, Optional, Tuple
 from datetime import datetime
 from enum import Enum
-import bibtexparser
+import hashlib
+import json
+from mpcite.bibtex import dumps_entry, iter_bibtex_entries
 
 
 class ConnectionModel(BaseModel):
@@ -81,6 +83,15 @@ class ELinkGetResponseModel(BaseModel):
         {}, title="DOI info", description="Mainly used during GET request"
     )
 
+    # fields that make up the content of a submission, see get_fingerprint
+    FINGERPRINT_FIELDS: ClassVar[Tuple[str, ...]] = (
+        "title",
+        "keywords",
+        "description",
+        "publication_date",
+        "site_url",
+    )
+
     @classmethod
     def get_title(cls, material: MaterialModel):
         formula = material.pretty_formula
@@ -107,6 +118,26 @@ class ELinkGetResponseModel(BaseModel):
             "information, see https://materialsproject.org/docs/calculations"
         )
 
+    @classmethod
+    def get_fingerprint(cls, elink_record: dict) -> str:
+        """
+        Content fingerprint of a submission, over the fields that E-Link displays. Runs of
+        whitespace count as a single space, as they do once E-Link displays the record.
+
+        Args:
+            elink_record: record as returned by custom_to_dict
+
+        Returns:
+            hex digest of the canonical submitted fields
+        """
+        content = dict()
+        for field in cls.FINGERPRINT_FIELDS:
+            value = elink_record.get(field)
+            content[field] = " ".join(value.split()) if isinstance(value, str) else value
+        return hashlib.sha256(
+            json.dumps(content, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+
     @classmethod
     def custom_to_dict(cls, elink_record) -> dict:
         if elink_record.osti_id is None or elink_record.osti_id == "":
@@ -181,6 +212,21 @@ class DOIRecordModel(BaseModel):
     error: Optional[str] = Field(
         default=None, description="None if no error, else error message"
     )
+    fingerprint: Optional[str] = Field(
+        default=None,
+        description="Fingerprint of the last submission acknowledged by E-Link, "
+        "see ELinkGetResponseModel.get_fingerprint",
+    )
+    description_hash: Optional[str] = Field(
+        default=None,
+        description="Hash of the abstract in Explorer, see mpcite.descriptions. "
+        "The abstract itself is only kept in the bibtex without a descriptions store",
+    )
+    explorer_record: Optional[Dict[str, Any]] = Field(
+        default=None,
+        description="Explorer record as harvested in JSON, see ExplorerRecord. Kept "
+        "instead of the bibtex, which get_bibtex renders from it on demand",
+    )
 
     class Config:
         use_enum_values = True
@@ -194,20 +240,179 @@ class DOIRecordModel(BaseModel):
         else:
             return self.doi.split("/")[-1]
 
+    def get_bibtex(self) -> Optional[str]:
+        if self.bibtex is None and self.explorer_record is not None:
+            return dumps_entry(ExplorerRecord(**self.explorer_record).to_bibtex_entry())
+        return self.bibtex
+
+    def get_abstract(self) -> str:
+        """
+        Abstract in Explorer, without parsing any bibtex when it was harvested in JSON
+        """
+        if self.explorer_record is not None:
+            return self.explorer_record.get("description", "")
+        return self.get_bibtex_abstract()
+
     def get_bibtex_abstract(self):
         try:
             if self.bibtex is None:
                 return ""
-            bib_db: bibtexparser.bibdatabase.BibDatabase = bibtexparser.loads(
-                self.bibtex
-            )
-            if bib_db.entries:
-                return bib_db.entries[0]["abstractnote"]
+            for entry in iter_bibtex_entries(self.bibtex, fields={"abstractnote"}):
+                return entry["abstractnote"]
         except Exception as e:
             print(e)
             return ""
 
 
+class DOIJobStateEnum(str, Enum):
+    PENDING = "PENDING"
+    CLAIMED = "CLAIMED"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
+
+class DOIJobModel(BaseModel):
+    material_id: str = Field(...)
+    state: DOIJobStateEnum = Field(DOIJobStateEnum.PENDING)
+    priority: int = Field(0, title="Jobs with a higher priority are claimed first")
+    attempts: int = Field(0, title="Number of times this job was claimed")
+    lease_owner: Optional[str] = Field(
+        None, title="Worker holding the lease on this job"
+    )
+    lease_expires: Optional[datetime] = Field(
+        None, title="Time after which the job can be claimed by another worker"
+    )
+    last_error: Optional[str] = Field(None, title="Error of the last failed attempt")
+    created_at: datetime = Field(default_factory=datetime.now)
+    updated_at: datetime = Field(default_factory=datetime.now)
+
+    class Config:
+        use_enum_values = True
+
+
+class FailureCategoryEnum(str, Enum):
+    INVALID_URL = "INVALID_URL"
+    ABSTRACT_TOO_LONG = "ABSTRACT_TOO_LONG"
+    MISSING_FIELD = "MISSING_FIELD"
+    INVALID_FIELD = "INVALID_FIELD"
+    ILLEGAL_CHARACTERS = "ILLEGAL_CHARACTERS"
+    UNKNOWN = "UNKNOWN"
+
+
+class FailureRecordModel(BaseModel):
+    material_id: str = Field(...)
+    category: FailureCategoryEnum = Field(FailureCategoryEnum.UNKNOWN)
+    status_message: Optional[str] = Field(
+        None, title="status_message of the E-Link response"
+    )
+    osti_id: Optional[str] = None
+    fingerprint: Optional[str] = Field(
+        None,
+        title="Fingerprint of the rejected record",
+        description="see ELinkGetResponseModel.get_fingerprint",
+    )
+    attempts: int = Field(0, title="Number of submissions E-Link rejected")
+    first_seen: datetime = Field(default_factory=datetime.now)
+    last_seen: datetime = Field(default_factory=datetime.now)
+
+    class Config:
+        use_enum_values = True
+
+
+class RunReportModel(BaseModel):
+    dry_run: bool = Field(False, title="Whether nothing was written or POSTed")
+    records_selected: int = Field(0, title="Number of items returned by get_items")
+    records_submitted: int = Field(
+        0, title="Number of records POSTed, or that would be POSTed in a dry run"
+    )
+    records_unchanged: int = Field(
+        0, title="Number of records skipped because E-Link already has their content"
+    )
+    records_blocked: int = Field(
+        0, title="Number of records skipped because a retry would fail the same way"
+    )
+    records_rejected: int = Field(
+        0, title="Number of records that failed the checks run before submission"
+    )
+    payload_bytes: int = Field(0, title="Total size of the serialized E-Link payloads")
+    elink_requests: int = Field(0, title="Number of E-Link POST requests")
+    seconds_per_request: Optional[float] = Field(
+        None, title="E-Link POST latency used for the estimate, timed or configured"
+    )
+    estimated_wall_time: Optional[float] = Field(
+        None, title="Estimated seconds spent on E-Link POST requests"
+    )
+    estimated_request_seconds: Optional[float] = Field(
+        None,
+        title="Estimated seconds of E-Link POST requests, summed over parallel runs",
+    )
+    stage_timings: Dict[str, float] = Field(
+        default={}, title="Seconds spent in each stage of the run"
+    )
+
+    @classmethod
+    def merge(cls, reports: List["RunReportModel"]) -> "RunReportModel":
+        """
+        Combine the reports of runs that worked on disjoint sets of records at the same
+        time, e.g. shards. Counts and request seconds add up, wall times are those of
+        the slowest run.
+        """
+        merged = cls(dry_run=any(r.dry_run for r in reports))
+        for r in reports:
+            merged.records_selected += r.records_selected
+            merged.records_submitted += r.records_submitted
+            merged.records_unchanged += r.records_unchanged
+            merged.records_blocked += r.records_blocked
+            merged.records_rejected += r.records_rejected
+            merged.payload_bytes += r.payload_bytes
+            merged.elink_requests += r.elink_requests
+            if r.estimated_wall_time is not None:
+                merged.estimated_wall_time = max(
+                    merged.estimated_wall_time or 0.0, r.estimated_wall_time
+                )
+                request_seconds = (
+                    r.estimated_wall_time
+                    if r.estimated_request_seconds is None
+                    else r.estimated_request_seconds
+                )
+                merged.estimated_request_seconds = (
+                    merged.estimated_request_seconds or 0.0
+                ) + request_seconds
+            for stage, seconds in r.stage_timings.items():
+                merged.stage_timings[stage] = max(
+                    merged.stage_timings.get(stage, 0.0), seconds
+                )
+        if merged.estimated_request_seconds is not None and merged.elink_requests > 0:
+            merged.seconds_per_request = (
+                merged.estimated_request_seconds / merged.elink_requests
+            )
+        return merged
+
+    def summary_lines(self) -> List[str]:
+        lines = [
+            f"{'[DRY RUN] ' if self.dry_run else ''}"
+            f"[{self.records_selected}] records selected, "
+            f"[{self.records_unchanged}] unchanged, "
+            f"[{self.records_blocked}] blocked by past failures, "
+            f"[{self.records_rejected}] rejected by local checks, "
+            f"[{self.records_submitted}] records submitted",
+            f"Payload: [{self.payload_bytes}] bytes in [{self.elink_requests}] requests",
+        ]
+        if self.estimated_wall_time is not None:
+            lines.append(
+                f"Estimated E-Link time: {self.estimated_wall_time:0.1f} seconds "
+                f"at {self.seconds_per_request:0.2f} seconds per request"
+            )
+        if self.estimated_request_seconds not in (None, self.estimated_wall_time):
+            lines.append(
+                f"Estimated E-Link request time over all runs: "
+                f"{self.estimated_request_seconds:0.1f} seconds"
+            )
+        for stage, seconds in self.stage_timings.items():
+            lines.append(f"Stage [{stage}] took {seconds:0.2f} seconds")
+        return lines
+
+
 class OSTIDOIRecordModel(DOIRecordModel):
     material_id: str = Field(...)
     doi: str = Field(default="")
@@ -317,3 +522,51 @@ class ExplorerGetJSONResponseModel(BaseModel):
     sponsor_orgs: List[str]
     research_orgs: List[str]
     links: List[Dict[str, str]]
+
+
+class ExplorerRecord(NamedTuple):
+    """
+    Compact form of an Explorer JSON record, with only what the DOI collection needs
+    """
+
+    osti_id: str
+    doi: str
+    title: str
+    authors: Tuple[str, ...]
+    description: str
+    publication_date: str
+    country: str
+
+    @classmethod
+    def from_json(cls, obj: dict) -> "ExplorerRecord":
+        # missing and null fields are both empty
+        return cls(
+            osti_id=str(obj["osti_id"]),
+            doi=obj.get("doi", None) or "",
+            title=obj.get("title", None) or "",
+            # authors come as "Last, First [Affiliation]"
+            authors=tuple(a.split(" [")[0] for a in obj.get("authors", None) or []),
+            description=obj.get("description", None) or "",
+            publication_date=obj.get("publication_date", None) or "",
+            country=obj.get("country_publication", None) or "",
+        )
+
+    def to_bibtex_entry(self) -> Dict[str, str]:
+        """
+        Bibtex entry with the same fields as OSTI's own bibtex export
+        """
+        entry = {
+            "ENTRYTYPE": "misc",
+            "ID": f"osti_{self.osti_id}",
+            "title": self.title,
+            "author": " and ".join(self.authors),
+            "abstractnote": self.description,
+            "doi": self.doi,
+            "url": f"https://www.osti.gov/biblio/{self.osti_id}",
+            "place": self.country,
+        }
+        # publication_date is ISO 8601, e.g. 2020-05-01T00:00:00Z
+        if len(self.publication_date) >= 7:
+            entry["year"] = self.publication_date[:4]
+            entry["month"] = str(int(self.publication_date[5:7]))
+        return {k: v for k, v in entry.items() if v != ""}
@@ -0,0 +1,108 @@
+"""
+Threaded pipeline with bounded queues between stages.
+
+Every stage runs in its own thread and hands its result for an item to the next stage
+through a queue holding at most `maxsize` items. Stage k works on item i while stage k + 1
+works on item i - 1, so the wall time of the pipeline approaches that of its slowest stage
+rather than the sum of all stages, and the bounded queues keep a fast stage from running
+far ahead of a slow one. The stages here are mostly waiting on E-Link, OSTI Explorer and
+Mongo, which release the GIL.
+
+If a stage raises, the pipeline stops and the exception is raised by `run_pipeline`.
+"""
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+_DONE = object()
+_POLL_INTERVAL = 0.1
+
+
+def run_pipeline(
+    source: Iterable,
+    stages: Sequence[Tuple[str, Callable[[Any], Any]]],
+    maxsize: int = 2,
+) -> Tuple[List, Dict[str, float]]:
+    """
+    Push every item of `source` through `stages`, in order
+
+    Args:
+        source: items fed to the first stage
+        stages: (name, function) of each stage, a function gets the result of the
+            previous stage for an item and returns its own result
+        maxsize: maximum number of items waiting between two stages
+
+    Returns:
+        results of the last stage in order of completion, and the seconds each stage
+        spent working
+    """
+    queues: List[queue.Queue] = [queue.Queue(maxsize=maxsize) for _ in stages]
+    stop = threading.Event()
+    errors: List[BaseException] = []
+    busy: Dict[str, float] = {name: 0.0 for name, _ in stages}
+    results: List = []
+
+    def put(q: queue.Queue, item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(q: queue.Queue):
+        while not stop.is_set():
+            try:
+                return q.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def fail(e: BaseException):
+        errors.append(e)
+        stop.set()
+
+    def feed():
+        try:
+            for item in source:
+                if not put(queues[0], item):
+                    return
+        except BaseException as e:
+            fail(e)
+            return
+        put(queues[0], _DONE)
+
+    def work(i: int):
+        name, function = stages[i]
+        out = queues[i + 1] if i + 1 < len(stages) else None
+        while True:
+            item = get(queues[i])
+            if item is _DONE:
+                break
+            tic = time.perf_counter()
+            try:
+                result = function(item)
+            except BaseException as e:
+                fail(e)
+                return
+            busy[name] += time.perf_counter() - tic
+            if out is None:
+                results.append(result)
+            elif not put(out, result):
+                return
+        if out is not None:
+            put(out, _DONE)
+
+    threads = [threading.Thread(target=feed, name="pipeline-source", daemon=True)] + [
+        threading.Thread(target=work, args=(i,), name=f"pipeline-{name}", daemon=True)
+        for i, (name, _) in enumerate(stages)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if len(errors) > 0:
+        raise errors[0]
+    return results, busy
@@ -0,0 +1,244 @@
+"""
+Structured progress reporting, replacing tqdm progress bars.
+
+Loops are wrapped with `ProgressReporter.track`, which counts items and emits a
+ProgressEvent with the throughput and ETA of the stage to every sink at most once every
+`interval` seconds, and once more at the end of loops that lasted longer than that.
+Sinks are pluggable:
+
+- LogSink writes a log line
+- JSONLSink appends one JSON object per event to a file
+- HTTPSink POSTs each event as JSON to a metrics endpoint
+
+Tracking is sampled: the clock is only read every `check_every` items, and the sinks are
+only called when an event is due, so a tracked loop costs a counter increment per item.
+"""
+import json
+import logging
+import threading
+import time
+from abc import ABCMeta, abstractmethod
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, TypeVar
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressEvent(NamedTuple):
+    stage: str
+    done: int
+    total: Optional[int]
+    elapsed: float
+    rate: float  # items per second
+    eta: Optional[float]  # seconds left, None if the total is unknown
+    nbytes: int
+    final: bool
+
+    def message(self) -> str:
+        done = f"{self.done}" if self.total is None else f"{self.done}/{self.total}"
+        msg = f"[{self.stage}] {done} in {self.elapsed:0.1f}s ({self.rate:0.1f}/s"
+        if self.eta is not None and not self.final:
+            msg += f", ETA {self.eta:0.0f}s"
+        if self.nbytes > 0:
+            msg += f", {self.nbytes} bytes"
+        return msg + (") done" if self.final else ")")
+
+
+class ProgressSink(metaclass=ABCMeta):
+    @abstractmethod
+    def emit(self, event: ProgressEvent):
+        pass
+
+
+class LogSink(ProgressSink):
+    def __init__(self, log: Optional[logging.Logger] = None, level: int = logging.INFO):
+        self.log = logger if log is None else log
+        self.level = level
+
+    def emit(self, event: ProgressEvent):
+        self.log.log(self.level, event.message())
+
+
+class JSONLSink(ProgressSink):
+    def __init__(self, path: str):
+        """
+        Args:
+            path: file the events are appended to, one JSON object per line
+        """
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def emit(self, event: ProgressEvent):
+        line = json.dumps({"time": time.time(), **event._asdict()}) + "\n"
+        with self._lock, self.path.open("a") as f:
+            f.write(line)
+
+
+class HTTPSink(ProgressSink):
+    def __init__(self, url: str, timeout: float = 2.0):
+        """
+        Args:
+            url: metrics endpoint that events are POSTed to as JSON
+            timeout: seconds to wait for the endpoint, a slow endpoint only loses events
+        """
+        self.url = url
+        self.timeout = timeout
+
+    def emit(self, event: ProgressEvent):
+        import requests
+
+        try:
+            requests.post(
+                self.url,
+                json={"time": time.time(), **event._asdict()},
+                timeout=self.timeout,
+            )
+        except requests.RequestException as e:
+            logger.debug(f"Cannot send progress event to {self.url}: {e}")
+
+
+class ProgressTracker:
+    """
+    Progress of a single stage. Use ProgressReporter.track or ProgressReporter.tracker
+    rather than building one directly.
+    """
+
+    def __init__(
+        self,
+        stage: str,
+        total: Optional[int],
+        sinks: List[ProgressSink],
+        interval: float,
+        check_every: int,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.stage = stage
+        self.total = total
+        self.sinks = sinks
+        self.interval = interval
+        self.check_every = check_every
+        self.clock = clock
+        self.done = 0
+        self.nbytes = 0
+        self.start = clock()
+        self._next_check = check_every
+        self._next_emit = self.start + interval
+
+    def update(self, n: int = 1, nbytes: int = 0):
+        self.done += n
+        self.nbytes += nbytes
+        if self.done >= self._next_check:
+            self._next_check = self.done + self.check_every
+            now = self.clock()
+            if now >= self._next_emit:
+                self._next_emit = now + self.interval
+                self._emit(now, final=False)
+
+    def close(self):
+        # loops shorter than the interval finish silently
+        now = self.clock()
+        if now - self.start >= self.interval:
+            self._emit(now, final=True)
+
+    def event(self, now: float, final: bool) -> ProgressEvent:
+        elapsed = now - self.start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = (
+            (self.total - self.done) / rate
+            if self.total is not None and rate > 0
+            else None
+        )
+        return ProgressEvent(
+            stage=self.stage,
+            done=self.done,
+            total=self.total,
+            elapsed=elapsed,
+            rate=rate,
+            eta=eta,
+            nbytes=self.nbytes,
+            final=final,
+        )
+
+    def _emit(self, now: float, final: bool):
+        event = self.event(now, final=final)
+        for sink in self.sinks:
+            try:
+                sink.emit(event)
+            except Exception as e:
+                logger.debug(f"Progress sink {type(sink).__name__} failed: {e}")
+
+
+class ProgressReporter:
+    def __init__(
+        self,
+        sinks: Optional[List[ProgressSink]] = None,
+        interval: float = 10.0,
+        check_every: int = 64,
+    ):
+        """
+        Args:
+            sinks: where events go, defaults to a LogSink
+            interval: minimum number of seconds between two events of a stage
+            check_every: number of items between two reads of the clock
+        """
+        self.sinks = [LogSink()] if sinks is None else sinks
+        self.interval = interval
+        self.check_every = check_every
+
+    @classmethod
+    def from_config(
+        cls, config: Optional[dict], log: Optional[logging.Logger] = None
+    ) -> "ProgressReporter":
+        """
+        Build a reporter from the "progress" section of the builder config, e.g.
+        {"interval": 30, "jsonl_path": "/var/log/mpcite/progress.jsonl",
+         "metrics_url": "http://localhost:9091/progress", "log": true}
+        """
+        config = dict() if config is None else config
+        sinks: List[ProgressSink] = []
+        if config.get("log", True):
+            sinks.append(LogSink(log=log))
+        if config.get("jsonl_path", None) is not None:
+            sinks.append(JSONLSink(config["jsonl_path"]))
+        if config.get("metrics_url", None) is not None:
+            sinks.append(HTTPSink(config["metrics_url"]))
+        return cls(
+            sinks=sinks,
+            interval=config.get("interval", 10.0),
+            check_every=config.get("check_every", 64),
+        )
+
+    def tracker(self, stage: str, total: Optional[int] = None) -> ProgressTracker:
+        return ProgressTracker(
+            stage=stage,
+            total=total,
+            sinks=self.sinks,
+            interval=self.interval,
+            check_every=self.check_every,
+        )
+
+    def track(
+        self, iterable: Iterable[T], stage: str, total: Optional[int] = None
+    ) -> Iterator[T]:
+        """
+        Iterate over `iterable`, reporting progress of `stage`
+
+        Args:
+            iterable: items to iterate over
+            stage: name of the stage in the events
+            total: number of items, defaults to len(iterable) if it has one
+
+        Returns:
+            iterator over the same items
+        """
+        if total is None and hasattr(iterable, "__len__"):
+            total = len(iterable)
+        tracker = self.tracker(stage=stage, total=total)
+        try:
+            for item in iterable:
+                yield item
+                tracker.update()
+        finally:
+            tracker.close()
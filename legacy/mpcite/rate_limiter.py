@@ -0,0 +1,224 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional, Union
+from urllib.parse import urlparse
+
+from urllib3.exceptions import HTTPError
+
+
+class CircuitOpenError(HTTPError):
+    """
+    Raised instead of sending a request while the circuit breaker of a host is open
+    """
+
+
+class AdaptiveRateLimiter:
+    """
+    Adaptive concurrency limiter for requests to one OSTI host.
+
+    - AIMD: every successful response grows the concurrency limit by `additive_increase`
+      per window of requests, every 429/5xx or connection error multiplies it by
+      `multiplicative_decrease`
+    - Retry-After from a response holds back every caller until it has passed
+    - failed requests are retried after a jittered exponential backoff
+    - after `failure_threshold` consecutive failures the circuit opens and requests fail
+      fast for `reset_timeout` seconds, after which a single probe request is let through
+
+    Limiters are shared by all adapters talking to the same host, see `for_endpoint`.
+    They also keep a moving average of the response latency of the host, used to
+    project the duration of a run.
+    """
+
+    CLOSED = "CLOSED"
+    OPEN = "OPEN"
+    HALF_OPEN = "HALF_OPEN"
+
+    _registry: Dict[str, "AdaptiveRateLimiter"] = dict()
+    _registry_lock = threading.Lock()
+
+    def __init__(
+        self,
+        initial_concurrency: float = 1.0,
+        min_concurrency: float = 1.0,
+        max_concurrency: float = 16.0,
+        additive_increase: float = 1.0,
+        multiplicative_decrease: float = 0.5,
+        base_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        max_retries: int = 5,
+        failure_threshold: int = 5,
+        reset_timeout: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+        rng: Callable[[], float] = random.random,
+    ):
+        self.limit = initial_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.additive_increase = additive_increase
+        self.multiplicative_decrease = multiplicative_decrease
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.max_retries = max_retries
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.sleep = sleep
+        self.rng = rng
+
+        self.in_flight = 0
+        self.mean_latency: Optional[float] = None
+        self.state = AdaptiveRateLimiter.CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._not_before = 0.0
+        self._cond = threading.Condition()
+
+    @classmethod
+    def for_endpoint(cls, endpoint: str) -> "AdaptiveRateLimiter":
+        """
+        Get the limiter shared by every adapter that talks to the host of `endpoint`
+
+        Args:
+            endpoint: URL of the endpoint
+
+        Returns:
+            the AdaptiveRateLimiter of that host
+        """
+        host = urlparse(endpoint).netloc or endpoint
+        with cls._registry_lock:
+            if host not in cls._registry:
+                cls._registry[host] = cls()
+            return cls._registry[host]
+
+    def acquire(self):
+        """
+        Block until a request may be sent.
+
+        Raises:
+            CircuitOpenError if the circuit is open
+        """
+        with self._cond:
+            while True:
+                now = self.clock()
+                if self.state == AdaptiveRateLimiter.OPEN:
+                    if now - self._opened_at < self.reset_timeout:
+                        raise CircuitOpenError(
+                            f"Circuit open after {self.consecutive_failures} consecutive failures"
+                        )
+                    self.state = AdaptiveRateLimiter.HALF_OPEN
+                wait = self._not_before - now
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                # only a single probe is allowed through a half open circuit
+                capacity = (
+                    1
+                    if self.state == AdaptiveRateLimiter.HALF_OPEN
+                    else max(int(self.limit), 1)
+                )
+                if self.in_flight < capacity:
+                    self.in_flight += 1
+                    return
+                self._cond.wait()
+
+    def release(
+        self,
+        status_code: Optional[int],
+        retry_after: Optional[Union[str, float]] = None,
+        attempt: int = 0,
+        latency: Optional[float] = None,
+    ) -> Optional[float]:
+        """
+        Report the outcome of a request sent after `acquire`, and adapt to it.
+
+        Args:
+            status_code: HTTP status code of the response, None if the request failed to connect
+            retry_after: value of the Retry-After header, if any
+            attempt: number of retries that preceded this request
+            latency: seconds the request took
+
+        Returns:
+            seconds to wait before retrying, or None if the request should not be retried
+        """
+        with self._cond:
+            self.in_flight -= 1
+            if latency is not None:
+                self.mean_latency = (
+                    latency
+                    if self.mean_latency is None
+                    else 0.8 * self.mean_latency + 0.2 * latency
+                )
+            if not self.is_pushback(status_code):
+                if self.state == AdaptiveRateLimiter.HALF_OPEN:
+                    self.state = AdaptiveRateLimiter.CLOSED
+                self.consecutive_failures = 0
+                self.limit = min(
+                    self.max_concurrency,
+                    self.limit + self.additive_increase / max(self.limit, 1.0),
+                )
+                self._cond.notify_all()
+                return None
+
+            self.consecutive_failures += 1
+            self.limit = max(
+                self.min_concurrency, self.limit * self.multiplicative_decrease
+            )
+            now = self.clock()
+            if (
+                self.state == AdaptiveRateLimiter.HALF_OPEN
+                or self.consecutive_failures >= self.failure_threshold
+            ):
+                self.state = AdaptiveRateLimiter.OPEN
+                self._opened_at = now
+            delay = self.parse_retry_after(retry_after, now=datetime.now(timezone.utc))
+            if delay is not None:
+                self._not_before = max(self._not_before, now + delay)
+            else:
+                delay = self.backoff(attempt)
+            self._cond.notify_all()
+            return delay
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Full jitter exponential backoff
+
+        Args:
+            attempt: number of retries so far
+
+        Returns:
+            seconds to wait
+        """
+        return self.rng() * min(self.max_backoff, self.base_backoff * 2**attempt)
+
+    @staticmethod
+    def is_pushback(status_code: Optional[int]) -> bool:
+        return status_code is None or status_code == 429 or status_code >= 500
+
+    @staticmethod
+    def parse_retry_after(
+        retry_after: Optional[Union[str, float]], now: datetime
+    ) -> Optional[float]:
+        """
+        Parse a Retry-After header, given either in seconds or as an HTTP date
+
+        Args:
+            retry_after: header value
+            now: current time, used for HTTP dates
+
+        Returns:
+            seconds to wait, or None if the header is absent or malformed
+        """
+        if retry_after is None:
+            return None
+        try:
+            return max(float(retry_after), 0.0)
+        except ValueError:
+            pass
+        try:
+            return max((parsedate_to_datetime(retry_after) - now).total_seconds(), 0.0)
+        except (TypeError, ValueError):
+            return None
@@ -0,0 +1,140 @@
+"""
+Partitioning of the materials id space across cooperating builders.
+
+A builder configured with a ShardSpec only syncs, selects, builds and writes the materials
+of its shard, so a full sync can be split over N workers or cron hosts, each running
+`main.py --shard i/N`. Shards are assigned either by a hash of the mp_id, which balances
+the shards, or by blocks of consecutive numeric ids, which keeps neighbouring ids on the
+same worker.
+
+Each worker records its RunReportModel in a shared summaries collection under a run id,
+and ShardCoordinator merges the reports of all shards of a run into one.
+"""
+import datetime
+import hashlib
+import logging
+import re
+from typing import Iterable, List, Optional
+
+from maggma.stores import Store
+
+from mpcite.models import RunReportModel
+
+logger = logging.getLogger(__name__)
+
+_NUMBER = re.compile(r"(\d+)$")
+
+
+class ShardSpec:
+    MODES = ("hash", "range")
+
+    def __init__(
+        self, index: int, count: int, mode: str = "hash", block_size: int = 10000
+    ):
+        """
+        Args:
+            index: index of this shard, from 0 to count - 1
+            count: total number of shards
+            mode: "hash" to assign ids by a hash of the mp_id, "range" to assign blocks of
+                `block_size` consecutive numeric ids round robin
+            block_size: number of consecutive numeric ids per block in range mode
+        """
+        assert 0 <= index < count, f"Error: shard index {index} not in [0, {count})"
+        assert mode in self.MODES, f"Error: unknown shard mode {mode}"
+        self.index = index
+        self.count = count
+        self.mode = mode
+        self.block_size = block_size
+
+    @classmethod
+    def parse(cls, spec: str) -> "ShardSpec":
+        """
+        Parse a shard from "i/N" or "i/N:mode", e.g. "0/4" or "2/4:range"
+        """
+        shard, _, mode = spec.partition(":")
+        index, _, count = shard.partition("/")
+        return cls(index=int(index), count=int(count), mode=mode or "hash")
+
+    @property
+    def shard_id(self) -> str:
+        return f"{self.index}/{self.count}:{self.mode}"
+
+    def shard_of(self, mp_id: str) -> int:
+        if self.mode == "range":
+            number = _NUMBER.search(mp_id)
+            if number is not None:
+                return (int(number.group(1)) // self.block_size) % self.count
+        # md5 rather than hash(), which is salted per process
+        digest = hashlib.md5(mp_id.encode("utf-8")).digest()
+        return int.from_bytes(digest[:8], "big") % self.count
+
+    def owns(self, mp_id: str) -> bool:
+        return self.count == 1 or self.shard_of(mp_id) == self.index
+
+    def filter(self, mp_ids: Iterable[str]) -> List[str]:
+        return [mp_id for mp_id in mp_ids if self.owns(mp_id)]
+
+    def as_dict(self) -> dict:
+        return {
+            "index": self.index,
+            "count": self.count,
+            "mode": self.mode,
+            "block_size": self.block_size,
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "ShardSpec":
+        return cls(**d)
+
+
+class ShardCoordinator:
+    """
+    Collects the run reports of the shards of a run, and merges them
+    """
+
+    def __init__(self, summary_store: Store):
+        """
+        Args:
+            summary_store: store of per shard run reports
+        """
+        self.summary_store = summary_store
+
+    def record(self, run_id: str, shard: ShardSpec, report: RunReportModel):
+        """
+        Save the report of one shard of a run, replacing an earlier report of that shard
+        """
+        self.summary_store.update(
+            docs=[
+                {
+                    "summary_id": f"{run_id}#{shard.shard_id}",
+                    "run_id": run_id,
+                    "shard": shard.as_dict(),
+                    "last_updated": datetime.datetime.now(),
+                    "report": report.dict(),
+                }
+            ],
+            key="summary_id",
+        )
+
+    def merge(self, run_id: str) -> Optional[RunReportModel]:
+        """
+        Merge the reports of all shards of a run
+
+        Returns:
+            the merged report, None if no shard reported for this run
+        """
+        docs = list(self.summary_store.query(criteria={"run_id": run_id}))
+        if len(docs) == 0:
+            return None
+        missing = self.missing_shards(docs)
+        if len(missing) > 0:
+            logger.warning(f"Run [{run_id}] has no report of shards {missing}")
+        return RunReportModel.merge(
+            [RunReportModel.parse_obj(doc["report"]) for doc in docs]
+        )
+
+    @staticmethod
+    def missing_shards(docs: List[dict]) -> List[int]:
+        count = max(doc["shard"]["count"] for doc in docs)
+        reported = {doc["shard"]["index"] for doc in docs}
+        return [i for i in range(count) if i not in reported]
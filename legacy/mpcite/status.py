@@ -0,0 +1,275 @@
+"""
+Precomputed summary of the DOI store, for status queries that return in milliseconds.
+
+The summary is a single document in a small summary collection holding
+
+- the number of DOI records in each status, and the number of invalid records
+- the oldest pending records
+- the most recent failures and their errors
+
+Every write to the DOI store through DOIBuilder.update_doi_store updates the summary
+incrementally with atomic $inc and $push operations, so reading it never scans the DOI
+store. `write` reads the status of the records it replaces in one query, and replaces them
+in one bulk write, each only if its status is still the one that was read. The counts
+change by the difference between the two. A record that another builder, e.g. a shard or
+job queue worker, changed in between fails on the unique index of the key instead, and
+is read and written again, so the changes apply one after the other and the counts stay
+exact. The list of oldest pending
+records can only shrink between rebuilds, because a record that becomes one of the oldest
+when another one leaves the list is not known without a scan, so `rebuild` should run
+every now and then, e.g. from cron.
+
+Only the standard library is imported here, so the status CLI starts fast.
+"""
+import datetime
+from typing import Dict, List, Optional
+
+SUMMARY_ID = "doi_status"
+DUPLICATE_KEY = 11000
+
+
+class DOIStatusSummary:
+    def __init__(self, collection, max_pending: int = 20, max_failures: int = 20):
+        """
+        Args:
+            collection: pymongo collection of the summary document
+            max_pending: number of oldest pending records to keep
+            max_failures: number of recent failures to keep
+        """
+        self.collection = collection
+        self.max_pending = max_pending
+        self.max_failures = max_failures
+        # DOI collections known to have a unique index on their key, see `write`
+        self._unique_keys = set()
+
+    def read(self) -> Optional[dict]:
+        """
+        Returns:
+            the summary document, None if it was never built
+        """
+        return self.collection.find_one({"summary_id": SUMMARY_ID}, {"_id": 0})
+
+    def write(self, doi_collection, docs: List[dict], key: str = "material_id"):
+        """
+        Write DOI records in bulk and update the summary with the changes
+
+        Args:
+            doi_collection: pymongo collection of the DOI store
+            docs: DOI records to write
+            key: key of the DOI store
+
+        Returns:
+            None
+        """
+        from pymongo import ReplaceOne
+        from pymongo.errors import BulkWriteError
+
+        if doi_collection.full_name not in self._unique_keys:
+            # a guarded replace that does not match fails on the key instead of
+            # inserting a second record
+            doi_collection.create_index(key, unique=True)
+            self._unique_keys.add(doi_collection.full_name)
+        previous: Dict[str, dict] = dict()
+        remaining = docs
+        while len(remaining) > 0:
+            before = {
+                doc[key]: doc
+                for doc in doi_collection.find(
+                    {key: {"$in": [doc[key] for doc in remaining]}},
+                    {"_id": 0, key: 1, "status": 1, "valid": 1},
+                )
+            }
+            requests = []
+            for doc in remaining:
+                guard = before.get(doc[key], None)
+                if guard is None:
+                    criteria = {key: doc[key], "_id": {"$exists": False}}
+                else:
+                    criteria = {
+                        key: doc[key],
+                        "status": guard.get("status", None),
+                        "valid": guard.get("valid", None),
+                    }
+                requests.append(ReplaceOne(criteria, doc, upsert=True))
+            lost = set()
+            try:
+                doi_collection.bulk_write(requests, ordered=False)
+            except BulkWriteError as e:
+                for error in e.details["writeErrors"]:
+                    if error["code"] != DUPLICATE_KEY:
+                        raise
+                    lost.add(error["index"])
+            for i, doc in enumerate(remaining):
+                if i not in lost and doc[key] in before:
+                    previous[doc[key]] = before[doc[key]]
+            # another writer changed these records since they were read
+            remaining = [doc for i, doc in enumerate(remaining) if i in lost]
+        self.apply(previous=previous, docs=docs)
+
+    def apply(self, previous: Dict[str, dict], docs: List[dict]):
+        """
+        Update the summary with a write to the DOI store, see `write`
+
+        Args:
+            previous: material_id -> status and valid of the records the write replaced,
+                for records that already existed
+            docs: DOI records written
+
+        Returns:
+            None
+        """
+        if len(docs) == 0:
+            return
+        inc: Dict[str, int] = dict()
+
+        def add(field: str, n: int):
+            inc[field] = inc.get(field, 0) + n
+
+        for doc in docs:
+            before = previous.get(doc["material_id"], None)
+            if before is not None:
+                add(f"counts.{before['status']}", -1)
+                add("invalid", 0 if before.get("valid", False) else -1)
+            else:
+                add("total", 1)
+            add(f"counts.{doc['status']}", 1)
+            add("invalid", 0 if doc.get("valid", False) else 1)
+        summary = {"summary_id": SUMMARY_ID}
+        self.collection.update_one(
+            summary,
+            {
+                "$inc": inc,
+                "$set": {"last_updated": datetime.datetime.now()},
+                "$pull": {
+                    "oldest_pending": {
+                        "material_id": {"$in": [doc["material_id"] for doc in docs]}
+                    },
+                    "recent_failures": {
+                        "material_id": {"$in": [doc["material_id"] for doc in docs]}
+                    },
+                },
+            },
+            upsert=True,
+        )
+        pending = [
+            self._pending_entry(doc) for doc in docs if doc["status"] == "PENDING"
+        ]
+        failures = [
+            self._failure_entry(doc) for doc in docs if doc["status"] == "FAILURE"
+        ]
+        push = dict()
+        if len(pending) > 0:
+            push["oldest_pending"] = {
+                "$each": pending,
+                "$sort": {"last_updated": 1},
+                "$slice": self.max_pending,
+            }
+        if len(failures) > 0:
+            push["recent_failures"] = {
+                "$each": failures,
+                "$sort": {"last_updated": -1},
+                "$slice": self.max_failures,
+            }
+        if len(push) > 0:
+            self.collection.update_one(summary, {"$push": push})
+
+    def rebuild(self, doi_collection) -> dict:
+        """
+        Recompute the summary from scratch, scanning the DOI store
+
+        Args:
+            doi_collection: pymongo collection of the DOI store
+
+        Returns:
+            the new summary document
+        """
+        counts = {
+            doc["_id"]: doc["count"]
+            for doc in doi_collection.aggregate(
+                [{"$group": {"_id": "$status", "count": {"$sum": 1}}}]
+            )
+        }
+        summary = {
+            "summary_id": SUMMARY_ID,
+            "last_updated": datetime.datetime.now(),
+            "total": sum(counts.values()),
+            "counts": counts,
+            "invalid": doi_collection.count_documents({"valid": False}),
+            "oldest_pending": [
+                self._pending_entry(doc)
+                for doc in doi_collection.find({"status": "PENDING"})
+                .sort("last_updated", 1)
+                .limit(self.max_pending)
+            ],
+            "recent_failures": [
+                self._failure_entry(doc)
+                for doc in doi_collection.find({"status": "FAILURE"})
+                .sort("last_updated", -1)
+                .limit(self.max_failures)
+            ],
+        }
+        self.collection.replace_one({"summary_id": SUMMARY_ID}, summary, upsert=True)
+        return summary
+
+    @staticmethod
+    def _pending_entry(doc: dict) -> dict:
+        return {"material_id": doc["material_id"], "last_updated": doc["last_updated"]}
+
+    @staticmethod
+    def _failure_entry(doc: dict) -> dict:
+        return {
+            "material_id": doc["material_id"],
+            "last_updated": doc["last_updated"],
+            "error": doc.get("error", None),
+        }
+
+
+def summary_lines(summary: Optional[dict]) -> List[str]:
+    """
+    Human readable status report of a summary document
+    """
+    if summary is None:
+        return ["No status summary yet, run with --status T --rebuild T to build it"]
+    lines = [
+        f"DOI records as of {summary['last_updated']:%Y-%m-%d %H:%M:%S}: "
+        f"[{summary.get('total', 0)}] total, [{summary.get('invalid', 0)}] invalid"
+    ]
+    for status, count in sorted(summary.get("counts", {}).items()):
+        lines.append(f"  {status}: {count}")
+    lines.append("Oldest pending:")
+    for entry in summary.get("oldest_pending", []):
+        lines.append(f"  {entry['material_id']} since {entry['last_updated']:%Y-%m-%d}")
+    lines.append("Recent failures:")
+    for entry in summary.get("recent_failures", []):
+        lines.append(
+            f"  {entry['material_id']} at {entry['last_updated']:%Y-%m-%d %H:%M}: "
+            f"{entry['error']}"
+        )
+    return lines
+
+
+def collection_from_config(store_config: dict):
+    """
+    Connect to the collection of a serialized MongoStore with pymongo directly, which is
+    much faster than deserializing the store with monty
+
+    Args:
+        store_config: MongoStore.as_dict()
+
+    Returns:
+        pymongo collection
+    """
+    from pymongo import MongoClient
+
+    kwargs = dict()
+    if store_config.get("username", ""):
+        kwargs["username"] = store_config["username"]
+        kwargs["password"] = store_config.get("password", "")
+    if store_config.get("auth_source", None) is not None:
+        kwargs["authSource"] = store_config["auth_source"]
+    client = MongoClient(
+        host=store_config.get("host", "localhost"),
+        port=store_config.get("port", 27017),
+        **kwargs,
+    )
+    return client[store_config["database"]][store_config["collection_name"]]
@@ -0,0 +1,187 @@
+"""
+Reachability of site URLs, checked before records are POSTed.
+
+E-Link rejects a record whose site URL it cannot reach with INVALID_URL_STATUS_MESSAGE,
+and we only learn it from the response. `URLChecker` sends a HEAD request to the site
+URL of every record of a batch at once, on an asyncio event loop with at most
+`concurrency` requests in flight, so checking a batch takes about as long as the slowest
+URL rather than the sum of all of them.
+
+Only definite answers are acted upon and cached:
+
+- a 2xx or 3xx response, or 405/501 from a server that does not do HEAD, is reachable
+- a 4xx response other than 401, 403, 408 and 429 is unreachable
+- anything else (5xx, timeouts, connection errors) is unknown, and the record is left
+  for E-Link to judge, so an outage on our side does not hold back a whole batch.
+  401 and 403 are unknown too: a site behind a firewall or bot protection may refuse
+  our probe and still serve E-Link
+
+Results are cached in a store keyed by url for `ttl_hours`, so a nightly run only probes
+the URLs it did not probe recently.
+
+HTTP is spoken with asyncio streams directly, which is all a HEAD request needs, so
+there is no new dependency.
+"""
+import asyncio
+import datetime
+import logging
+import ssl
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+from maggma.core import Store
+
+logger = logging.getLogger(__name__)
+
+REACHABLE_ERROR_STATUSES = (405, 501)
+UNKNOWN_CLIENT_ERROR_STATUSES = (401, 403, 408, 429)
+
+
+def is_reachable(status: int) -> Optional[bool]:
+    """
+    Returns:
+        whether a HTTP status means that the URL is reachable, None if it does not tell
+    """
+    if status < 400 or status in REACHABLE_ERROR_STATUSES:
+        return True
+    if status < 500 and status not in UNKNOWN_CLIENT_ERROR_STATUSES:
+        return False
+    return None
+
+
+async def head_status(url: str, timeout: float) -> int:
+    """
+    Send a HEAD request
+
+    Args:
+        url: http or https URL
+        timeout: seconds to wait for the status line
+
+    Returns:
+        HTTP status of the response
+    """
+    parts = urlsplit(url)
+    https = parts.scheme == "https"
+    port = parts.port or (443 if https else 80)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(
+            parts.hostname,
+            port,
+            ssl=ssl.create_default_context() if https else None,
+        ),
+        timeout=timeout,
+    )
+    try:
+        writer.write(
+            f"HEAD {path} HTTP/1.1\r\n"
+            f"Host: {parts.netloc}\r\n"
+            "User-Agent: mpcite\r\n"
+            "Connection: close\r\n\r\n".encode("ascii")
+        )
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), timeout=timeout)
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            # the status line, if any, was read already
+            pass
+    # e.g. HTTP/1.1 404 Not Found
+    return int(status_line.split()[1])
+
+
+class URLChecker:
+    def __init__(
+        self,
+        cache_store: Optional[Store] = None,
+        ttl_hours: float = 24.0,
+        concurrency: int = 32,
+        timeout: float = 10.0,
+    ):
+        """
+        Args:
+            cache_store: store of the results, keyed by url. No cache if None
+            ttl_hours: hours a result is reused for
+            concurrency: maximum number of requests in flight
+            timeout: seconds to wait for a URL
+        """
+        self.cache_store = cache_store
+        self.ttl_hours = ttl_hours
+        self.concurrency = concurrency
+        self.timeout = timeout
+
+    def check(self, urls: Iterable[str]) -> Dict[str, Optional[bool]]:
+        """
+        Find out which URLs are reachable
+
+        Args:
+            urls: URLs to check
+
+        Returns:
+            url -> True if reachable, False if not, None if unknown
+        """
+        urls = list(set(urls))
+        results = self.cached(urls)
+        missing = [url for url in urls if url not in results]
+        if len(missing) > 0:
+            loop = asyncio.new_event_loop()
+            try:
+                statuses = loop.run_until_complete(self.probe_all(missing))
+            finally:
+                loop.close()
+            self.save(statuses)
+            for url in missing:
+                status = statuses[url]
+                results[url] = None if status is None else is_reachable(status)
+        return results
+
+    async def probe_all(self, urls: List[str]) -> Dict[str, Optional[int]]:
+        """
+        Returns:
+            url -> HTTP status, None if no response came
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def probe(url: str) -> Optional[int]:
+            async with semaphore:
+                try:
+                    return await head_status(url, timeout=self.timeout)
+                except (OSError, asyncio.TimeoutError, ValueError, IndexError) as e:
+                    logger.debug(f"No response from {url}: {e!r}")
+                    return None
+
+        statuses = await asyncio.gather(*[probe(url) for url in urls])
+        return dict(zip(urls, statuses))
+
+    def cached(self, urls: List[str]) -> Dict[str, bool]:
+        if self.cache_store is None or len(urls) == 0:
+            return dict()
+        since = datetime.datetime.now() - datetime.timedelta(hours=self.ttl_hours)
+        return {
+            doc["url"]: doc["reachable"]
+            for doc in self.cache_store.query(
+                criteria={"url": {"$in": urls}, "checked_at": {"$gt": since}},
+                properties=["url", "reachable"],
+            )
+        }
+
+    def save(self, statuses: Dict[str, Optional[int]]):
+        if self.cache_store is None:
+            return
+        now = datetime.datetime.now()
+        docs = [
+            {
+                "url": url,
+                "status": status,
+                "reachable": is_reachable(status),
+                "checked_at": now,
+            }
+            for url, status in statuses.items()
+            if status is not None and is_reachable(status) is not None
+        ]
+        if len(docs) > 0:
+            self.cache_store.update(docs, key="url")
@@ -4,6 +4,7 @@ from mpcite.models import (
     ELinkGetResponseModel,
     DOIRecordModel,
     ExplorerGetJSONResponseModel,
+    ExplorerRecord,
     ElinkResponseStatusEnum,
 )
 from abc import abstractmethod, ABCMeta
@@ -15,15 +16,29 @@ from xmltodict import parse
 from dicttoxml import dicttoxml
 from xml.dom.minidom import parseString
 import json
-from tqdm import tqdm
-import bibtexparser
 import time
-from typing import Any
+from typing import Any, Iterator, Optional
+from mpcite.rate_limiter import AdaptiveRateLimiter
+from mpcite.harvest import ChunkPlanner, harvest
+from mpcite.bibtex import iter_bibtex_entries
+from mpcite.progress import LogSink, ProgressReporter
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 
 class Adapter(metaclass=ABCMeta):
-    def __init__(self, config: ConnectionModel):
+    def __init__(
+        self, config: ConnectionModel, limiter: Optional[AdaptiveRateLimiter] = None
+    ):
         self.config = config
+        self.limiter = (
+            AdaptiveRateLimiter.for_endpoint(config.endpoint)
+            if limiter is None
+            else limiter
+        )
         logging.getLogger("urllib3").setLevel(
             logging.ERROR
         )  # forcefully disable logging from urllib3
@@ -32,6 +47,59 @@ class Adapter(metaclass=ABCMeta):
         )  # forcefully disable logging from dicttoxml
         logging.getLogger("bibtexparser.bparser").setLevel(logging.ERROR)
         self.logger = logging.getLogger(__name__)
+        self.progress = ProgressReporter(sinks=[LogSink(log=self.logger)])
+        # HTTP method -> moving average of the latency of the responses of this adapter
+        self.mean_latency: Dict[str, float] = dict()
+
+    def record_latency(self, method: str, latency: float):
+        previous = self.mean_latency.get(method, None)
+        self.mean_latency[method] = (
+            latency if previous is None else 0.8 * previous + 0.2 * latency
+        )
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Send a request through the rate limiter, retrying on 429, 5xx and connection errors.
+        POSTs are only retried on 429, since after a 5xx or a dropped connection OSTI may
+        already have created the records.
+
+        Args:
+            method: HTTP method
+            url: URL to request
+            **kwargs: passed on to requests.request
+
+        Returns:
+            the last response received, its status code is left for the caller to check
+        """
+        idempotent = method.upper() != "POST"
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            tic = time.perf_counter()
+            try:
+                r = requests.request(method, url, **kwargs)
+            except requests.RequestException as e:
+                delay = self.limiter.release(status_code=None, attempt=attempt)
+                if not idempotent or attempt >= self.limiter.max_retries:
+                    raise HTTPError(f"{method} {url} failed: {e}")
+            else:
+                latency = time.perf_counter() - tic
+                self.record_latency(method.upper(), latency)
+                delay = self.limiter.release(
+                    status_code=r.status_code,
+                    retry_after=r.headers.get("Retry-After"),
+                    attempt=attempt,
+                    latency=latency,
+                )
+                if (
+                    delay is None
+                    or (not idempotent and r.status_code != 429)
+                    or attempt >= self.limiter.max_retries
+                ):
+                    return r
+            self.logger.debug(f"Retrying {method} {url} in {delay:.2f} seconds")
+            self.limiter.sleep(delay)
+            attempt += 1
 
     @abstractmethod
     def post(self, data):
@@ -59,7 +127,8 @@ class ELinkAdapter(Adapter):
         Returns:
             Elink Response.
         """
-        r = requests.post(
+        r = self._request(
+            "POST",
             self.config.endpoint,
             auth=(self.config.username, self.config.password),
             data=data,
@@ -108,7 +177,8 @@ class ELinkAdapter(Adapter):
         Returns:
             Elink Response.
         """
-        r = requests.post(
+        r = self._request(
+            "POST",
             self.config.endpoint,
             auth=(self.config.username, self.config.password),
             data=data,
@@ -184,7 +254,8 @@ class ELinkAdapter(Adapter):
         self.logger.debug(
             "GET from {} w/i payload = {} ...".format(self.config.endpoint, payload)
         )
-        r = requests.get(
+        r = self._request(
+            "GET",
             self.config.endpoint,
             auth=(self.config.username, self.config.password),
             params=payload,
@@ -208,10 +279,11 @@ class ELinkAdapter(Adapter):
             )
             # chunck it up
             result = []
-            for i in tqdm(range(0, len(mp_ids), chunk_size)):
+            for i in self.progress.track(
+                range(0, len(mp_ids), chunk_size), "download_elink"
+            ):
                 chunk = self.get_multiple_helper(mp_ids=mp_ids[i : i + chunk_size])
                 result.extend(chunk)
-                time.sleep(1)
             return result
         else:
             return self.get_multiple_helper(mp_ids=mp_ids)
@@ -228,7 +300,8 @@ class ELinkAdapter(Adapter):
         if len(mp_ids) == 0:
             return []
         payload = {"accession_num": "(" + " ".join(mp_ids) + ")", "rows": len(mp_ids)}
-        r = requests.get(
+        r = self._request(
+            "GET",
             self.config.endpoint,
             auth=(self.config.username, self.config.password),
             params=payload,
@@ -335,7 +408,8 @@ class ExplorerAdapter(Adapter):
             if an item with that OSTI ID exist, return result, otherwise, return None
         """
         payload = {"osti_id": osti_id}
-        r = requests.get(
+        r = self._request(
+            "GET",
             url=self.config.endpoint,
             auth=(self.config.username, self.config.password),
             params=payload,
@@ -361,7 +435,8 @@ class ExplorerAdapter(Adapter):
         payload = {"osti_id": osti_id}
         header = {"Accept": "application/x-bibtex"}
         try:
-            r = requests.get(
+            r = self._request(
+                "GET",
                 url=self.config.endpoint,
                 auth=(self.config.username, self.config.password),
                 params=payload,
@@ -376,36 +451,49 @@ class ExplorerAdapter(Adapter):
         else:
             raise HTTPError(f"Query for OSTI ID = {osti_id} failed")
 
-    def get_multiple_bibtex(self, osti_ids: List[str], chunk_size=10) -> Dict[str, Any]:
+    # OSTI ids in the bibtex query URL are joined with this separator
+    OSTI_ID_SEPARATOR = "%20OR%20"
+
+    def get_multiple_bibtex(
+        self, osti_ids: List[str], chunk_size=10, max_workers=4, max_url_length=4000
+    ) -> Dict[str, Any]:
         """
-        Get multiple bibtex
+        Get multiple bibtex, requesting chunks of OSTI IDs concurrently.
+
+        Chunks start at `chunk_size` ids and are then sized from the URL length and the
+        latency of the responses. Chunks that fail are split in half and retried.
+
         Args:
             osti_ids: List of OSTI ID to query
-            chunk_size: size to query at once
+            chunk_size: size to query at once initially
+            max_workers: maximum number of concurrent requests
+            max_url_length: maximum length of a request URL
 
         Returns:
-
+            OSTI ID -> bibtex entry
         """
         self.logger.info(
             f"Found and downloading [{len(osti_ids)}] Bibtex records in chunk of {chunk_size}"
         )
         if len(osti_ids) == 0:
             return dict()
-        elif len(osti_ids) < chunk_size:
-            return self.get_multiple_bibtex_helper(osti_ids)
-        else:
-            result = dict()
-            for i in tqdm(range(0, len(osti_ids), chunk_size)):
-                try:
-                    result.update(
-                        self.get_multiple_bibtex_helper(osti_ids[i : i + chunk_size])
-                    )
-                    time.sleep(1)
-                except HTTPError:
-                    self.logger.error(
-                        f"Failed to update osti_ids [{osti_ids[i: i + chunk_size]}], skipping"
-                    )
-            return result
+        planner = ChunkPlanner(
+            initial_size=chunk_size,
+            max_url_length=max_url_length,
+            # endpoint, query parameter and rows parameter
+            base_url_length=len(self.config.endpoint) + len("?osti_id=&rows=") + 4,
+            separator_length=len(ExplorerAdapter.OSTI_ID_SEPARATOR),
+        )
+        result, failed = harvest(
+            fetch=self.get_multiple_bibtex_helper,
+            ids=osti_ids,
+            planner=planner,
+            max_workers=max_workers,
+            logger=self.logger,
+        )
+        if len(failed) > 0:
+            self.logger.error(f"Failed to download bibtex of [{len(failed)}] OSTI IDs")
+        return result
 
     def get_multiple_bibtex_helper(self, osti_ids: List[str]) -> Dict[str, str]:
         """
@@ -418,8 +506,11 @@ class ExplorerAdapter(Adapter):
         """
         payload = {"rows": len(osti_ids)}
         header = {"Accept": "application/x-bibtex"}
-        r = requests.get(
-            url=self.config.endpoint + "?osti_id=" + "%20OR%20".join(osti_ids),
+        r = self._request(
+            "GET",
+            url=self.config.endpoint
+            + "?osti_id="
+            + ExplorerAdapter.OSTI_ID_SEPARATOR.join(osti_ids),
             auth=(self.config.username, self.config.password),
             params=payload,
             headers=header,
@@ -432,6 +523,90 @@ class ExplorerAdapter(Adapter):
         else:
             raise HTTPError(f"Query for OSTI IDs = {osti_ids} failed")
 
+    def get_multiple_json(
+        self, osti_ids: List[str], chunk_size=100, max_workers=4, max_url_length=4000
+    ) -> Dict[str, ExplorerRecord]:
+        """
+        Get multiple records in Explorer's JSON format, requesting chunks of OSTI IDs
+        concurrently like get_multiple_bibtex does
+
+        Args:
+            osti_ids: List of OSTI ID to query
+            chunk_size: size to query at once initially
+            max_workers: maximum number of concurrent requests
+            max_url_length: maximum length of a request URL
+
+        Returns:
+            OSTI ID -> compact record
+        """
+        self.logger.info(
+            f"Found and downloading [{len(osti_ids)}] JSON records in chunk of {chunk_size}"
+        )
+        if len(osti_ids) == 0:
+            return dict()
+        planner = ChunkPlanner(
+            initial_size=chunk_size,
+            max_url_length=max_url_length,
+            base_url_length=len(self.config.endpoint) + len("?osti_id=&rows=") + 4,
+            separator_length=len(ExplorerAdapter.OSTI_ID_SEPARATOR),
+        )
+        result, failed = harvest(
+            fetch=self.get_multiple_json_helper,
+            ids=osti_ids,
+            planner=planner,
+            max_workers=max_workers,
+            logger=self.logger,
+        )
+        if len(failed) > 0:
+            self.logger.error(f"Failed to download JSON of [{len(failed)}] OSTI IDs")
+        return result
+
+    def get_multiple_json_helper(self, osti_ids: List[str]) -> Dict[str, ExplorerRecord]:
+        """
+        Get multiple records in JSON, assuming that I can send all osti_ids at once.
+        The response is decoded incrementally when ijson is installed.
+
+        Args:
+            osti_ids: OSTI ID
+
+        Returns:
+            return OSTI -> compact record
+        """
+        payload = {"rows": len(osti_ids)}
+        header = {"Accept": "application/json"}
+        r = self._request(
+            "GET",
+            url=self.config.endpoint
+            + "?osti_id="
+            + ExplorerAdapter.OSTI_ID_SEPARATOR.join(osti_ids),
+            auth=(self.config.username, self.config.password),
+            params=payload,
+            headers=header,
+            stream=ijson is not None,
+        )
+        if r.status_code != 200:
+            raise HTTPError(f"Query for OSTI IDs = {osti_ids} failed")
+        return {record.osti_id: record for record in self.iter_json_records(r)}
+
+    @staticmethod
+    def iter_json_records(r: requests.Response) -> Iterator[ExplorerRecord]:
+        """
+        Decode an Explorer JSON result page into compact records, one at a time
+
+        Args:
+            r: response, streamed if ijson is installed
+
+        Returns:
+            iterator of compact records
+        """
+        if ijson is None:
+            objs = json.loads(r.content) if r.content else []
+        else:
+            r.raw.decode_content = True
+            objs = ijson.items(r.raw, "item")
+        for obj in objs:
+            yield ExplorerRecord.from_json(obj)
+
     def parse_bibtex(self, data: str) -> Dict:
         """
         String of bibtexes in the format of @article{.....}\n@article{.....}
@@ -442,12 +617,8 @@ class ExplorerAdapter(Adapter):
         Returns:
             dictionary of osti-> bibtex
         """
-
-        new_bib = [line for line in data.splitlines() if "= ," not in line]
-        new_bib = "\n".join(new_bib)
-        bib_db: bibtexparser.bibdatabase.BibDatabase = bibtexparser.loads(new_bib)
         result = dict()
-        for entry in bib_db.entries:
+        for entry in iter_bibtex_entries(data):
             osti_id = entry["ID"].split("_")[1]
             result[osti_id] = entry
         return result
@@ -462,7 +633,7 @@ class ElviserAdapter(Adapter):
         else:
             headers = {"x-api-key": self.config.password}
             url = self.config.endpoint
-            r = requests.post(url=url, data=json.dumps(data), headers=headers)
+            r = self._request("POST", url=url, data=json.dumps(data), headers=headers)
             if r.status_code != 202:
                 self.logger.error(
                     f"POST for {data.get('identifier')} errored. Reason: {r.content}"
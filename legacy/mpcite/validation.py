@@ -0,0 +1,103 @@
+"""
+Local checks of E-Link records, run on every batch before it is POSTed.
+
+E-Link rejects records one by one, and we only learn why from the status_message of its
+response after a round trip. The checks here catch, without any request, what E-Link is
+known to refuse:
+
+- a missing or empty required field
+- an abstract longer than the E-Link limit
+- a site URL that is not an http(s) URL
+- a publication date that is not MM/DD/YYYY
+- characters that are not allowed in XML 1.0, which break the whole payload
+
+Every check is a single pass over a field, so a batch of thousands of records is checked
+in milliseconds.
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+from mpcite.descriptions import DESCRIPTION_LIMIT
+from mpcite.models import FailureCategoryEnum, FailureRecordModel
+
+REQUIRED_FIELDS = (
+    "title",
+    "product_nos",
+    "accession_num",
+    "contract_nos",
+    "publication_date",
+    "site_url",
+)
+
+_ILLEGAL_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]")
+_SITE_URL = re.compile(r"https?://[^\s/?#]+\.[^\s/?#]+(/\S*)?")
+_PUBLICATION_DATE = re.compile(r"\d{2}/\d{2}/\d{4}")
+
+
+def check_record(record: dict) -> Optional[Tuple[FailureCategoryEnum, str]]:
+    """
+    Args:
+        record: record to be POSTed, as returned by ELinkGetResponseModel.custom_to_dict
+
+    Returns:
+        category and description of the first problem found, None if there is none
+    """
+    for field in REQUIRED_FIELDS:
+        if not record.get(field, None):
+            return FailureCategoryEnum.MISSING_FIELD, f"Missing required field {field}"
+    description = record.get("description", "") or ""
+    if len(description) > DESCRIPTION_LIMIT:
+        return (
+            FailureCategoryEnum.ABSTRACT_TOO_LONG,
+            f"Abstract has {len(description)} characters, "
+            f"more than the {DESCRIPTION_LIMIT} E-Link accepts",
+        )
+    if _SITE_URL.fullmatch(record["site_url"]) is None:
+        return FailureCategoryEnum.INVALID_URL, f"Invalid site URL {record['site_url']}"
+    if _PUBLICATION_DATE.fullmatch(record["publication_date"]) is None:
+        return (
+            FailureCategoryEnum.INVALID_FIELD,
+            f"Publication date {record['publication_date']} is not MM/DD/YYYY",
+        )
+    for field, value in record.items():
+        if isinstance(value, str) and _ILLEGAL_XML.search(value) is not None:
+            return (
+                FailureCategoryEnum.ILLEGAL_CHARACTERS,
+                f"Field {field} has characters that are not allowed in XML",
+            )
+    return None
+
+
+def split_valid(
+    records: List[dict], fingerprints: Optional[Dict[str, str]] = None
+) -> Tuple[List[dict], List[FailureRecordModel]]:
+    """
+    Separate the records that pass check_record from the ones that do not
+
+    Args:
+        records: records to be POSTed
+        fingerprints: mp_id -> fingerprint of the records, kept on the failures
+
+    Returns:
+        the valid records, and a failure for every invalid one
+    """
+    fingerprints = dict() if fingerprints is None else fingerprints
+    valid: List[dict] = []
+    rejected: List[FailureRecordModel] = []
+    for record in records:
+        problem = check_record(record)
+        if problem is None:
+            valid.append(record)
+            continue
+        category, message = problem
+        mp_id = record.get("accession_num", None) or record.get("product_nos", "")
+        rejected.append(
+            FailureRecordModel(
+                material_id=mp_id,
+                category=category,
+                status_message=f"Rejected before submission: {message}",
+                osti_id=record.get("osti_id", None),
+                fingerprint=fingerprints.get(mp_id, None),
+            )
+        )
+    return valid, rejected
@@ -0,0 +1,147 @@
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class MaterialsWatcher:
+    """
+    Registers DOIs for core materials as soon as they are added or changed.
+
+    Follows a MongoDB change stream on the materials collection, filtered to core
+    materials, and hands the mp_ids it sees to the builder in micro-batches: a batch is
+    submitted when it holds `batch_size` materials, or `max_wait` seconds after its first
+    material arrived, whichever comes first. Change streams need a replica set, a single
+    node one is enough.
+
+    The resume token of the last submitted batch can be kept in a file, so a restarted
+    watcher picks up where the previous one stopped. It only moves forward once a batch
+    was submitted: a batch whose submission failed is kept, with the materials that
+    arrive meanwhile, and submitted again `max_wait` seconds later.
+
+    The materials collection is opened through the builder's MongoClientRegistry, see
+    DOIBuilder.from_dict.
+    """
+
+    def __init__(
+        self,
+        builder,
+        batch_size: int = 100,
+        max_wait: float = 60.0,
+        resume_token_path: Optional[str] = None,
+    ):
+        """
+        Args:
+            builder: DOIBuilder used to build and submit records
+            batch_size: maximum number of materials per submission
+            max_wait: maximum number of seconds a material waits for its batch to fill up
+            resume_token_path: file to keep the resume token in, None to not keep it
+        """
+        self.builder = builder
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.resume_token_path = (
+            None if resume_token_path is None else Path(resume_token_path)
+        )
+        self.resume_token: Optional[dict] = self._load_resume_token()
+
+    def pipeline(self) -> List[dict]:
+        """
+        Aggregation pipeline of the change stream, matching the criteria of
+        DOIBuilder.select_items for new materials
+        """
+        return [
+            {
+                "$match": {
+                    "operationType": {"$in": ["insert", "update", "replace"]},
+                    "fullDocument.sbxn": "core",
+                    "fullDocument.sbxd.id": "core",
+                }
+            }
+        ]
+
+    def run(self, max_batches: Optional[int] = None):
+        """
+        Watch the materials collection and submit micro-batches until the stream closes
+
+        Args:
+            max_batches: stop after submitting this many batches, None to run forever
+
+        Returns:
+            None
+        """
+        assert (
+            self.builder.clients is not None
+        ), "Error: watching needs a builder from DOIBuilder.from_dict"
+        key = self.builder.materials_store.key
+        collection = self.builder.clients.collection(self.builder.materials_store)
+        batch: Dict[str, None] = dict()  # insertion ordered set of mp_ids
+        deadline = 0.0
+        num_batches = 0
+        self.builder.log_info_msg("Watching materials collection for core materials")
+        with collection.watch(
+            pipeline=self.pipeline(),
+            full_document="updateLookup",
+            resume_after=self.resume_token,
+            max_await_time_ms=int(min(self.max_wait, 1.0) * 1000),
+        ) as stream:
+            while stream.alive:
+                change = stream.try_next()
+                if change is not None:
+                    if len(batch) == 0:
+                        deadline = time.monotonic() + self.max_wait
+                    batch[change["fullDocument"][key]] = None
+                if len(batch) > 0 and (
+                    len(batch) >= self.batch_size or time.monotonic() >= deadline
+                ):
+                    if not self.submit(list(batch)):
+                        deadline = time.monotonic() + self.max_wait
+                        continue
+                    batch.clear()
+                    self.resume_token = stream.resume_token
+                    self._save_resume_token()
+                    num_batches += 1
+                    if max_batches is not None and num_batches >= max_batches:
+                        return
+
+    def submit(self, mp_ids: List[str]) -> bool:
+        """
+        Build and submit the records of a micro-batch. Records that cannot be built are
+        logged and left out.
+
+        Args:
+            mp_ids: materials ids of the batch
+
+        Returns:
+            whether the batch was submitted
+        """
+        self.builder.log_info_msg(f"Submitting micro-batch of [{len(mp_ids)}] materials")
+        items = []
+        for mp_id in mp_ids:
+            try:
+                items.append(self.builder.process_item(mp_id))
+            except Exception as e:
+                self.builder.log_err_msg(f"Cannot build record for [{mp_id}]: {e}")
+        try:
+            self.builder.submit_items([item for item in items if item is not None])
+        except Exception as e:
+            self.builder.has_error = True
+            self.builder.log_err_msg(
+                f"Failed to submit micro-batch of [{len(mp_ids)}] materials, "
+                f"retrying in {self.max_wait} seconds: {e}"
+            )
+            return False
+        return True
+
+    def _load_resume_token(self) -> Optional[dict]:
+        if self.resume_token_path is None or not self.resume_token_path.exists():
+            return None
+        return json.loads(self.resume_token_path.read_text())
+
+    def _save_resume_token(self):
+        if self.resume_token_path is None or self.resume_token is None:
+            return
+        self.resume_token_path.write_text(json.dumps(self.resume_token))
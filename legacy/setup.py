@@ -21,6 +21,8 @@ setup(
     keywords=["materials", "citation", "framework", "digital object identifiers"],
     # scripts=glob.glob(os.path.join(SETUP_PTH, "scripts", "*")),
     entry_points={"console_scripts": ["mpcite=mpcite.main:main"]},
+    # streaming decoder of Explorer JSON pages, explorer_format json works without it
+    extras_require={"json": ["ijson"]},
     include_package_data=True,
     package_data={"": ["Visualizations.ipynb"]},
 )
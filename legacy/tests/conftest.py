@@ -0,0 +1,66 @@
+import pytest
+
+
+class FakeClock:
+    """
+    Clock for code that takes a `clock` function, set by assigning to `now`
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.reads = 0
+
+    def __call__(self):
+        self.reads += 1
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+# key of the MemoryStore a builder parameter `<name>=True` stands for
+STORE_KEYS = {
+    "job_store": "material_id",
+    "shard_summary_store": "summary_id",
+    "summary_store": "summary_id",
+    "descriptions_store": "description_hash",
+    "failures_store": "material_id",
+    "url_checks_store": "url",
+}
+
+
+@pytest.fixture
+def builder_kwargs():
+    """
+    DOIBuilder arguments of the `builder` fixture, override or parametrize it
+    """
+    return dict()
+
+
+@pytest.fixture
+def builder(builder_kwargs):
+    """
+    Connected DOIBuilder on MemoryStores that does not sync, unless builder_kwargs say
+    otherwise. Optional stores given as True are MemoryStores, see STORE_KEYS.
+    """
+    from maggma.stores import MemoryStore
+    from mpcite.doi_builder import DOIBuilder
+    from mpcite.models import ConnectionModel
+
+    kwargs = {"sync": False, **builder_kwargs}
+    for name, key in STORE_KEYS.items():
+        if kwargs.get(name, None) is True:
+            kwargs[name] = MemoryStore(key=key)
+    connection = ConnectionModel(endpoint="http://localhost", username="", password="")
+    bld = DOIBuilder(
+        materials_store=MemoryStore(key="task_id"),
+        robocrys_store=MemoryStore(key="material_id"),
+        doi_store=MemoryStore(key="material_id"),
+        elink=connection,
+        explorer=connection,
+        **kwargs,
+    )
+    bld.connect()
+    return bld
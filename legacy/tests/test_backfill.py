@@ -0,0 +1,25 @@
+import pytest
+from mpcite.backfill import run_backfill
+
+
+def build_or_fail(mp_ids):
+    if "mp-bad" in mp_ids:
+        raise RuntimeError("worker failed")
+    return {mp_id: "fingerprint" for mp_id in mp_ids}, b"<records/>", dict()
+
+
+@pytest.mark.parametrize("builder_kwargs", [{"dry_run": True}])
+def test_failed_shard_does_not_stop_backfill(builder):
+    mp_ids = ["mp-0", "mp-1", "mp-bad", "mp-3", "mp-4", "mp-5"]
+    counts = run_backfill(
+        builder,
+        mp_ids,
+        num_workers=1,
+        shard_size=2,
+        max_pending_shards=1,
+        build=build_or_fail,
+    )
+    assert counts["shards"] == 3
+    assert counts["shard_errors"] == 1
+    assert builder.has_error
+    assert builder.report.records_submitted == 4
@@ -0,0 +1,68 @@
+import bibtexparser
+import pytest
+from mpcite.bibtex import dumps_entry, iter_bibtex_entries
+
+ABSTRACT = (
+    "{formula} is alpha Arsenic-like structured and crystallizes in the trigonal R-3m "
+    "space group. The structure is two-dimensional and consists of one {{{formula}}} "
+    "sheet oriented in the (0, 0, 1) direction. 100% of the sites are \"equivalent\"; "
+    "{formula}3- is bonded in a distorted trigonal non-coplanar geometry to three "
+    "equivalent {formula}3- atoms. All bond lengths are 2.52 Å.\n"
+)
+
+
+def osti_entry(osti_id: int, formula: str) -> str:
+    return (
+        f"@misc{{osti_{osti_id},\n"
+        f"title = {{Materials Data on {formula} by Materials Project}},\n"
+        f"author = {{Persson, Kristin}},\n"
+        f"abstractNote = {{{(ABSTRACT * 8).format(formula=formula).strip()}}},\n"
+        f"doi = {{10.17188/{osti_id}}},\n"
+        f"url = {{https://www.osti.gov/biblio/{osti_id}}},\n"
+        f"journal = ,\n"
+        f"place = {{United States}},\n"
+        f"year = {{2020}},\n"
+        f"month = {{5}}\n"
+        f"}}\n\n\n"
+    )
+
+
+@pytest.fixture
+def osti_response() -> str:
+    # Explorer returns 100 entries per bibtex request
+    return "".join(osti_entry(1184812 + i, f"As{i}") for i in range(100))
+
+
+def bibtexparser_entries(data: str):
+    # what ExplorerAdapter.parse_bibtex used to do
+    data = "\n".join(line for line in data.splitlines() if "= ," not in line)
+    return bibtexparser.loads(data).entries
+
+
+def test_same_entries_as_bibtexparser(osti_response: str):
+    assert list(iter_bibtex_entries(osti_response)) == bibtexparser_entries(
+        osti_response
+    )
+
+
+def test_selected_fields(osti_response: str):
+    entry = next(iter_bibtex_entries(osti_response, fields={"abstractnote"}))
+    assert set(entry) == {"ENTRYTYPE", "ID", "abstractnote"}
+
+
+def test_fallback_on_malformed_entries():
+    data = (
+        osti_entry(1, "Si")
+        + '@misc{osti_2,\ntitle = "Materials Data on " # "Ge",\nyear = 2020\n}\n'
+        + osti_entry(3, "C")
+    )
+    entries = list(iter_bibtex_entries(data))
+    assert [e["ID"] for e in entries] == ["osti_1", "osti_2", "osti_3"]
+    assert entries == bibtexparser_entries(data)
+
+
+def test_dumps_entry(osti_response: str):
+    for entry in iter_bibtex_entries(osti_response):
+        db = bibtexparser.bibdatabase.BibDatabase()
+        db.entries = [entry]
+        assert dumps_entry(entry) == bibtexparser.dumps(db)
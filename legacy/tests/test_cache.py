@@ -0,0 +1,36 @@
+from maggma.stores import MemoryStore
+from mpcite.cache import LRUCache, StoreLookup
+
+
+def test_lru_eviction():
+    cache = LRUCache(maxsize=2)
+    cache.put("mp-1", 1)
+    cache.put("mp-2", 2)
+    assert cache.get("mp-1") == 1
+    cache.put("mp-3", 3)
+    assert cache.get("mp-2", None) is None
+    assert cache.get("mp-1") == 1
+    assert cache.stats() == {"size": 2, "hits": 2, "misses": 1, "evictions": 1}
+
+
+def test_ttl(clock):
+    cache = LRUCache(maxsize=2, ttl=10.0, clock=clock)
+    cache.put("mp-1", 1)
+    clock.now = 11.0
+    assert cache.get("mp-1", None) is None
+    assert len(cache) == 0
+
+
+def test_store_lookup():
+    store = MemoryStore(key="material_id")
+    store.connect()
+    store.update([{"material_id": "mp-1", "doi": "10.17188/1"}])
+    lookup = StoreLookup(store=store, cache=LRUCache(maxsize=10))
+
+    assert lookup.get("mp-1")["doi"] == "10.17188/1"
+    assert lookup.get("mp-1")["doi"] == "10.17188/1"
+    # documents that do not exist are cached too
+    assert lookup.get("mp-2") is None
+    assert lookup.get("mp-2") is None
+    assert lookup.stats()["hits"] == 2
+    assert lookup.stats()["misses"] == 2
@@ -0,0 +1,104 @@
+import pytest
+from maggma.stores import MemoryStore, MongoStore
+from mpcite.connections import MongoClientRegistry, store_from_dict
+from mpcite.doi_builder import DOIBuilder
+
+
+def mongo_store(collection_name: str, host: str = "localhost") -> dict:
+    return MongoStore(
+        database="mp_core", collection_name=collection_name, host=host, key="task_id"
+    ).as_dict()
+
+
+def test_stores_on_one_server_share_a_client():
+    clients = MongoClientRegistry()
+    d = mongo_store("materials")
+    materials = store_from_dict(d, clients)
+    robocrys = store_from_dict(mongo_store("robocrys"), clients)
+    other = store_from_dict(mongo_store("dois", host="other.example.org"), clients)
+    assert len(clients) == 2
+    client = materials._collection.database.client
+    assert robocrys._collection.database.client is client
+    assert other._collection.database.client is not client
+    # connecting keeps the shared client, and the config does not change
+    materials.connect()
+    assert materials._collection.database.client is client
+    assert materials.as_dict() == d
+    # closing a store leaves the shared client to the registry
+    materials.close()
+    assert materials._coll is None
+    assert robocrys._collection.database.client is client
+    materials.connect()
+    assert materials._collection.database.client is client
+    clients.close()
+    assert len(clients) == 0
+    # stores reconnect through new shared clients
+    materials.connect(force_reset=True)
+    robocrys.connect(force_reset=True)
+    assert materials._collection.database.client is not client
+    assert robocrys._collection.database.client is materials._collection.database.client
+    clients.close()
+
+
+def test_registry_reports_pool_metrics():
+    clients = MongoClientRegistry()
+    store = store_from_dict(mongo_store("materials"), clients)
+    client = store._collection.database.client
+    assert clients.metrics in client.options.event_listeners
+    clients.close()
+
+
+def test_builder_applies_pool_options():
+    connection = {"endpoint": "http://localhost", "username": "", "password": ""}
+    config = {
+        "materials_collection": mongo_store("materials"),
+        "robocrys_collection": mongo_store("robocrys"),
+        "dois_collection": mongo_store("dois"),
+        "elink": connection,
+        "explorer": connection,
+        "max_doi_requests": 10,
+        "sync": False,
+        "mongo_pool": {"max_pool_size": 5, "read_preference": "secondaryPreferred"},
+    }
+    bld = DOIBuilder.from_dict(config)
+    client = bld.doi_store._collection.database.client
+    assert client.options.pool_options.max_pool_size == 5
+    assert client.read_preference.mongos_mode == "secondaryPreferred"
+    assert bld.clients.metrics in client.options.event_listeners
+    assert bld.as_dict()["mongo_pool"] == config["mongo_pool"]
+    bld.clients.close()
+
+
+def test_other_stores_and_invalid_configs():
+    store = store_from_dict(MemoryStore(key="task_id").as_dict())
+    assert isinstance(store, MemoryStore)
+    d = mongo_store("materials")
+    d["collection_name"] = ""
+    with pytest.raises(ValueError, match="collection_name"):
+        store_from_dict(d)
+
+
+def test_builder_stores_share_a_client():
+    connection = {"endpoint": "http://localhost", "username": "", "password": ""}
+    bld = DOIBuilder.from_dict(
+        {
+            "materials_collection": mongo_store("materials"),
+            "robocrys_collection": mongo_store("robocrys"),
+            "dois_collection": mongo_store("dois"),
+            "elink": connection,
+            "explorer": connection,
+            "max_doi_requests": 10,
+            "sync": False,
+        }
+    )
+    clients = {
+        id(store._collection.database.client)
+        for store in (bld.materials_store, bld.robocrys_store, bld.doi_store)
+    }
+    assert len(clients) == 1
+    assert len(bld.clients) == 1
+    # what maggma's Builder.finalize does, the client stays open for the other stores
+    for store in bld.sources + bld.targets:
+        store.close()
+    bld.clients.close()
+    assert len(bld.clients) == 0
@@ -0,0 +1,66 @@
+import datetime
+from types import SimpleNamespace
+
+import pytest
+from maggma.stores import MemoryStore
+from mpcite.descriptions import DescriptionStore, description_hash
+from mpcite.models import RoboCrysModel
+
+DEFAULT = RoboCrysModel.get_default_description()
+
+
+@pytest.fixture
+def builder_kwargs():
+    return {"descriptions_store": True}
+
+
+def test_descriptions_are_stored_once():
+    store = MemoryStore(key="description_hash")
+    store.connect()
+    descriptions = DescriptionStore(store)
+    hashes = descriptions.put_many(["a  description", "a description\n", "another"])
+    assert hashes[0] == hashes[1] == description_hash("a description")
+    assert store.count() == 2
+    assert DescriptionStore(store).put_many(["another"]) == hashes[2:]
+    assert store.count() == 2
+    assert descriptions.get_many(hashes) == {
+        hashes[0]: "a  description",
+        hashes[2]: "another",
+    }
+
+
+def test_sync_keeps_hashes_in_doi_records(builder):
+    elink = {
+        f"mp-{i}": SimpleNamespace(
+            doi={"#text": f"10.17188/{i}", "@status": "COMPLETED"}
+        )
+        for i in range(3)
+    }
+    bibtex = {
+        f"mp-{i}": {
+            "ENTRYTYPE": "misc",
+            "ID": f"osti_{i}",
+            "title": f"Materials Data on mp-{i}",
+            "abstractnote": DEFAULT if i < 2 else "An outdated description",
+        }
+        for i in range(3)
+    }
+    builder.sync_local_doi_collection(elink, bibtex)
+    assert builder.descriptions_store.count() == 2
+    records = {doc["material_id"]: doc for doc in builder.doi_store.query()}
+    assert records["mp-0"]["description_hash"] == description_hash(DEFAULT)
+    assert "abstractnote" not in records["mp-0"]["bibtex"]
+
+    builder.robocrys_store.update(
+        [
+            {
+                "material_id": f"mp-{i}",
+                "last_updated": datetime.datetime(2024, 1, 1),
+                "description": DEFAULT,
+            }
+            for i in range(3)
+        ]
+    )
+    builder.sync_robocrystal(elink)
+    valid = {doc["material_id"]: doc["valid"] for doc in builder.doi_store.query()}
+    assert valid == {"mp-0": True, "mp-1": True, "mp-2": False}
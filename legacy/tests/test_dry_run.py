@@ -0,0 +1,107 @@
+import datetime
+
+import pytest
+from mpcite.models import ELinkGetResponseModel, RunReportModel
+
+RELEASE = datetime.datetime(2024, 1, 5)
+
+
+@pytest.fixture
+def builder_kwargs():
+    return {
+        "sync": True,
+        "sync_chunk_size": 0,
+        "dry_run": True,
+        "seconds_per_request": 2.0,
+        "report_emails": [],
+    }
+
+
+@pytest.fixture
+def builder(builder):
+    bld = builder
+    bld.materials_store.update(
+        [
+            {
+                "task_id": f"mp-{i}",
+                "sbxn": ["core"],
+                "sbxd": [{"id": "core"}],
+                "last_updated": RELEASE,
+                "pretty_formula": "Si",
+                "chemsys": "Si",
+            }
+            for i in range(3)
+        ]
+    )
+    # mp-0 is already registered, but its DOI record was lost
+    elink_dict = {
+        "mp-0": ELinkGetResponseModel(
+            osti_id="1000",
+            title="Materials Data on Si by Materials Project",
+            product_nos="mp-0",
+            accession_num="mp-0",
+            publication_date="01/05/2024",
+            site_url="https://materialsproject.org/materials/mp-0",
+            keywords="crystal structure; Si; Si",
+            doi={"#text": "10.17188/1000", "@status": "COMPLETED"},
+        )
+    }
+    bld.download_data = lambda keys: (elink_dict, dict())
+    return bld
+
+
+def test_dry_run_selects_after_sync(builder):
+    writes = []
+    builder.doi_store.update = lambda docs, key=None: writes.append(docs)
+    builder.elink_adapter.record_latency("GET", 30.0)
+    builder.run()
+    # mp-0 is synced from E-Link, only mp-1 and mp-2 need to be registered
+    assert builder.report.records_selected == 2
+    assert builder.report.records_submitted == 2
+    assert builder.report.elink_requests == 1
+    assert builder.report.payload_bytes > 0
+    # the configured POST latency, not the one of the GETs
+    assert builder.report.seconds_per_request == 2.0
+    assert builder.report.estimated_wall_time == 2.0
+    assert {"selection", "assembly", "serialization"} <= set(
+        builder.report.stage_timings
+    )
+    # nothing was written
+    assert writes == []
+
+
+def test_scratch_copy_is_dropped(builder):
+    builder.doi_store.update([{"material_id": "mp-9", "valid": True}])
+    collection = builder.doi_store._collection
+    builder.run()
+    assert collection.database.list_collection_names() == [collection.name]
+    # the sync wrote mp-0 to the copy only
+    assert [doc["material_id"] for doc in collection.find()] == ["mp-9"]
+    assert not builder.scratch_doi_store
+
+
+def test_timed_posts_are_used_for_the_estimate(builder):
+    builder.elink_adapter.record_latency("POST", 0.5)
+    builder.run()
+    assert builder.report.seconds_per_request == 0.5
+    assert builder.report.estimated_wall_time == 0.5
+
+
+def test_report_summary():
+    report = RunReportModel(
+        dry_run=True,
+        records_selected=3,
+        records_submitted=2,
+        payload_bytes=100,
+        elink_requests=1,
+        seconds_per_request=1.5,
+        estimated_wall_time=1.5,
+        stage_timings={"assembly": 0.25},
+    )
+    lines = report.summary_lines()
+    assert lines[0].startswith("[DRY RUN] [3] records selected")
+    assert "[2] records submitted" in lines[0]
+    assert lines[1] == "Payload: [100] bytes in [1] requests"
+    assert lines[2] == "Estimated E-Link time: 1.5 seconds at 1.50 seconds per request"
+    assert lines[3] == "Stage [assembly] took 0.25 seconds"
+    assert RunReportModel.parse_obj(report.dict()) == report
@@ -0,0 +1,101 @@
+import io
+import json
+
+import pytest
+from mpcite import utility
+from mpcite.bibtex import dumps_entry, iter_bibtex_entries
+from mpcite.models import (
+    ConnectionModel,
+    DOIRecordModel,
+    ELinkGetResponseModel,
+    ExplorerRecord,
+)
+from mpcite.utility import ExplorerAdapter
+
+PAGE = [
+    {
+        "osti_id": "1000",
+        "title": "Materials Data on Si by Materials Project",
+        "doi": "10.17188/1000",
+        "authors": ["Persson, Kristin [LBNL Materials Project]"],
+        "description": "Si is diamond structured.",
+        "publication_date": "2020-05-01T00:00:00Z",
+        "country_publication": "United States",
+    },
+    # not registered yet
+    {"osti_id": 1001, "title": "Materials Data on C", "doi": None, "authors": None},
+]
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, objs):
+        self.content = json.dumps(objs).encode()
+        self.raw = io.BytesIO(self.content)
+
+
+def test_record_from_json():
+    record, unregistered = [ExplorerRecord.from_json(obj) for obj in PAGE]
+    assert record.authors == ("Persson, Kristin",)
+    entry = record.to_bibtex_entry()
+    assert entry["ID"] == "osti_1000"
+    assert entry["abstractnote"] == "Si is diamond structured."
+    assert (entry["year"], entry["month"]) == ("2020", "5")
+
+    assert unregistered.osti_id == "1001"
+    assert unregistered.doi == "" and unregistered.authors == ()
+    entry = unregistered.to_bibtex_entry()
+    assert "doi" not in entry
+    assert list(iter_bibtex_entries(dumps_entry(entry))) == [entry]
+
+
+@pytest.mark.parametrize("streaming", [True, False])
+def test_iter_json_records(monkeypatch, streaming):
+    if not streaming:
+        monkeypatch.setattr(utility, "ijson", None)
+    elif utility.ijson is None:
+        pytest.skip("ijson is not installed")
+    records = list(ExplorerAdapter.iter_json_records(FakeResponse(PAGE)))
+    assert records == [ExplorerRecord.from_json(obj) for obj in PAGE]
+
+
+def test_get_multiple_json(monkeypatch):
+    adapter = ExplorerAdapter(
+        ConnectionModel(endpoint="http://localhost", username="", password="")
+    )
+    requested = []
+
+    def request(method, url, **kwargs):
+        osti_ids = url.split("osti_id=")[1].split(ExplorerAdapter.OSTI_ID_SEPARATOR)
+        requested.append(osti_ids)
+        return FakeResponse([obj for obj in PAGE if str(obj["osti_id"]) in osti_ids])
+
+    monkeypatch.setattr(adapter, "_request", request)
+    records = adapter.get_multiple_json(osti_ids=["1000", "1001"], chunk_size=1)
+    assert sorted(records) == ["1000", "1001"]
+    assert records["1001"].doi == ""
+    assert sorted(map(tuple, requested)) == [("1000",), ("1001",)]
+
+
+@pytest.mark.parametrize("builder_kwargs", [{"explorer_format": "json"}])
+def test_sync_keeps_json_records(builder):
+    elink = ELinkGetResponseModel(
+        osti_id="1000",
+        title="Materials Data on Si by Materials Project",
+        product_nos="mp-1",
+        accession_num="mp-1",
+        publication_date="05/01/2020",
+        site_url="https://materialsproject.org/materials/mp-1",
+        keywords="crystal structure; Si; Si",
+        doi={"#text": "10.17188/1000", "@status": "COMPLETED"},
+    )
+    builder.sync_local_doi_collection(
+        {"mp-1": elink}, {"mp-1": ExplorerRecord.from_json(PAGE[0])}
+    )
+    record = DOIRecordModel.parse_obj(builder.doi_store.query_one())
+    assert record.bibtex is None
+    assert record.get_abstract() == "Si is diamond structured."
+    assert record.get_bibtex() == dumps_entry(
+        ExplorerRecord.from_json(PAGE[0]).to_bibtex_entry()
+    )
@@ -0,0 +1,112 @@
+import datetime
+
+import pytest
+from maggma.stores import MemoryStore
+from mpcite.failures import FailureIndex, categorize
+from mpcite.models import (
+    ELinkGetResponseModel,
+    ELinkPostResponseModel,
+    FailureCategoryEnum,
+    FailureRecordModel,
+)
+from mpcite.utility import ELinkAdapter
+
+
+@pytest.fixture
+def index():
+    store = MemoryStore(key="material_id")
+    store.connect()
+    index = FailureIndex(store)
+    index.ensure_indexes()
+    return index
+
+
+def failure(mp_id: str, message: str, fingerprint: str = "a") -> FailureRecordModel:
+    return FailureRecordModel(
+        material_id=mp_id,
+        category=categorize(message),
+        status_message=message,
+        fingerprint=fingerprint,
+    )
+
+
+def test_categorize():
+    assert (
+        categorize(ELinkAdapter.MAXIMUM_ABSTRACT_LENGTH_MESSAGE)
+        == FailureCategoryEnum.ABSTRACT_TOO_LONG
+    )
+    assert (
+        categorize(ELinkAdapter.INVALID_URL_STATUS_MESSAGE)
+        == FailureCategoryEnum.INVALID_URL
+    )
+    assert categorize("Something else") == FailureCategoryEnum.UNKNOWN
+    assert categorize(None) == FailureCategoryEnum.UNKNOWN
+
+
+def test_only_hopeless_retries_are_blocked(index):
+    index.record(
+        [
+            failure("mp-1", ELinkAdapter.MAXIMUM_ABSTRACT_LENGTH_MESSAGE),
+            failure("mp-2", ELinkAdapter.INVALID_URL_STATUS_MESSAGE),
+            failure("mp-3", ELinkAdapter.INVALID_URL_STATUS_MESSAGE),
+            failure("mp-4", "Something else"),
+        ]
+    )
+    index.record([failure("mp-1", ELinkAdapter.MAXIMUM_ABSTRACT_LENGTH_MESSAGE)])
+    # the URL of mp-3 was last rejected long ago
+    index.collection.update_one(
+        {"material_id": "mp-3"},
+        {"$set": {"last_seen": datetime.datetime.now() - datetime.timedelta(days=30)}},
+    )
+    fingerprints = {f"mp-{i}": "a" for i in range(5)}
+    assert index.blocked(fingerprints) == {
+        "mp-1": FailureCategoryEnum.ABSTRACT_TOO_LONG,
+        "mp-2": FailureCategoryEnum.INVALID_URL,
+    }
+    # new content is worth a try
+    assert index.blocked({**fingerprints, "mp-1": "b"}).keys() == {"mp-2"}
+
+    assert index.counts() == {"ABSTRACT_TOO_LONG": 1, "INVALID_URL": 2, "UNKNOWN": 1}
+    [mp_1] = index.query(category=FailureCategoryEnum.ABSTRACT_TOO_LONG)
+    assert mp_1.attempts == 2
+    assert mp_1.first_seen < mp_1.last_seen
+    index.resolve(["mp-1"])
+    assert index.blocked(fingerprints).keys() == {"mp-2"}
+
+
+@pytest.mark.parametrize("builder_kwargs", [{"failures_store": True}])
+def test_builder_records_and_skips_rejections(monkeypatch, builder):
+    records = [
+        {"accession_num": f"mp-{i}", "title": f"Materials Data on mp-{i}"}
+        for i in range(2)
+    ]
+    fingerprints = {
+        r["accession_num"]: ELinkGetResponseModel.get_fingerprint(r) for r in records
+    }
+
+    def post(data):
+        return [
+            ELinkPostResponseModel(
+                osti_id=str(i),
+                accession_num=f"mp-{i}",
+                product_nos=f"mp-{i}",
+                title=f"Materials Data on mp-{i}",
+                contract_nos="AC02-05CH11231",
+                other_identifying_nos=None,
+                doi={"#text": f"10.17188/{i}", "@status": "PENDING"},
+                status="FAILURE" if i == 0 else "SUCCESS",
+                status_message=ELinkAdapter.MAXIMUM_ABSTRACT_LENGTH_MESSAGE
+                if i == 0
+                else None,
+            )
+            for i in range(2)
+        ]
+
+    monkeypatch.setattr(builder.elink_adapter, "post", post)
+    builder.submit_elink_data(data=b"", fingerprints=fingerprints)
+    error = builder.doi_store.query_one(criteria={"material_id": "mp-0"})["error"]
+    assert error.startswith("ABSTRACT_TOO_LONG")
+    assert builder.failure_index.counts() == {"ABSTRACT_TOO_LONG": 1}
+
+    assert [r["accession_num"] for r in builder.filter_blocked(records)] == ["mp-1"]
+    assert builder.report.records_blocked == 1
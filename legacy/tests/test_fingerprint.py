@@ -0,0 +1,54 @@
+import pytest
+from mpcite.models import ELinkGetResponseModel
+
+RECORD = {
+    "accession_num": "mp-1",
+    "title": "Materials Data on Si by Materials Project",
+    "keywords": "crystal structure; Si; Si",
+    "description": "Si is diamond structured.",
+    "publication_date": "01/05/2024",
+    "site_url": "https://materialsproject.org/materials/mp-1",
+    "country": "US",
+}
+
+
+def test_fingerprint_is_canonical():
+    fingerprint = ELinkGetResponseModel.get_fingerprint(RECORD)
+    reordered = dict(reversed(list(RECORD.items())))
+    assert ELinkGetResponseModel.get_fingerprint(reordered) == fingerprint
+    spaced = {**RECORD, "description": "  Si is diamond\n structured. "}
+    assert ELinkGetResponseModel.get_fingerprint(spaced) == fingerprint
+    # fields that are not displayed do not count
+    assert ELinkGetResponseModel.get_fingerprint({**RECORD, "country": "FR"}) == (
+        fingerprint
+    )
+
+
+@pytest.mark.parametrize("field", ELinkGetResponseModel.FINGERPRINT_FIELDS)
+def test_fingerprint_follows_content(field):
+    changed = {**RECORD, field: RECORD[field] + " changed"}
+    assert ELinkGetResponseModel.get_fingerprint(
+        changed
+    ) != ELinkGetResponseModel.get_fingerprint(RECORD)
+
+
+def test_filter_unchanged(builder):
+    unchanged = {**RECORD, "accession_num": "mp-1"}
+    changed = {**RECORD, "accession_num": "mp-2"}
+    builder.doi_store.update(
+        [
+            {
+                "material_id": "mp-1",
+                "fingerprint": ELinkGetResponseModel.get_fingerprint(unchanged),
+            },
+            {
+                "material_id": "mp-2",
+                "fingerprint": ELinkGetResponseModel.get_fingerprint(
+                    {**changed, "title": "Old title"}
+                ),
+            },
+        ]
+    )
+    new = {**RECORD, "accession_num": "mp-3"}
+    assert builder.filter_unchanged([unchanged, changed, new]) == [changed, new]
+    assert builder.report.records_unchanged == 1
@@ -0,0 +1,41 @@
+from collections import deque
+from typing import Dict, List
+
+from mpcite.harvest import ChunkPlanner, harvest
+from urllib3.exceptions import HTTPError
+
+
+def test_chunks_respect_url_length():
+    planner = ChunkPlanner(
+        initial_size=100, max_url_length=50, base_url_length=20, separator_length=8
+    )
+    pending = deque(["1184812"] * 10)
+    # 20 + 7 + 2 * (8 + 7) = 57 would exceed 50
+    assert len(planner.take(pending)) == 2
+    assert len(pending) == 8
+
+
+def test_chunk_size_follows_latency():
+    planner = ChunkPlanner(initial_size=100, step=10, target_latency=1.0)
+    planner.observe(size=100, latency=0.5)
+    assert planner.size == 110
+    planner.observe(size=110, latency=2.0)
+    assert planner.size == 82
+
+
+def test_failing_chunks_are_split():
+    requested: List[List[str]] = []
+
+    def fetch(chunk: List[str]) -> Dict[str, str]:
+        requested.append(chunk)
+        if "bad" in chunk:
+            raise HTTPError("failed")
+        return {osti_id: f"bibtex of {osti_id}" for osti_id in chunk}
+
+    ids = [str(i) for i in range(20)] + ["bad"] + [str(i) for i in range(20, 40)]
+    result, failed = harvest(
+        fetch=fetch, ids=ids, planner=ChunkPlanner(initial_size=8), max_workers=3
+    )
+    assert failed == ["bad"]
+    assert set(result) == set(ids) - {"bad"}
+    assert ["bad"] in requested
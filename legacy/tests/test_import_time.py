@@ -0,0 +1,40 @@
+import os
+import re
+import subprocess
+import sys
+
+HEAVY_MODULES = ("maggma", "monty", "nbconvert", "nbformat", "bibtexparser", "tqdm")
+
+
+def import_times(module: str) -> dict:
+    """
+    Cumulative import time in microseconds of every module imported by `module`, as
+    reported by python -X importtime
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+        # the child finds mpcite wherever pytest did
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+    )
+    times = dict()
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| \s*(\S+)", line)
+        if match is not None:
+            times[match.group(2)] = int(match.group(1))
+    return times
+
+
+def test_cli_imports_fast():
+    times = import_times("mpcite.main")
+    assert "mpcite.main" in times
+    assert [m for m in times if m.split(".")[0] in HEAVY_MODULES] == []
+
+
+def test_builder_does_not_import_report_dependencies():
+    times = import_times("mpcite.doi_builder")
+    assert "mpcite.doi_builder" in times
+    assert "nbconvert" not in times
+    assert "nbformat" not in times
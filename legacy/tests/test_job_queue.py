@@ -0,0 +1,58 @@
+import datetime
+
+import pytest
+from maggma.stores import MemoryStore
+from mpcite.job_queue import DOIJobQueue
+
+
+@pytest.fixture
+def job_store():
+    store = MemoryStore(collection_name="doi_jobs", key="material_id")
+    store.connect()
+    yield store
+    store.close()
+
+
+def test_claim_by_priority_without_double_claims(job_store):
+    first = DOIJobQueue(job_store, owner="first")
+    second = DOIJobQueue(job_store, owner="second")
+    first.ensure_indexes()
+    assert first.enqueue(["mp-1", "mp-2"], priority=0) == 2
+    assert first.enqueue(["mp-3"], priority=2) == 1
+    # already queued, only its priority is raised
+    assert first.enqueue(["mp-2"], priority=1) == 0
+
+    assert [job.material_id for job in first.claim(limit=2)] == ["mp-3", "mp-2"]
+    assert [job.material_id for job in second.claim(limit=2)] == ["mp-1"]
+    assert second.claim(limit=1) == []
+
+    # only the lease owner can complete a job
+    assert second.complete(["mp-3"]) == 0
+    assert first.complete(["mp-3", "mp-2"]) == 2
+    assert first.counts()["DONE"] == 2
+
+
+def test_expired_lease_returns_job(job_store):
+    crashed = DOIJobQueue(job_store, owner="crashed", max_attempts=2)
+    other = DOIJobQueue(job_store, owner="other", max_attempts=2)
+    crashed.enqueue(["mp-1"])
+    crashed.claim()
+    assert other.claim() == []
+
+    job_store._collection.update_one(
+        {"material_id": "mp-1"},
+        {"$set": {"lease_expires": datetime.datetime.now() - datetime.timedelta(1)}},
+    )
+    jobs = other.claim()
+    assert [(job.material_id, job.attempts) for job in jobs] == [("mp-1", 2)]
+    assert crashed.complete(["mp-1"]) == 0
+
+    # out of attempts
+    assert other.fail(["mp-1"], "E-Link unavailable") == 1
+    job = job_store.query_one({"material_id": "mp-1"})
+    assert (job["state"], job["last_error"]) == ("FAILED", "E-Link unavailable")
+    assert other.claim() == []
+
+    # enqueuing again resets the attempts
+    assert other.enqueue(["mp-1"]) == 1
+    assert [job.attempts for job in other.claim()] == [1]
@@ -0,0 +1,60 @@
+import threading
+import time
+
+import pytest
+from mpcite.pipeline import run_pipeline
+
+
+def test_stages_overlap():
+    def slow(seconds):
+        def stage(item):
+            time.sleep(seconds)
+            return item
+
+        return stage
+
+    tic = time.perf_counter()
+    results, busy = run_pipeline(
+        source=range(10),
+        stages=[("elink", slow(0.05)), ("bibtex", slow(0.05)), ("sync", slow(0.05))],
+    )
+    wall_time = time.perf_counter() - tic
+    assert results == list(range(10))
+    assert set(busy) == {"elink", "bibtex", "sync"}
+    # sequentially this takes 1.5 seconds, pipelined about 0.6
+    assert wall_time < 1.0
+
+
+def test_queues_are_bounded():
+    fed = []
+    release = threading.Event()
+
+    def source():
+        for i in range(100):
+            fed.append(i)
+            yield i
+
+    def blocked(item):
+        release.wait()
+        return item
+
+    thread = threading.Thread(
+        target=run_pipeline, args=(source(), [("a", lambda x: x), ("b", blocked)], 2)
+    )
+    thread.start()
+    time.sleep(0.3)
+    # 1 item in b, 2 waiting for b, 1 in a, 2 waiting for a, 1 blocked being fed
+    assert len(fed) <= 7
+    release.set()
+    thread.join()
+    assert len(fed) == 100
+
+
+def test_errors_stop_the_pipeline():
+    def fail(item):
+        if item == 3:
+            raise ValueError("bad chunk")
+        return item
+
+    with pytest.raises(ValueError, match="bad chunk"):
+        run_pipeline(source=range(1000), stages=[("a", lambda x: x), ("b", fail)])
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+from mpcite.progress import JSONLSink, ProgressReporter, ProgressSink, ProgressTracker
+
+
+class ListSink(ProgressSink):
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event):
+        self.events.append(event)
+
+
+def test_sampled_events(clock):
+    sink = ListSink()
+    tracker = ProgressTracker(
+        "sync", total=1000, sinks=[sink], interval=10.0, check_every=100, clock=clock
+    )
+    for i in range(1000):
+        clock.now = i * 0.1
+        tracker.update(nbytes=10)
+    tracker.close()
+    # the clock is read at construction, every 100 items and on close
+    assert clock.reads == 12
+    assert [e.done for e in sink.events] == list(range(200, 1001, 100)) + [1000]
+    event = sink.events[0]
+    assert event.rate == pytest.approx(200 / 19.9)
+    assert event.eta == pytest.approx(800 / event.rate)
+    assert sink.events[-1].final and sink.events[-1].nbytes == 10000
+
+
+def test_track_to_jsonl(tmp_path):
+    path = tmp_path / "progress.jsonl"
+    reporter = ProgressReporter(
+        sinks=[JSONLSink(str(path))], interval=0.0, check_every=1
+    )
+    assert list(reporter.track(["mp-1", "mp-2"], "items")) == ["mp-1", "mp-2"]
+    events = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [(e["stage"], e["done"], e["total"], e["final"]) for e in events] == [
+        ("items", 1, 2, False),
+        ("items", 2, 2, False),
+        ("items", 2, 2, True),
+    ]
+
+
+def test_from_config(tmp_path):
+    reporter = ProgressReporter.from_config(
+        {"interval": 30, "jsonl_path": str(tmp_path / "p.jsonl"), "log": False}
+    )
+    assert reporter.interval == 30
+    assert [type(s).__name__ for s in reporter.sinks] == ["JSONLSink"]
@@ -0,0 +1,56 @@
+import pytest
+from mpcite.rate_limiter import AdaptiveRateLimiter, CircuitOpenError
+
+
+@pytest.fixture
+def limiter(clock):
+    return AdaptiveRateLimiter(
+        initial_concurrency=4.0,
+        failure_threshold=3,
+        reset_timeout=30.0,
+        clock=clock,
+        rng=lambda: 1.0,
+    )
+
+
+def test_aimd(limiter: AdaptiveRateLimiter):
+    limiter.acquire()
+    assert limiter.release(status_code=200) is None
+    assert limiter.limit == pytest.approx(4.25)
+
+    limiter.acquire()
+    assert limiter.release(status_code=503, attempt=2) == pytest.approx(4.0)
+    assert limiter.limit == pytest.approx(2.125)
+
+    # client errors are not a sign of pushback
+    limiter.acquire()
+    assert limiter.release(status_code=404) is None
+    assert limiter.consecutive_failures == 0
+
+
+def test_retry_after(limiter: AdaptiveRateLimiter):
+    limiter.acquire()
+    assert limiter.release(status_code=429, retry_after="7") == 7.0
+    assert limiter._not_before == 7.0
+
+
+def test_circuit_breaker(limiter: AdaptiveRateLimiter, clock):
+    for _ in range(3):
+        limiter.acquire()
+        limiter.release(status_code=500)
+    assert limiter.state == AdaptiveRateLimiter.OPEN
+    with pytest.raises(CircuitOpenError):
+        limiter.acquire()
+
+    # a single probe is let through after the reset timeout
+    clock.now = 31.0
+    limiter.acquire()
+    assert limiter.state == AdaptiveRateLimiter.HALF_OPEN
+    limiter.release(status_code=200)
+    assert limiter.state == AdaptiveRateLimiter.CLOSED
+
+
+def test_shared_by_host():
+    a = AdaptiveRateLimiter.for_endpoint("https://www.osti.gov/elink/2416api")
+    b = AdaptiveRateLimiter.for_endpoint("https://www.osti.gov/api/v1/records")
+    assert a is b
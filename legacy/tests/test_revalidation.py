@@ -0,0 +1,160 @@
+import datetime
+
+import pytest
+from mpcite.doi_builder import DOIBuilder
+from mpcite.models import ELinkGetResponseModel
+from mpcite.sharding import ShardSpec
+from mpcite.status import DOIStatusSummary
+
+NOW = datetime.datetime(2024, 1, 10)
+RELEASE = datetime.datetime(2024, 1, 5)
+LONG_AGO = datetime.datetime(2023, 1, 1)
+
+
+@pytest.fixture
+def builder_kwargs():
+    return {"summary_store": True}
+
+
+@pytest.fixture
+def builder(builder):
+    bld = builder
+    bld.summary_store.update(
+        [{"summary_id": "revalidation_watermark", "watermark": LONG_AGO}]
+    )
+    # mp-0 to mp-2 changed in the release, mp-1 was validated after it
+    bld.materials_store.update(
+        [
+            {
+                "task_id": f"mp-{i}",
+                "sbxn": ["core"],
+                "sbxd": [{"id": "core"}],
+                "last_updated": RELEASE if i < 3 else LONG_AGO,
+            }
+            for i in range(6)
+        ]
+    )
+    bld.doi_store.update(
+        [
+            {
+                "material_id": f"mp-{i}",
+                "status": "COMPLETED",
+                "valid": True,
+                "last_updated": LONG_AGO,
+                "last_validated_on": NOW if i == 1 else LONG_AGO,
+            }
+            for i in range(6)
+        ]
+    )
+    return bld
+
+
+def elink_record(mp_id: str) -> ELinkGetResponseModel:
+    return ELinkGetResponseModel(
+        osti_id=None,
+        title=f"Materials Data on {mp_id} by Materials Project",
+        product_nos=mp_id,
+        accession_num=mp_id,
+        publication_date="01/05/2024",
+        site_url=f"https://materialsproject.org/materials/{mp_id}",
+        keywords="crystal structure",
+    )
+
+
+def submit(builder: DOIBuilder, mp_ids):
+    posted = []
+
+    def post_to_elink(elink_post_data):
+        posted.extend(elink_post_data)
+
+    builder.post_to_elink = post_to_elink
+    builder.submit_items(
+        [{"elink_post_record": elink_record(mp_id)} for mp_id in mp_ids]
+    )
+    return [r["accession_num"] for r in posted]
+
+
+def test_changed_materials_are_revalidated(builder):
+    selected = builder.select_items()
+    assert sorted(selected) == ["mp-0", "mp-2"]
+    # not submitted yet
+    builder.save_revalidation_watermark()
+    assert builder.revalidation_watermark() == LONG_AGO
+    assert sorted(submit(builder, selected)) == ["mp-0", "mp-2"]
+    builder.save_revalidation_watermark()
+    assert builder.revalidation_watermark() == RELEASE
+    # nothing changed since
+    assert builder.select_changed_materials() == []
+
+
+def test_watermark_kept_when_capped(builder):
+    builder.max_doi_requests = 1
+    selected = builder.select_items()
+    assert len(selected) == 1
+    submit(builder, selected)
+    builder.save_revalidation_watermark()
+    assert builder.revalidation_watermark() == LONG_AGO
+
+
+def test_watermark_per_shard(builder):
+    shards = [ShardSpec(index=i, count=2) for i in range(2)]
+    owned = [shard.filter(["mp-0", "mp-2"]) for shard in shards]
+    assert all(len(mp_ids) == 1 for mp_ids in owned), "pick ids in both shards"
+    builder.summary_store.update(
+        [
+            {
+                "summary_id": f"revalidation_watermark#{shard.shard_id}",
+                "watermark": LONG_AGO,
+            }
+            for shard in shards
+        ]
+    )
+    builder.shard = shards[0]
+    assert builder.select_items() == owned[0]
+    submit(builder, owned[0])
+    builder.save_revalidation_watermark()
+    assert builder.revalidation_watermark() == RELEASE
+    # the other shard still revalidates its own materials
+    builder.shard = shards[1]
+    assert builder.revalidation_watermark() == LONG_AGO
+    assert builder.select_items() == owned[1]
+
+
+def test_unchanged_records_keep_summary_consistent(builder):
+    summary = DOIStatusSummary(builder.summary_store._collection)
+    summary.rebuild(builder.doi_store._collection)
+    builder.doi_store.update(
+        [
+            {
+                **builder.doi_store.query_one(criteria={"material_id": "mp-0"}),
+                "fingerprint": ELinkGetResponseModel.get_fingerprint(
+                    ELinkGetResponseModel.custom_to_dict(elink_record("mp-0"))
+                ),
+            }
+        ]
+    )
+    assert submit(builder, ["mp-0", "mp-2"]) == ["mp-2"]
+    validated = builder.doi_store.query_one(criteria={"material_id": "mp-0"})
+    assert validated["last_validated_on"] > NOW
+    assert validated["status"] == "COMPLETED"
+    incremental = summary.read()
+    rebuilt = summary.rebuild(builder.doi_store._collection)
+    for field in ("counts", "total", "invalid"):
+        assert rebuilt[field] == incremental[field]
+
+
+@pytest.mark.parametrize(
+    "builder_kwargs",
+    [{"summary_store": True, "sync": True, "sync_chunk_size": 0}],
+)
+def test_sync_keeps_changed_materials_stale(builder):
+    elink_dict = {}
+    for i in range(6):
+        record = elink_record(f"mp-{i}")
+        record.osti_id = str(1000 + i)
+        record.doi = {"#text": f"10.17188/{1000 + i}", "@status": "COMPLETED"}
+        elink_dict[f"mp-{i}"] = record
+    builder.download_data = lambda keys: (elink_dict, dict())
+    assert sorted(builder.get_items()) == ["mp-0", "mp-2"]
+    synced = builder.doi_store.query_one(criteria={"material_id": "mp-1"})
+    assert synced["last_validated_on"] == NOW
@@ -0,0 +1,52 @@
+from maggma.stores import MemoryStore
+from mpcite.models import RunReportModel
+from mpcite.sharding import ShardCoordinator, ShardSpec
+
+MP_IDS = [f"mp-{i}" for i in range(1000)]
+
+
+def test_shards_partition_ids():
+    for mode in ShardSpec.MODES:
+        shards = [ShardSpec(index=i, count=4, mode=mode, block_size=50) for i in range(4)]
+        owned = [set(shard.filter(MP_IDS)) for shard in shards]
+        assert sum(len(o) for o in owned) == len(MP_IDS)
+        assert set().union(*owned) == set(MP_IDS)
+        assert all(150 < len(o) < 350 for o in owned)
+
+
+def test_range_shards_keep_blocks_together():
+    shard = ShardSpec.parse("1/4:range")
+    shard.block_size = 50
+    assert shard.filter(MP_IDS)[:3] == ["mp-50", "mp-51", "mp-52"]
+    assert shard.shard_id == "1/4:range"
+
+
+def test_merge_shard_reports():
+    store = MemoryStore(key="summary_id")
+    store.connect()
+    coordinator = ShardCoordinator(store)
+    for i in range(2):
+        report = RunReportModel(
+            records_selected=10,
+            records_submitted=5,
+            elink_requests=1,
+            estimated_wall_time=2.0 * (i + 1),
+            stage_timings={"selection": 1.0 + i},
+        )
+        coordinator.record("run", ShardSpec(index=i, count=3), report)
+    # a rerun of a shard replaces its report
+    coordinator.record("run", ShardSpec(index=1, count=3), report)
+
+    merged = coordinator.merge("run")
+    assert merged.records_selected == 20
+    assert merged.records_submitted == 10
+    # shards run in parallel, wall times are the ones of the slowest shard
+    assert merged.estimated_wall_time == 4.0
+    assert merged.estimated_request_seconds == 6.0
+    assert merged.seconds_per_request == 3.0
+    assert merged.stage_timings == {"selection": 2.0}
+    assert merged.summary_lines()[3] == (
+        "Estimated E-Link request time over all runs: 6.0 seconds"
+    )
+    assert ShardCoordinator.missing_shards(list(store.query())) == [2]
+    assert coordinator.merge("other run") is None
@@ -0,0 +1,111 @@
+import datetime
+
+import pytest
+from maggma.stores import MemoryStore
+from mpcite.status import DOIStatusSummary, summary_lines
+
+NOW = datetime.datetime(2024, 1, 1)
+
+
+def record(mp_id: str, status: str, days_ago: int, error=None) -> dict:
+    return {
+        "material_id": mp_id,
+        "status": status,
+        "valid": status == "COMPLETED",
+        "last_updated": NOW - datetime.timedelta(days=days_ago),
+        "error": error,
+    }
+
+
+@pytest.fixture
+def stores():
+    doi_store = MemoryStore(key="material_id")
+    summary_store = MemoryStore(key="summary_id")
+    doi_store.connect()
+    summary_store.connect()
+    return doi_store, summary_store
+
+
+def write(doi_store, summary: DOIStatusSummary, docs):
+    # what DOIBuilder.update_doi_store does
+    summary.write(doi_store._collection, docs)
+
+
+class InterleavedCollection:
+    """
+    Collection on which the write of another builder happens right before this
+    builder's next write
+    """
+
+    def __init__(self, collection, other_write):
+        self.collection = collection
+        self.other_write = other_write
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def bulk_write(self, *args, **kwargs):
+        if self.other_write is not None:
+            other_write, self.other_write = self.other_write, None
+            other_write()
+        return self.collection.bulk_write(*args, **kwargs)
+
+
+def test_incremental_summary_matches_rebuild(stores):
+    doi_store, summary_store = stores
+    summary = DOIStatusSummary(summary_store._collection, max_pending=2)
+    write(
+        doi_store,
+        summary,
+        [record(f"mp-{i}", "PENDING", days_ago=10 - i) for i in range(5)]
+        + [record("mp-5", "COMPLETED", days_ago=1)],
+    )
+    write(
+        doi_store,
+        summary,
+        [
+            record("mp-1", "COMPLETED", days_ago=0),
+            record("mp-2", "FAILURE", days_ago=0, error="E-Link rejected the title"),
+        ],
+    )
+    incremental = summary.read()
+    assert incremental["counts"] == {"PENDING": 3, "COMPLETED": 2, "FAILURE": 1}
+    assert incremental["total"] == 6
+    assert incremental["invalid"] == 4
+    # mp-1 left the list and the next oldest is only known after a rebuild
+    assert [e["material_id"] for e in incremental["oldest_pending"]] == ["mp-0"]
+    assert [e["error"] for e in incremental["recent_failures"]] == [
+        "E-Link rejected the title"
+    ]
+
+    rebuilt = summary.rebuild(doi_store._collection)
+    for field in ("counts", "total", "invalid", "recent_failures"):
+        assert rebuilt[field] == incremental[field]
+    assert [e["material_id"] for e in rebuilt["oldest_pending"]] == ["mp-0", "mp-3"]
+    assert "  mp-3 since 2023-12-25" in summary_lines(summary.read())
+
+
+def test_no_summary_yet(stores):
+    _, summary_store = stores
+    summary = DOIStatusSummary(summary_store._collection).read()
+    assert summary is None
+    assert len(summary_lines(summary)) == 1
+
+
+def test_concurrent_writers(stores):
+    doi_store, summary_store = stores
+    summary = DOIStatusSummary(summary_store._collection)
+    write(doi_store, summary, [record("mp-0", "PENDING", days_ago=1)])
+    # another builder fails mp-0 while this one completes it
+    collection = InterleavedCollection(
+        doi_store._collection,
+        lambda: write(
+            doi_store, summary, [record("mp-0", "FAILURE", days_ago=0, error="")]
+        ),
+    )
+    summary.write(collection, [record("mp-0", "COMPLETED", days_ago=0)])
+    assert doi_store.query_one()["status"] == "COMPLETED"
+    summary_doc = summary.read()
+    assert summary_doc["counts"] == {"PENDING": 0, "FAILURE": 0, "COMPLETED": 1}
+    assert (summary_doc["total"], summary_doc["invalid"]) == (1, 0)
+    assert summary_doc["recent_failures"] == []
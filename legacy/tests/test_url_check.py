@@ -0,0 +1,83 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from maggma.stores import MemoryStore
+from mpcite.url_check import URLChecker, is_reachable
+
+DELAY = 0.2
+
+
+class Handler(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_HEAD(self):
+        Handler.requests.append(self.path)
+        time.sleep(DELAY)
+        if self.path.endswith("/mp-0") or self.path.endswith("/mp-1"):
+            self.send_response(200)
+        elif self.path.endswith("/mp-busy"):
+            self.send_response(503)
+        elif self.path.endswith("/mp-forbidden"):
+            self.send_response(403)
+        else:
+            self.send_response(404)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def site():
+    Handler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/materials"
+    server.shutdown()
+    server.server_close()
+
+
+def test_is_reachable():
+    assert is_reachable(200) and is_reachable(301) and is_reachable(405)
+    assert is_reachable(404) is False
+    assert is_reachable(429) is None and is_reachable(503) is None
+    assert is_reachable(401) is None and is_reachable(403) is None
+
+
+def test_probes_concurrently_and_caches(site):
+    cache = MemoryStore(key="url")
+    cache.connect()
+    urls = [f"{site}/mp-{i}" for i in ("0", "1", "2", "busy", "forbidden")]
+    tic = time.perf_counter()
+    results = URLChecker(cache_store=cache).check(urls)
+    assert time.perf_counter() - tic < 2 * DELAY
+    assert results == dict(zip(urls, [True, True, False, None, None]))
+
+    # only the URLs without a definite answer are probed again
+    assert URLChecker(cache_store=cache).check(urls) == results
+    assert sorted(Handler.requests) == sorted(
+        ["/materials/mp-0", "/materials/mp-1", "/materials/mp-2"]
+        + ["/materials/mp-busy", "/materials/mp-forbidden"] * 2
+    )
+
+
+def test_connection_errors_are_unknown():
+    # nothing listens on port 9 of localhost
+    assert URLChecker(timeout=1.0).check(["http://127.0.0.1:9/mp-1"]) == {
+        "http://127.0.0.1:9/mp-1": None
+    }
+
+
+@pytest.mark.parametrize(
+    "builder_kwargs", [{"failures_store": True, "check_urls": True}]
+)
+def test_builder_keeps_unreachable_records_out(site, builder):
+    records = [
+        {"accession_num": f"mp-{i}", "site_url": f"{site}/mp-{i}"} for i in range(3)
+    ]
+    assert builder.filter_unreachable(records) == records[:2]
+    [failure] = builder.failure_index.query()
+    assert (failure.material_id, failure.category) == ("mp-2", "INVALID_URL")
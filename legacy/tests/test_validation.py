@@ -0,0 +1,55 @@
+import time
+
+import pytest
+from mpcite.models import ELinkGetResponseModel, FailureCategoryEnum
+from mpcite.validation import check_record, split_valid
+
+
+def record(mp_id: str = "mp-1", **fields) -> dict:
+    model = ELinkGetResponseModel(
+        osti_id=None,
+        title="Materials Data on Fe2O3 by Materials Project",
+        product_nos=mp_id,
+        accession_num=mp_id,
+        publication_date="01/31/2020",
+        site_url=ELinkGetResponseModel.get_site_url(mp_id=mp_id),
+        keywords="crystal structure; Fe2O3; Fe-O",
+        description="Fe2O3 is Corundum structured.",
+    )
+    return {**ELinkGetResponseModel.custom_to_dict(elink_record=model), **fields}
+
+
+@pytest.mark.parametrize(
+    "fields, category",
+    [
+        ({}, None),
+        ({"title": ""}, FailureCategoryEnum.MISSING_FIELD),
+        ({"description": "a" * 12001}, FailureCategoryEnum.ABSTRACT_TOO_LONG),
+        ({"site_url": "materialsproject.org/mp-1"}, FailureCategoryEnum.INVALID_URL),
+        ({"publication_date": "2020-01-31"}, FailureCategoryEnum.INVALID_FIELD),
+        ({"description": "Fe\x0bO"}, FailureCategoryEnum.ILLEGAL_CHARACTERS),
+    ],
+)
+def test_check_record(fields, category):
+    problem = check_record(record(**fields))
+    assert (None if problem is None else problem[0]) == category
+
+
+def test_split_valid_is_fast():
+    records = [record(f"mp-{i}") for i in range(10000)]
+    records[3]["description"] = "\x00"
+    tic = time.perf_counter()
+    valid, rejected = split_valid(records, fingerprints={"mp-3": "a"})
+    assert time.perf_counter() - tic < 1.0
+    assert len(valid) == 9999
+    assert [(f.material_id, f.fingerprint) for f in rejected] == [("mp-3", "a")]
+
+
+@pytest.mark.parametrize("builder_kwargs", [{"failures_store": True}])
+def test_rejected_records_go_to_failure_index(builder):
+    records = [record("mp-1"), record("mp-2", site_url="")]
+    assert builder.filter_invalid(records) == records[:1]
+    assert builder.report.records_rejected == 1
+    [failure] = builder.failure_index.query()
+    assert failure.material_id == "mp-2"
+    assert failure.category == FailureCategoryEnum.MISSING_FIELD
@@ -0,0 +1,169 @@
+import os
+import threading
+import time
+import uuid
+from typing import List, Optional
+
+import pytest
+from mpcite.watcher import MaterialsWatcher
+
+
+class FakeStream:
+    def __init__(self, changes: List[Optional[dict]]):
+        self.changes = list(changes)
+        self.resume_token: Optional[dict] = None
+
+    @property
+    def alive(self) -> bool:
+        return len(self.changes) > 0
+
+    def try_next(self) -> Optional[dict]:
+        change = self.changes.pop(0)
+        if change is not None:
+            self.resume_token = {"_data": change["fullDocument"]["task_id"]}
+        return change
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class FakeCollection:
+    def __init__(self, stream: FakeStream):
+        self.stream = stream
+        self.watch_kwargs = dict()
+
+    def watch(self, **kwargs):
+        self.watch_kwargs = kwargs
+        return self.stream
+
+
+class FakeStore:
+    key = "task_id"
+
+    def __init__(self, collection: FakeCollection):
+        self.collection = collection
+
+
+class FakeClients:
+    def collection(self, store: FakeStore) -> FakeCollection:
+        return store.collection
+
+
+class FakeBuilder:
+    def __init__(self, changes: List[Optional[dict]], failures: int = 0):
+        self.materials_store = FakeStore(FakeCollection(FakeStream(changes)))
+        self.clients = FakeClients()
+        self.submitted: List[List[str]] = []
+        self.failures = failures
+        self.has_error = False
+
+    def process_item(self, mp_id: str) -> dict:
+        return {"mp_id": mp_id}
+
+    def submit_items(self, items: List[dict]):
+        if self.failures > 0:
+            self.failures -= 1
+            raise ConnectionError("E-Link is down")
+        self.submitted.append([item["mp_id"] for item in items])
+
+    def log_info_msg(self, msg: str):
+        pass
+
+    def log_err_msg(self, msg: str):
+        pass
+
+
+def change(mp_id: str) -> dict:
+    return {"operationType": "insert", "fullDocument": {"task_id": mp_id}}
+
+
+def test_batches_by_size(tmp_path):
+    changes = [change("mp-1"), change("mp-1"), change("mp-2"), change("mp-3"), None]
+    builder = FakeBuilder(changes)
+    token_path = tmp_path / "resume_token.json"
+    watcher = MaterialsWatcher(
+        builder, batch_size=2, max_wait=3600.0, resume_token_path=str(token_path)
+    )
+    watcher.run()
+    # mp-3 never fills its batch nor reaches its deadline before the stream closes
+    assert builder.submitted == [["mp-1", "mp-2"]]
+    assert MaterialsWatcher(builder, resume_token_path=str(token_path)).resume_token == {
+        "_data": "mp-2"
+    }
+
+
+def test_flushes_after_max_wait():
+    builder = FakeBuilder([change("mp-1"), None, None])
+    watcher = MaterialsWatcher(builder, batch_size=100, max_wait=0.0)
+    watcher.run(max_batches=1)
+    assert builder.submitted == [["mp-1"]]
+    assert builder.materials_store.collection.watch_kwargs["resume_after"] is None
+
+
+def test_failed_batch_is_kept_and_not_checkpointed(tmp_path):
+    builder = FakeBuilder([change("mp-1"), change("mp-2"), None], failures=1)
+    token_path = tmp_path / "resume_token.json"
+    watcher = MaterialsWatcher(
+        builder, batch_size=1, max_wait=0.0, resume_token_path=str(token_path)
+    )
+    watcher.run(max_batches=1)
+    assert builder.has_error
+    # mp-1 is submitted again, with mp-2 that arrived after the failure
+    assert builder.submitted == [["mp-1", "mp-2"]]
+    assert watcher.resume_token == {"_data": "mp-2"}
+
+
+def test_fails_without_checkpoint_on_error(tmp_path):
+    builder = FakeBuilder([change("mp-1")], failures=1)
+    token_path = tmp_path / "resume_token.json"
+    watcher = MaterialsWatcher(
+        builder, batch_size=1, max_wait=3600.0, resume_token_path=str(token_path)
+    )
+    watcher.run()
+    assert builder.submitted == []
+    assert not token_path.exists()
+
+
+@pytest.mark.skipif(
+    os.environ.get("MONGODB_REPLSET_URI") is None,
+    reason="change streams need a replica set, set MONGODB_REPLSET_URI",
+)
+def test_watches_replica_set():
+    from maggma.stores import MongoStore
+    from mpcite.connections import MongoClientRegistry, store_from_dict
+
+    clients = MongoClientRegistry()
+    store = store_from_dict(
+        MongoStore(
+            database="mpcite_test",
+            collection_name=f"materials_{uuid.uuid4().hex}",
+            uri=os.environ["MONGODB_REPLSET_URI"],
+            key="task_id",
+        ).as_dict(),
+        clients,
+    )
+    builder = FakeBuilder([])
+    builder.materials_store = store
+    builder.clients = clients
+    watcher = MaterialsWatcher(builder, batch_size=1, max_wait=1.0)
+    thread = threading.Thread(
+        target=watcher.run, kwargs={"max_batches": 1}, daemon=True
+    )
+    thread.start()
+    try:
+        # until the stream is open and sees a core material
+        deadline = time.monotonic() + 30
+        while thread.is_alive() and time.monotonic() < deadline:
+            store._collection.insert_one(
+                {"task_id": "mp-1", "sbxn": ["core"], "sbxd": [{"id": "core"}]}
+            )
+            thread.join(timeout=1.0)
+        assert not thread.is_alive()
+        assert builder.submitted[0] == ["mp-1"]
+        assert watcher.resume_token is not None
+    finally:
+        store._collection.drop()
+        clients.close()
@@ -0,0 +1,140 @@
+"""
+Asyncio access to the DOI state in Mongo.
+
+A sync alternates between waiting on OSTI and waiting on Mongo. With the blocking
+clients only one of them is in flight at a time; here both run on one event loop, so the
+DOI state of one batch is written while the next batches are still downloading.
+`AsyncMongoDOIStateStore` runs the indexes, writes and queries of
+`mp_cite.stores.MongoDOIStateStore` on pymongo's async API, and `sync_state` overlaps
+the downloads with the writes.
+
+elinkapi is blocking, so its calls are run in worker threads with `in_thread`, see
+`elink_fetch`.
+"""
+
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
+from functools import partial
+from typing import ParamSpec, TypeVar
+
+from elinkapi import Elink
+from pymongo import ASCENDING, AsyncMongoClient
+from pymongo.asynchronous.collection import AsyncCollection
+
+from mp_cite.stores import KEY, MongoDOIStateQueries, batches
+from mp_cite.sync import fetch_doi_state
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+
+class AsyncMongoDOIStateStore(MongoDOIStateQueries):
+    def __init__(self, collection: AsyncCollection):
+        self.collection = collection
+
+    @classmethod
+    def from_uri(
+        cls, uri: str, collection_name: str = "dois"
+    ) -> "AsyncMongoDOIStateStore":
+        """
+        Args:
+            uri: MongoDB connection string, including the database
+            collection_name: collection of the DOI state
+        """
+        return cls(AsyncMongoClient(uri).get_default_database()[collection_name])
+
+    async def ensure_indexes(self):
+        for keys, options in self.INDEXES:
+            await self.collection.create_index(keys, **options)
+
+    async def upsert(self, docs: Iterable[dict]) -> int:
+        operations = self.upserts(docs)
+        if operations:
+            await self.collection.bulk_write(operations, ordered=False)
+        return len(operations)
+
+    async def get_many(self, material_ids: Iterable[str]) -> dict[str, dict]:
+        cursor = self.collection.find(
+            {KEY: {"$in": list(material_ids)}}, self.PROJECTION
+        )
+        return {doc[KEY]: doc async for doc in cursor}
+
+    async def find(
+        self,
+        status: str | None = None,
+        valid: bool | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[dict]:
+        cursor = self.collection.find(
+            self.criteria(status, valid), self.PROJECTION
+        ).sort("last_updated", ASCENDING)
+        if limit is not None:
+            cursor = cursor.limit(limit)
+        async for doc in cursor:
+            yield doc
+
+    async def count(self, status: str | None = None, valid: bool | None = None) -> int:
+        return await self.collection.count_documents(self.criteria(status, valid))
+
+    async def counts(self) -> dict[str, int]:
+        cursor = await self.collection.aggregate(self.COUNTS_PIPELINE)
+        return {doc["_id"]: doc["count"] async for doc in cursor}
+
+
+def in_thread(function: Callable[P, T]) -> Callable[P, Awaitable[T]]:
+    """
+    Make a blocking function, e.g. an elinkapi call, awaitable by running it in a worker
+    thread
+    """
+
+    async def run(*args: P.args, **kwargs: P.kwargs) -> T:
+        return await asyncio.to_thread(function, *args, **kwargs)
+
+    return run
+
+
+def elink_fetch(elink: Elink) -> Callable[[list[str]], Awaitable[list[dict]]]:
+    """
+    Returns:
+        a fetch for sync_state, looking up the DOI state of a batch of materials in
+        E-Link on a worker thread, see mp_cite.sync.fetch_doi_state
+    """
+    return in_thread(partial(fetch_doi_state, elink))
+
+
+async def sync_state(
+    store: AsyncMongoDOIStateStore,
+    material_ids: Iterable[str],
+    fetch: Callable[[list[str]], Awaitable[list[dict]]],
+    batch_size: int = 500,
+    max_in_flight: int = 4,
+) -> int:
+    """
+    Download the DOI state of materials in batches and write it to the store as each
+    batch arrives
+
+    Args:
+        store: DOI state store
+        material_ids: materials to sync
+        fetch: coroutine function returning the DOI state documents of a batch of
+            materials, e.g. elink_fetch
+        batch_size: number of materials per batch
+        max_in_flight: maximum number of batches downloading at once
+
+    Returns:
+        number of documents written
+    """
+    downloads = asyncio.Semaphore(max_in_flight)
+
+    async def sync_batch(batch: list[str]) -> int:
+        async with downloads:
+            docs = await fetch(batch)
+        # the write does not hold a download slot, so the next download starts now
+        return await store.upsert(docs)
+
+    async with asyncio.TaskGroup() as group:
+        tasks = [
+            group.create_task(sync_batch(batch))
+            for batch in batches(material_ids, batch_size)
+        ]
+    return sum(task.result() for task in tasks)
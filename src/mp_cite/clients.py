@@ -0,0 +1,210 @@
+"""
+MongoClients shared by every collection on the same server, with pool metrics.
+
+A MongoClient holds a pool of connections and monitoring threads, so one client per
+collection multiplies the connections to a cluster that usually holds all of them.
+`MongoClients` keeps a single client per connection string and PoolOptions, created the
+first time a collection on it is used. Only the options that are set are passed to the
+client, so options in the connection string, e.g. ?maxPoolSize=20, apply otherwise.
+
+Every client reports to a PoolMetrics listener, which counts the open and checked out
+connections of each server, and how long checkouts waited for a free connection. When
+`in_use` stays at `max_pool_size` and checkouts wait, the pool is too small for the
+workers of this process; when open connections times the number of processes nears the
+connection limit of the cluster, there are too many workers.
+"""
+
+import importlib.util
+import logging
+import threading
+from dataclasses import asdict, dataclass
+
+from pymongo import MongoClient
+from pymongo.monitoring import (
+    ConnectionCheckedInEvent,
+    ConnectionCheckedOutEvent,
+    ConnectionCheckOutFailedEvent,
+    ConnectionClosedEvent,
+    ConnectionCreatedEvent,
+    ConnectionPoolListener,
+)
+
+logger = logging.getLogger(__name__)
+
+# python package each wire compressor needs, zlib is in the standard library
+COMPRESSOR_PACKAGES = {"zstd": "zstandard", "snappy": "snappy", "zlib": None}
+
+
+def available_compressors(compressors: tuple[str, ...]) -> tuple[str, ...]:
+    """
+    Returns:
+        the compressors whose package is installed, in order of preference
+    """
+    available = []
+    for compressor in compressors:
+        package = COMPRESSOR_PACKAGES[compressor]
+        if package is None or importlib.util.find_spec(package) is not None:
+            available.append(compressor)
+        else:
+            logger.warning(f"{package} is not installed, not using {compressor}")
+    return tuple(available)
+
+
+@dataclass(frozen=True)
+class PoolOptions:
+    """
+    Pool options of a client, None for the connection string's or pymongo's default
+    """
+
+    max_pool_size: int | None = None
+    read_preference: str | None = None
+    compressors: tuple[str, ...] | None = None
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "PoolOptions":
+        compressors = d.get("compressors")
+        return cls(
+            max_pool_size=d.get("max_pool_size"),
+            read_preference=d.get("read_preference"),
+            compressors=None if compressors is None else tuple(compressors),
+        )
+
+    def client_kwargs(self) -> dict:
+        """
+        Returns:
+            MongoClient keyword arguments of the options that are set
+        """
+        kwargs = {}
+        if self.max_pool_size is not None:
+            kwargs["maxPoolSize"] = self.max_pool_size
+        if self.read_preference is not None:
+            kwargs["readPreference"] = self.read_preference
+        if self.compressors is not None:
+            compressors = available_compressors(self.compressors)
+            if compressors:
+                kwargs["compressors"] = ",".join(compressors)
+        return kwargs
+
+
+@dataclass
+class PoolStats:
+    open: int = 0
+    in_use: int = 0
+    max_in_use: int = 0
+    created: int = 0
+    closed: int = 0
+    checkouts: int = 0
+    checkout_failures: int = 0
+    wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+
+
+class PoolMetrics(ConnectionPoolListener):
+    """
+    Connection pool usage of every server, from pymongo's connection pool events
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools: dict[str, PoolStats] = {}
+
+    def _stats(self, address: tuple) -> PoolStats:
+        key = f"{address[0]}:{address[1]}"
+        if key not in self._pools:
+            self._pools[key] = PoolStats()
+        return self._pools[key]
+
+    def snapshot(self) -> dict[str, dict]:
+        """
+        Returns:
+            host:port -> PoolStats as a dict
+        """
+        with self._lock:
+            return {address: asdict(stats) for address, stats in self._pools.items()}
+
+    def connection_created(self, event: ConnectionCreatedEvent):
+        with self._lock:
+            stats = self._stats(event.address)
+            stats.open += 1
+            stats.created += 1
+
+    def connection_closed(self, event: ConnectionClosedEvent):
+        with self._lock:
+            stats = self._stats(event.address)
+            stats.open -= 1
+            stats.closed += 1
+
+    def connection_checked_out(self, event: ConnectionCheckedOutEvent):
+        with self._lock:
+            stats = self._stats(event.address)
+            stats.in_use += 1
+            stats.max_in_use = max(stats.max_in_use, stats.in_use)
+            stats.checkouts += 1
+            if event.duration is not None:
+                stats.wait_seconds += event.duration
+                stats.max_wait_seconds = max(stats.max_wait_seconds, event.duration)
+
+    def connection_check_out_failed(self, event: ConnectionCheckOutFailedEvent):
+        with self._lock:
+            self._stats(event.address).checkout_failures += 1
+
+    def connection_checked_in(self, event: ConnectionCheckedInEvent):
+        with self._lock:
+            self._stats(event.address).in_use -= 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+
+class MongoClients:
+    def __init__(self):
+        self._clients: dict[tuple, MongoClient] = {}
+        self._lock = threading.Lock()
+        self.metrics = PoolMetrics()
+
+    def get(
+        self, uri: str, options: PoolOptions = PoolOptions(), **kwargs
+    ) -> MongoClient:
+        """
+        Args:
+            uri: connection string, or host name
+            options: pool options
+            kwargs: other MongoClient arguments, e.g. port and credentials
+
+        Returns:
+            the client of `uri` with a pool of `options`, created on first use
+        """
+        key = (uri, options, tuple(sorted((k, repr(v)) for k, v in kwargs.items())))
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._clients[key] = MongoClient(
+                    uri,
+                    event_listeners=[self.metrics],
+                    **{**kwargs, **options.client_kwargs()},
+                )
+            return client
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def close(self):
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients = {}
@@ -0,0 +1,311 @@
+"""
+Collection (dataset) records grouping the DOIs of many materials.
+
+Materials are grouped into collections by a grouping, e.g. by chemical system or by
+database release. Membership is kept in Mongo, one document per member, so it can be
+updated incrementally: `CollectionMembership.update` only writes members whose
+collection changed, and marks the collections they left or joined as dirty. Only dirty
+collections need to be regenerated, and a collection whose members change while it is
+regenerated stays dirty.
+
+Regenerating a collection streams its member DOIs from an index and serializes the
+related identifiers as they come, so a collection of 50k members never holds 50k
+validated models in memory at once.
+"""
+
+import json
+from collections.abc import Callable, Iterable, Iterator
+from datetime import date, datetime
+from typing import TextIO
+
+from elinkapi import Record, RelatedIdentifier
+from elinkapi.record import ProductType
+from pydantic import BaseModel, Field
+from pymongo import ASCENDING, UpdateOne
+from pymongo.collection import Collection
+
+MEMBERS_BATCH_SIZE = 10_000
+
+RELATION = RelatedIdentifier.Relation.Compiles
+
+
+def chemsys_key(material: dict) -> str | None:
+    return material.get("chemsys")
+
+
+def release_key(material: dict) -> str | None:
+    return material.get("release")
+
+
+GROUPINGS: dict[str, Callable[[dict], str | None]] = {
+    "chemsys": chemsys_key,
+    "release": release_key,
+}
+
+
+class CollectionSpec(BaseModel):
+    """
+    What a collection record says about itself, everything but its members
+    """
+
+    collection_id: str = Field(description="<grouping>:<key>, e.g. chemsys:Fe-O")
+    title: str
+    description: str = ""
+    site_url: str = "https://materialsproject.org/"
+    publication_date: date = Field(default_factory=date.today)
+    osti_id: int | None = None
+
+    def record_fields(self) -> dict:
+        fields = {
+            "product_type": ProductType.Dataset.value,
+            "title": self.title,
+            "description": self.description,
+            "site_url": self.site_url,
+            "publication_date": self.publication_date,
+        }
+        if self.osti_id is not None:
+            fields["osti_id"] = self.osti_id
+        return fields
+
+    @classmethod
+    def for_group(cls, grouping: str, key: str) -> "CollectionSpec":
+        return cls(
+            collection_id=f"{grouping}:{key}",
+            title=f"Materials Data on the {key} {grouping} by Materials Project",
+        )
+
+
+class CollectionMembership:
+    """
+    Members of every collection, one document per (grouping, material) in `members`, and
+    the state of every collection in `collections`
+    """
+
+    def __init__(self, members: Collection, collections: Collection):
+        self.members = members
+        self.collections = collections
+
+    def ensure_indexes(self):
+        self.members.create_index(
+            [("grouping", ASCENDING), ("material_id", ASCENDING)], unique=True
+        )
+        self.members.create_index(
+            [("collection_id", ASCENDING), ("material_id", ASCENDING)]
+        )
+        self.collections.create_index("collection_id", unique=True)
+        self.collections.create_index("dirty")
+
+    def update(self, grouping: str, materials: Iterable[dict]) -> set[str]:
+        """
+        Put materials in the collection of their group
+
+        Args:
+            grouping: name of the grouping, a key of GROUPINGS
+            materials: documents with material_id, doi and the fields the grouping
+                needs. Materials without a DOI or a group leave their collection.
+
+        Returns:
+            ids of the collections that changed
+        """
+        key_of = GROUPINGS[grouping]
+        wanted: dict[str, tuple[str | None, str | None]] = {}
+        for material in materials:
+            key = key_of(material)
+            doi = material.get("doi") or None
+            collection_id = f"{grouping}:{key}" if key and doi else None
+            wanted[material["material_id"]] = (collection_id, doi)
+        if not wanted:
+            return set()
+
+        current = {
+            doc["material_id"]: (doc["collection_id"], doc["doi"])
+            for doc in self.members.find(
+                {"grouping": grouping, "material_id": {"$in": list(wanted)}},
+                {"_id": 0, "material_id": 1, "collection_id": 1, "doi": 1},
+            )
+        }
+        operations = []
+        removed = []
+        changed: set[str] = set()
+        for material_id, (collection_id, doi) in wanted.items():
+            before = current.get(material_id, (None, None))
+            if before == (collection_id, doi):
+                continue
+            changed.update(c for c in (before[0], collection_id) if c is not None)
+            if collection_id is None:
+                removed.append(material_id)
+                continue
+            operations.append(
+                UpdateOne(
+                    {"grouping": grouping, "material_id": material_id},
+                    {"$set": {"collection_id": collection_id, "doi": doi}},
+                    upsert=True,
+                )
+            )
+        if operations:
+            self.members.bulk_write(operations, ordered=False)
+        if removed:
+            self.members.delete_many(
+                {"grouping": grouping, "material_id": {"$in": removed}}
+            )
+        self._mark_dirty(changed)
+        return changed
+
+    def dirty(self) -> list[str]:
+        """
+        Returns:
+            ids of the collections whose members changed since they were last generated
+        """
+        return self.collections.distinct("collection_id", {"dirty": True})
+
+    def member_dois(self, collection_id: str) -> Iterator[str]:
+        """
+        Stream the DOIs of the members of a collection, ordered by material_id
+        """
+        cursor = (
+            self.members.find({"collection_id": collection_id}, {"_id": 0, "doi": 1})
+            .sort("material_id", ASCENDING)
+            .batch_size(MEMBERS_BATCH_SIZE)
+        )
+        for doc in cursor:
+            yield doc["doi"]
+
+    def changes(self, collection_id: str) -> int:
+        """
+        Returns:
+            number of times the members of a collection changed, read before its members
+            are, so mark_generated can tell whether they changed meanwhile
+        """
+        doc = self.collections.find_one(
+            {"collection_id": collection_id}, {"_id": 0, "changes": 1}
+        )
+        return 0 if doc is None else doc.get("changes", 0)
+
+    def mark_generated(self, collection_id: str, member_count: int, changes: int):
+        """
+        Record that a collection was regenerated, and clear its dirty flag unless its
+        members changed after the regeneration started
+
+        Args:
+            collection_id: the collection
+            member_count: number of members written
+            changes: what `changes` returned before the members were read
+        """
+        self.collections.update_one(
+            {"collection_id": collection_id},
+            {"$set": {"member_count": member_count, "last_generated": datetime.now()}},
+            upsert=True,
+        )
+        self.collections.update_one(
+            {
+                "collection_id": collection_id,
+                # a collection that never changed has no counter yet
+                "changes": changes if changes > 0 else None,
+            },
+            {"$set": {"dirty": False}},
+        )
+
+    def _mark_dirty(self, collection_ids: Iterable[str]):
+        now = datetime.now()
+        operations = [
+            UpdateOne(
+                {"collection_id": collection_id},
+                {"$set": {"dirty": True, "last_changed": now}, "$inc": {"changes": 1}},
+                upsert=True,
+            )
+            for collection_id in collection_ids
+        ]
+        if operations:
+            self.collections.bulk_write(operations, ordered=False)
+
+
+def iter_related_identifiers(
+    dois: Iterable[str], relation: RelatedIdentifier.Relation = RELATION
+) -> Iterator[RelatedIdentifier]:
+    """
+    Related identifiers of member DOIs. The DOIs come from our own DOI store, so the
+    models are constructed without validation.
+    """
+    for doi in dois:
+        yield RelatedIdentifier.model_construct(
+            type=RelatedIdentifier.Type.DOI.value, relation=relation.value, value=doi
+        )
+
+
+def build_collection_record(spec: CollectionSpec, dois: Iterable[str]) -> Record:
+    """
+    Build the E-Link record of a collection, e.g. to submit it with elinkapi
+
+    Args:
+        spec: the collection
+        dois: DOIs of its members
+
+    Returns:
+        dataset record relating to every member DOI
+    """
+    return Record(
+        **spec.record_fields(),
+        related_identifiers=list(iter_related_identifiers(dois)),
+    )
+
+
+def iter_collection_json(
+    spec: CollectionSpec,
+    dois: Iterable[str],
+    relation: RelatedIdentifier.Relation = RELATION,
+) -> Iterator[str]:
+    """
+    Serialize the E-Link record of a collection to JSON piece by piece, writing the
+    related identifiers as the DOIs stream in
+
+    Args:
+        spec: the collection
+        dois: DOIs of its members
+        relation: relation of the collection to its members
+
+    Returns:
+        iterator of JSON fragments, which joined form the record
+    """
+    head = Record(**spec.record_fields()).model_dump_json(exclude_none=True)
+    yield head[:-1] + ', "related_identifiers": ['
+    prefix = (
+        f'{{"type": "{RelatedIdentifier.Type.DOI.value}", '
+        f'"relation": "{relation.value}", "value": '
+    )
+    first = True
+    for doi in dois:
+        yield ("" if first else ", ") + prefix + json.dumps(doi) + "}"
+        first = False
+    yield "]}"
+
+
+def regenerate(
+    membership: CollectionMembership, spec: CollectionSpec, out: TextIO
+) -> int:
+    """
+    Write the E-Link record of a collection from its current members, and mark it as
+    generated. A collection whose members change while it is written stays dirty.
+
+    Args:
+        membership: collection membership
+        spec: the collection
+        out: where the JSON record is written, e.g. a file or a request body buffer
+
+    Returns:
+        number of members
+    """
+    count = 0
+    changes = membership.changes(spec.collection_id)
+
+    def counted(dois: Iterable[str]) -> Iterator[str]:
+        nonlocal count
+        for doi in dois:
+            count += 1
+            yield doi
+
+    for fragment in iter_collection_json(
+        spec, counted(membership.member_dois(spec.collection_id))
+    ):
+        out.write(fragment)
+    membership.mark_generated(spec.collection_id, member_count=count, changes=changes)
+    return count
@@ -0,0 +1,148 @@
+"""
+Typed configuration of mp_cite.
+
+The configuration is validated when it is loaded, before anything connects: every
+collection names one of the `connections`, and every connection string is a MongoDB URI.
+Clients are only created when a collection is first used, one per connection string and
+pool options, so collections on the same cluster share a client and its connection pool.
+Pool usage is reported by `MPCiteSettings.pool_metrics`, see mp_cite.clients.
+
+Secrets do not have to be in the config file. `MPCiteSettings.load` reads the file named
+by MPCITE_CONFIG, and environment variables override parts of it:
+
+- MPCITE_ELINK_TOKEN: the E-Link API token
+- MPCITE_<NAME>_URI: the connection string of connection <NAME>, e.g. MPCITE_DEFAULT_URI
+"""
+
+import json
+import os
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Literal
+
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    Field,
+    PrivateAttr,
+    SecretStr,
+    field_validator,
+    model_validator,
+)
+from pymongo import MongoClient
+from pymongo.collection import Collection
+
+from mp_cite.clients import MongoClients, PoolOptions
+from mp_cite.stores import MongoDOIStateStore
+
+ENV_PREFIX = "MPCITE_"
+
+CollectionName = Literal["materials", "robocrys", "dois"]
+
+
+class MongoSettings(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    uri: SecretStr = SecretStr("mongodb://localhost:27017")
+    # None leaves the option to the connection string, or to pymongo's default
+    max_pool_size: int | None = Field(None, gt=0)
+    read_preference: (
+        Literal[
+            "primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest"
+        ]
+        | None
+    ) = None
+    compressors: tuple[Literal["zstd", "snappy", "zlib"], ...] | None = None
+
+    @field_validator("uri")
+    @classmethod
+    def check_scheme(cls, uri: SecretStr) -> SecretStr:
+        if not uri.get_secret_value().startswith(("mongodb://", "mongodb+srv://")):
+            raise ValueError("uri must start with mongodb:// or mongodb+srv://")
+        return uri
+
+    def pool_options(self) -> PoolOptions:
+        return PoolOptions(
+            max_pool_size=self.max_pool_size,
+            read_preference=self.read_preference,
+            compressors=self.compressors,
+        )
+
+
+class CollectionSettings(BaseModel):
+    connection: str = "default"
+    database: str
+    collection: str
+
+
+class ELinkSettings(BaseModel):
+    target: str = "https://review.osti.gov/elink2api/"
+    token: SecretStr
+
+
+class MPCiteSettings(BaseModel):
+    connections: dict[str, MongoSettings] = {"default": MongoSettings()}
+    materials: CollectionSettings
+    robocrys: CollectionSettings
+    dois: CollectionSettings
+    elink: ELinkSettings | None = None
+
+    _clients: MongoClients = PrivateAttr(default_factory=MongoClients)
+
+    @model_validator(mode="after")
+    def check_connections(self) -> "MPCiteSettings":
+        for name in ("materials", "robocrys", "dois"):
+            connection = getattr(self, name).connection
+            if connection not in self.connections:
+                raise ValueError(f"{name} uses unknown connection {connection}")
+        return self
+
+    @classmethod
+    def load(
+        cls, path: str | Path | None = None, environ: Mapping[str, str] = os.environ
+    ) -> "MPCiteSettings":
+        """
+        Load the configuration from a JSON file and the environment
+
+        Args:
+            path: JSON configuration, defaults to the file named by MPCITE_CONFIG
+            environ: environment variables overriding the file, see the module docstring
+
+        Returns:
+            validated settings
+        """
+        if path is None:
+            path = environ.get(f"{ENV_PREFIX}CONFIG")
+        data = {} if path is None else json.loads(Path(path).read_text())
+        connections = data.setdefault("connections", {"default": {}})
+        for key, value in environ.items():
+            if not (key.startswith(ENV_PREFIX) and key.endswith("_URI")):
+                continue
+            name = key.removeprefix(ENV_PREFIX).removesuffix("_URI").lower()
+            connections.setdefault(name, {})["uri"] = value
+        if f"{ENV_PREFIX}ELINK_TOKEN" in environ:
+            data.setdefault("elink", {})["token"] = environ[f"{ENV_PREFIX}ELINK_TOKEN"]
+        return cls.model_validate(data)
+
+    def client(self, connection: str = "default") -> MongoClient:
+        settings = self.connections[connection]
+        return self._clients.get(
+            settings.uri.get_secret_value(), settings.pool_options()
+        )
+
+    def collection(self, name: CollectionName) -> Collection:
+        settings: CollectionSettings = getattr(self, name)
+        return self.client(settings.connection)[settings.database][settings.collection]
+
+    def doi_state_store(self) -> MongoDOIStateStore:
+        return MongoDOIStateStore(self.collection("dois"))
+
+    def pool_metrics(self) -> dict[str, dict]:
+        """
+        Returns:
+            host:port -> connection pool usage, see mp_cite.clients.PoolStats
+        """
+        return self._clients.metrics.snapshot()
+
+    def close(self):
+        self._clients.close()
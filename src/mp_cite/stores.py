@@ -0,0 +1,340 @@
+"""
+Stores of the DOI state, one document per material keyed by material_id.
+
+The DOI state is small and is read and written far more often than it changes shape, so
+it does not need a Mongo server: `SQLiteDOIStateStore` keeps it in a single file, with
+the fields that are queried on (status, valid, last_updated) in indexed columns and the
+rest of the document as JSON. Small deployments and CI can run full syncs against it,
+and its reads are local instead of round trips to a remote Mongo. `MongoDOIStateStore`
+is the same interface over a pymongo collection. mp_cite.sync fills either of them
+from E-Link.
+
+Both backends upsert in bulk with $set semantics: the fields of a document are merged
+into the stored document, fields that are not given are left as they are.
+"""
+
+import json
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import Iterable, Iterator
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+
+from pymongo import ASCENDING, MongoClient, UpdateOne
+from pymongo.collection import Collection
+
+KEY = "material_id"
+
+# material ids per statement, below the SQLite limit on host parameters
+SQLITE_BATCH_SIZE = 500
+
+
+def batches(items: Iterable, size: int) -> Iterator[list]:
+    """
+    Split items into lists of at most `size`
+    """
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class DOIStateStore(ABC):
+    """
+    DOI state of every material
+    """
+
+    @abstractmethod
+    def ensure_indexes(self): ...
+
+    @abstractmethod
+    def upsert(self, docs: Iterable[dict]) -> int:
+        """
+        Merge documents into the store, creating the ones that do not exist yet
+
+        Args:
+            docs: documents with a material_id
+
+        Returns:
+            number of documents written
+        """
+
+    @abstractmethod
+    def get_many(self, material_ids: Iterable[str]) -> dict[str, dict]:
+        """
+        Returns:
+            material_id -> document, for the materials that have one
+        """
+
+    @abstractmethod
+    def find(
+        self,
+        status: str | None = None,
+        valid: bool | None = None,
+        limit: int | None = None,
+    ) -> Iterator[dict]:
+        """
+        Documents in a status and/or of a validity, oldest last_updated first
+        """
+
+    @abstractmethod
+    def count(self, status: str | None = None, valid: bool | None = None) -> int: ...
+
+    @abstractmethod
+    def counts(self) -> dict[str, int]:
+        """
+        Returns:
+            status -> number of documents in that status
+        """
+
+    def get(self, material_id: str) -> dict | None:
+        return self.get_many([material_id]).get(material_id)
+
+    def close(self):
+        pass
+
+
+class MongoDOIStateQueries:
+    """
+    Indexes, writes and queries of the DOI state in a Mongo collection, shared by
+    MongoDOIStateStore and mp_cite.aio.AsyncMongoDOIStateStore
+    """
+
+    INDEXES: tuple[tuple[str | list, dict], ...] = (
+        (KEY, {"unique": True}),
+        ([("status", ASCENDING), ("last_updated", ASCENDING)], {}),
+        ([("valid", ASCENDING), ("last_updated", ASCENDING)], {}),
+    )
+    COUNTS_PIPELINE = [{"$group": {"_id": "$status", "count": {"$sum": 1}}}]
+    PROJECTION = {"_id": 0}
+
+    @staticmethod
+    def upserts(docs: Iterable[dict]) -> list[UpdateOne]:
+        """
+        Returns:
+            bulk write operations merging documents into the collection
+        """
+        return [UpdateOne({KEY: doc[KEY]}, {"$set": doc}, upsert=True) for doc in docs]
+
+    @staticmethod
+    def criteria(status: str | None, valid: bool | None) -> dict:
+        """
+        Returns:
+            query on status and/or validity, the fields that are None are not queried
+        """
+        criteria = {}
+        if status is not None:
+            criteria["status"] = status
+        if valid is not None:
+            criteria["valid"] = valid
+        return criteria
+
+
+class MongoDOIStateStore(MongoDOIStateQueries, DOIStateStore):
+    def __init__(self, collection: Collection):
+        self.collection = collection
+
+    @classmethod
+    def from_uri(cls, uri: str, collection_name: str = "dois") -> "MongoDOIStateStore":
+        """
+        Args:
+            uri: MongoDB connection string, including the database
+            collection_name: collection of the DOI state
+        """
+        return cls(MongoClient(uri).get_default_database()[collection_name])
+
+    def ensure_indexes(self):
+        for keys, options in self.INDEXES:
+            self.collection.create_index(keys, **options)
+
+    def upsert(self, docs: Iterable[dict]) -> int:
+        operations = self.upserts(docs)
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+        return len(operations)
+
+    def get_many(self, material_ids: Iterable[str]) -> dict[str, dict]:
+        return {
+            doc[KEY]: doc
+            for doc in self.collection.find(
+                {KEY: {"$in": list(material_ids)}}, self.PROJECTION
+            )
+        }
+
+    def find(
+        self,
+        status: str | None = None,
+        valid: bool | None = None,
+        limit: int | None = None,
+    ) -> Iterator[dict]:
+        cursor = self.collection.find(
+            self.criteria(status, valid), self.PROJECTION
+        ).sort("last_updated", ASCENDING)
+        if limit is not None:
+            cursor = cursor.limit(limit)
+        yield from cursor
+
+    def count(self, status: str | None = None, valid: bool | None = None) -> int:
+        return self.collection.count_documents(self.criteria(status, valid))
+
+    def counts(self) -> dict[str, int]:
+        return {
+            doc["_id"]: doc["count"]
+            for doc in self.collection.aggregate(self.COUNTS_PIPELINE)
+        }
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _decode(obj: dict):
+    if len(obj) == 1 and "$date" in obj:
+        return datetime.fromisoformat(obj["$date"])
+    return obj
+
+
+class SQLiteDOIStateStore(DOIStateStore):
+    """
+    DOI state in an SQLite file. Datetimes are kept as ISO strings, so they sort and
+    compare correctly as long as they are all naive or all in the same timezone.
+    """
+
+    def __init__(self, path: str | Path = ":memory:"):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        if self.path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS doi_state ("
+            " material_id TEXT PRIMARY KEY,"
+            " status TEXT,"
+            " valid INTEGER,"
+            " last_updated TEXT,"
+            " doc TEXT NOT NULL"
+            ")"
+        )
+
+    def ensure_indexes(self):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS doi_state_status"
+                " ON doi_state (status, last_updated)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS doi_state_valid"
+                " ON doi_state (valid, last_updated)"
+            )
+
+    def upsert(self, docs: Iterable[dict]) -> int:
+        written = 0
+        with self._lock, self._conn:
+            for batch in batches(docs, SQLITE_BATCH_SIZE):
+                # merge in the order given, a material may appear more than once
+                merged = self._get_many([doc[KEY] for doc in batch])
+                for doc in batch:
+                    merged[doc[KEY]] = {**merged.get(doc[KEY], {}), **doc}
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO doi_state"
+                    " (material_id, status, valid, last_updated, doc)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    [self._row(doc) for doc in merged.values()],
+                )
+                written += len(batch)
+        return written
+
+    def get_many(self, material_ids: Iterable[str]) -> dict[str, dict]:
+        with self._lock:
+            return self._get_many(material_ids)
+
+    def find(
+        self,
+        status: str | None = None,
+        valid: bool | None = None,
+        limit: int | None = None,
+    ) -> Iterator[dict]:
+        where, params = self._where(status, valid)
+        sql = f"SELECT doc FROM doi_state{where} ORDER BY last_updated"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        for (doc,) in rows:
+            yield json.loads(doc, object_hook=_decode)
+
+    def count(self, status: str | None = None, valid: bool | None = None) -> int:
+        where, params = self._where(status, valid)
+        with self._lock:
+            (n,) = self._conn.execute(
+                f"SELECT COUNT(*) FROM doi_state{where}", params
+            ).fetchone()
+        return n
+
+    def counts(self) -> dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM doi_state GROUP BY status"
+            ).fetchall()
+        return dict(rows)
+
+    def close(self):
+        self._conn.close()
+
+    def _get_many(self, material_ids: Iterable[str]) -> dict[str, dict]:
+        found = {}
+        for batch in batches(material_ids, SQLITE_BATCH_SIZE):
+            rows = self._conn.execute(
+                "SELECT material_id, doc FROM doi_state WHERE material_id IN"
+                f" ({', '.join('?' * len(batch))})",
+                batch,
+            )
+            for material_id, doc in rows:
+                found[material_id] = json.loads(doc, object_hook=_decode)
+        return found
+
+    @staticmethod
+    def _row(doc: dict) -> tuple:
+        last_updated = doc.get("last_updated")
+        valid = doc.get("valid")
+        return (
+            doc[KEY],
+            doc.get("status"),
+            None if valid is None else int(valid),
+            last_updated.isoformat()
+            if isinstance(last_updated, datetime)
+            else last_updated,
+            json.dumps(doc, default=_encode),
+        )
+
+    @staticmethod
+    def _where(status: str | None, valid: bool | None) -> tuple[str, list]:
+        clauses, params = [], []
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        if valid is not None:
+            clauses.append("valid = ?")
+            params.append(int(valid))
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+def open_doi_state_store(uri: str, collection_name: str = "dois") -> DOIStateStore:
+    """
+    Open the DOI state store at `uri`, e.g. sqlite:///var/lib/mpcite/dois.db,
+    sqlite://:memory: or mongodb://localhost:27017/mp_cite
+    """
+    if uri.startswith("sqlite://"):
+        path = uri.removeprefix("sqlite://")
+        store = SQLiteDOIStateStore(":memory:" if path in ("", ":memory:") else path)
+    elif uri.startswith(("mongodb://", "mongodb+srv://")):
+        store = MongoDOIStateStore.from_uri(uri, collection_name=collection_name)
+    else:
+        raise ValueError(f"Unsupported DOI state store {uri}")
+    store.ensure_indexes()
+    return store
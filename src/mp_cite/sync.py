@@ -0,0 +1,73 @@
+"""
+Sync of the DOI state of materials from E-Link into a DOIStateStore.
+
+E-Link keeps the record of every material under its material_id as `site_unique_id`.
+`fetch_doi_state` looks up the records of a batch of materials and turns each into a
+DOI state document, `sync_doi_state` writes them to a store batch by batch, so a sync
+works the same against SQLite as against Mongo. See mp_cite.aio.sync_state for the
+version that overlaps the downloads with the writes.
+"""
+
+from collections.abc import Iterable
+
+from elinkapi import Elink
+from elinkapi.record import RecordResponse
+
+from mp_cite.stores import KEY, DOIStateStore, batches
+
+# E-Link workflow status -> DOI state status, every other workflow status is pending
+WORKFLOW_STATUSES = {"R": "COMPLETED", "SF": "FAILURE", "SX": "FAILURE"}
+
+
+def doi_state(record: RecordResponse) -> dict:
+    """
+    Returns:
+        the DOI state document of a material from its E-Link record
+    """
+    status = WORKFLOW_STATUSES.get(record.workflow_status, "PENDING")
+    return {
+        KEY: record.site_unique_id,
+        "doi": record.doi,
+        "osti_id": record.osti_id,
+        "status": status,
+        "valid": status == "COMPLETED",
+        "last_updated": record.date_metadata_updated,
+    }
+
+
+def fetch_doi_state(elink: Elink, material_ids: list[str]) -> list[dict]:
+    """
+    Look up the E-Link records of materials
+
+    Args:
+        elink: E-Link client
+        material_ids: materials to look up
+
+    Returns:
+        DOI state documents of the materials that have a record
+    """
+    return [
+        doi_state(record)
+        for material_id in material_ids
+        for record in elink.query_records(site_unique_id=material_id)
+        if record.site_unique_id == material_id
+    ]
+
+
+def sync_doi_state(
+    store: DOIStateStore,
+    elink: Elink,
+    material_ids: Iterable[str],
+    batch_size: int = 500,
+) -> int:
+    """
+    Download the DOI state of materials from E-Link and write it to the store, batch
+    by batch
+
+    Returns:
+        number of documents written
+    """
+    return sum(
+        store.upsert(fetch_doi_state(elink, batch))
+        for batch in batches(material_ids, batch_size)
+    )
@@ -0,0 +1,117 @@
+import asyncio
+import time
+
+import mongomock_ng
+
+from mp_cite.aio import AsyncMongoDOIStateStore, elink_fetch, in_thread, sync_state
+
+DELAY = 0.05
+
+
+class SlowStore:
+    """Stands in for AsyncMongoDOIStateStore, with a write as slow as a download"""
+
+    def __init__(self):
+        self.docs = {}
+
+    async def upsert(self, docs):
+        await asyncio.sleep(DELAY)
+        self.docs.update((doc["material_id"], doc) for doc in docs)
+        return len(docs)
+
+
+def blocking_fetch(material_ids: list[str]) -> list[dict]:
+    time.sleep(DELAY)
+    return [{"material_id": m, "status": "COMPLETED"} for m in material_ids]
+
+
+def test_downloads_overlap_writes():
+    store = SlowStore()
+    material_ids = [f"mp-{i}" for i in range(80)]
+    tic = time.perf_counter()
+    written = asyncio.run(
+        sync_state(store, material_ids, in_thread(blocking_fetch), batch_size=10)
+    )
+    elapsed = time.perf_counter() - tic
+    assert written == 80
+    assert sorted(store.docs) == sorted(material_ids)
+    # 8 downloads and 8 writes one after the other would take 16 delays
+    assert elapsed < 8 * DELAY
+
+
+class MockAsyncCursor:
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def sort(self, *args):
+        self.cursor = self.cursor.sort(*args)
+        return self
+
+    def limit(self, limit: int):
+        self.cursor = self.cursor.limit(limit)
+        return self
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.cursor)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class MockAsyncCollection:
+    """pymongo's AsyncCollection API over a mongomock-ng collection"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def create_index(self, keys, **kwargs):
+        return self.collection.create_index(keys, **kwargs)
+
+    async def bulk_write(self, operations, ordered=True):
+        return self.collection.bulk_write(operations, ordered=ordered)
+
+    def find(self, *args):
+        return MockAsyncCursor(self.collection.find(*args))
+
+    async def count_documents(self, criteria):
+        return self.collection.count_documents(criteria)
+
+    async def aggregate(self, pipeline):
+        return MockAsyncCursor(self.collection.aggregate(pipeline))
+
+
+def test_async_store_syncs_from_elink(fake_elink):
+    collection = mongomock_ng.MongoClient().db.dois
+    store = AsyncMongoDOIStateStore(MockAsyncCollection(collection))
+    for i in range(6):
+        fake_elink.add(i, "R" if i % 2 == 0 else "SO")
+
+    async def sync_and_read():
+        await store.ensure_indexes()
+        material_ids = [f"mp-{i}" for i in range(8)]
+        written = await sync_state(
+            store, material_ids, elink_fetch(fake_elink), batch_size=3
+        )
+        await store.upsert([{"material_id": "mp-1", "status": "FAILURE"}])
+        pending = [doc async for doc in store.find(status="PENDING", limit=1)]
+        return (
+            written,
+            pending,
+            await store.get_many(["mp-1", "mp-7"]),
+            await store.count(valid=True),
+            await store.counts(),
+        )
+
+    written, pending, found, valid, counts = asyncio.run(sync_and_read())
+    assert written == 6
+    assert [doc["status"] for doc in pending] == ["PENDING"]
+    assert "_id" not in pending[0]
+    # the upsert merged into the synced document
+    assert found["mp-1"]["doi"] == "10.17188/1001"
+    assert set(found) == {"mp-1"}
+    assert valid == 3
+    assert counts == {"COMPLETED": 3, "PENDING": 2, "FAILURE": 1}
+    assert "material_id_1" in collection.index_information()
@@ -0,0 +1,71 @@
+from pymongo.monitoring import (
+    ConnectionCheckedInEvent,
+    ConnectionCheckedOutEvent,
+    ConnectionCreatedEvent,
+)
+
+from mp_cite.clients import MongoClients, PoolMetrics, PoolOptions
+from mp_cite.config import MPCiteSettings
+
+ADDRESS = ("localhost", 27017)
+
+
+def test_clients_are_pooled_by_uri_and_options():
+    clients = MongoClients()
+    uri = "mongodb://localhost:27017"
+    small = PoolOptions(max_pool_size=5, read_preference="secondaryPreferred")
+    assert clients.get(uri) is clients.get(uri)
+    client = clients.get(uri, small)
+    assert client is not clients.get(uri)
+    assert len(clients) == 2
+    assert client.options.pool_options.max_pool_size == 5
+    assert client.read_preference.mongos_mode == "secondaryPreferred"
+    clients.close()
+
+
+def test_uri_options_apply_unless_set():
+    assert PoolOptions().client_kwargs() == {}
+    clients = MongoClients()
+    uri = "mongodb://localhost:27017/?maxPoolSize=7&readPreference=secondary"
+    client = clients.get(uri)
+    assert client.options.pool_options.max_pool_size == 7
+    assert client.read_preference.mongos_mode == "secondary"
+    client = clients.get(uri, PoolOptions(max_pool_size=3))
+    assert client.options.pool_options.max_pool_size == 3
+    assert client.read_preference.mongos_mode == "secondary"
+    clients.close()
+
+
+def test_compressors_are_passed_when_available():
+    options = PoolOptions(compressors=("zlib",))
+    assert options.client_kwargs()["compressors"] == "zlib"
+
+
+def test_pool_metrics():
+    metrics = PoolMetrics()
+    for i in range(3):
+        metrics.connection_created(ConnectionCreatedEvent(ADDRESS, i))
+        metrics.connection_checked_out(ConnectionCheckedOutEvent(ADDRESS, i, 0.01 * i))
+    metrics.connection_checked_in(ConnectionCheckedInEvent(ADDRESS, 0))
+    stats = metrics.snapshot()["localhost:27017"]
+    assert (stats["open"], stats["in_use"], stats["max_in_use"]) == (3, 2, 3)
+    assert stats["max_wait_seconds"] == 0.02
+
+
+def test_settings_share_pools():
+    collection = {"database": "mp_core", "collection": "materials"}
+    settings = MPCiteSettings.model_validate(
+        {
+            "connections": {
+                "default": {"max_pool_size": 20, "compressors": ["zlib"]},
+            },
+            "materials": collection,
+            "robocrys": collection,
+            "dois": collection,
+        }
+    )
+    client = settings.client()
+    assert client.options.pool_options.max_pool_size == 20
+    assert settings.collection("dois").database.client is client
+    assert settings.pool_metrics() == {}
+    settings.close()
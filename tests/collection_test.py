@@ -0,0 +1,93 @@
+import io
+import json
+
+import mongomock_ng
+import pytest
+from elinkapi import Record
+
+from mp_cite.collection import (
+    CollectionMembership,
+    CollectionSpec,
+    build_collection_record,
+    iter_collection_json,
+    regenerate,
+)
+
+
+@pytest.fixture
+def membership():
+    db = mongomock_ng.MongoClient().db
+    membership = CollectionMembership(db.collection_members, db.collections)
+    membership.ensure_indexes()
+    return membership
+
+
+def materials(n: int, chemsys: str = "Fe-O") -> list[dict]:
+    return [
+        {"material_id": f"mp-{i}", "doi": f"10.17188/{i}", "chemsys": chemsys}
+        for i in range(n)
+    ]
+
+
+def test_streamed_json_matches_record():
+    spec = CollectionSpec.for_group("chemsys", "Fe-O")
+    dois = [f"10.17188/{i}" for i in range(3)]
+    streamed = json.loads("".join(iter_collection_json(spec, dois)))
+    record = build_collection_record(spec, dois)
+    assert streamed == json.loads(record.model_dump_json(exclude_none=True))
+    assert Record.model_validate(streamed).related_identifiers[2].value == dois[2]
+
+
+def test_incremental_membership(membership):
+    assert membership.update("chemsys", materials(3)) == {"chemsys:Fe-O"}
+    assert membership.dirty() == ["chemsys:Fe-O"]
+    spec = CollectionSpec.for_group("chemsys", "Fe-O")
+    assert regenerate(membership, spec, io.StringIO()) == 3
+    assert membership.dirty() == []
+
+    # nothing changed
+    assert membership.update("chemsys", materials(3)) == set()
+    # mp-2 moves to another collection, mp-1 lost its DOI
+    changed = membership.update(
+        "chemsys",
+        [
+            {"material_id": "mp-2", "doi": "10.17188/2", "chemsys": "Fe-O-Si"},
+            {"material_id": "mp-1", "doi": "", "chemsys": "Fe-O"},
+        ],
+    )
+    assert changed == {"chemsys:Fe-O", "chemsys:Fe-O-Si"}
+    assert list(membership.member_dois("chemsys:Fe-O")) == ["10.17188/0"]
+
+
+class ChangingOutput(io.StringIO):
+    """
+    Output during whose first write the members of the collection change
+    """
+
+    def __init__(self, change):
+        super().__init__()
+        self.change = change
+
+    def write(self, fragment: str) -> int:
+        if self.change is not None:
+            change, self.change = self.change, None
+            change()
+        return super().write(fragment)
+
+
+def test_change_during_regeneration_keeps_collection_dirty(membership):
+    membership.update("chemsys", materials(2))
+    spec = CollectionSpec.for_group("chemsys", "Fe-O")
+    out = ChangingOutput(lambda: membership.update("chemsys", materials(3)))
+    regenerate(membership, spec, out)
+    assert membership.dirty() == ["chemsys:Fe-O"]
+    assert regenerate(membership, spec, io.StringIO()) == 3
+    assert membership.dirty() == []
+
+
+def test_serialize_large_collection():
+    dois = (f"10.17188/{i}" for i in range(50_000))
+    serialized = "".join(
+        iter_collection_json(CollectionSpec.for_group("chemsys", "Fe-O"), dois)
+    )
+    assert len(json.loads(serialized)["related_identifiers"]) == 50_000
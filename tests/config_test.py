@@ -0,0 +1,64 @@
+import json
+
+import pytest
+from pydantic import ValidationError
+
+from mp_cite.config import MPCiteSettings
+
+COLLECTIONS = {
+    "materials": {"database": "mp_core", "collection": "materials"},
+    "robocrys": {"database": "mp_core", "collection": "robocrys"},
+    "dois": {"connection": "dois", "database": "mp_cite", "collection": "dois"},
+}
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    path = tmp_path / "mp_cite.json"
+    path.write_text(
+        json.dumps(
+            {
+                "connections": {
+                    "default": {"uri": "mongodb://localhost:27017"},
+                    "dois": {"uri": "mongodb://localhost:27017"},
+                },
+                **COLLECTIONS,
+            }
+        )
+    )
+    return path
+
+
+def test_collections_share_a_client_per_uri(config_file):
+    settings = MPCiteSettings.load(config_file, environ={})
+    assert len(settings._clients) == 0
+    materials = settings.collection("materials")
+    dois = settings.collection("dois")
+    assert len(settings._clients) == 1
+    assert materials.database.client is dois.database.client
+    assert dois.full_name == "mp_cite.dois"
+    settings.close()
+
+
+def test_environment_overrides_file(config_file):
+    settings = MPCiteSettings.load(
+        environ={
+            "MPCITE_CONFIG": str(config_file),
+            "MPCITE_DOIS_URI": "mongodb://dois.example.org:27017",
+            "MPCITE_ELINK_TOKEN": "secret",
+        }
+    )
+    assert settings.connections["dois"].uri.get_secret_value().startswith(
+        "mongodb://dois."
+    )
+    assert settings.elink.token.get_secret_value() == "secret"
+    assert "secret" not in repr(settings)
+
+
+def test_invalid_config_fails_on_load():
+    with pytest.raises(ValidationError, match="unknown connection"):
+        MPCiteSettings.model_validate(COLLECTIONS)
+    with pytest.raises(ValidationError, match="mongodb://"):
+        MPCiteSettings.model_validate(
+            {"connections": {"default": {"uri": "localhost:27017"}}, **COLLECTIONS}
+        )
@@ -1,7 +1,9 @@
 import os
+from datetime import datetime
 
 import pytest
 from elinkapi import Elink
+from elinkapi.record import RecordResponse
 
 
 @pytest.fixture
@@ -9,3 +11,34 @@ def elink_review_client():
     review_endpoint = os.getenv("ELINK_REVIEW_ENDPOINT")
     elink_review_api_key = os.getenv("ELINK_REVIEW_API_TOKEN")
     return Elink(token=elink_review_api_key, target=review_endpoint)
+
+
+class FakeElink:
+    """Stands in for elinkapi.Elink, with the records E-Link holds"""
+
+    UPDATED = datetime(2024, 1, 1)
+
+    def __init__(self):
+        self.records: dict[str, RecordResponse] = {}
+        self.queries = []
+
+    def add(self, i: int, workflow_status: str):
+        self.records[f"mp-{i}"] = RecordResponse(
+            osti_id=1000 + i,
+            doi=f"10.17188/{1000 + i}",
+            site_unique_id=f"mp-{i}",
+            workflow_status=workflow_status,
+            product_type="DA",
+            title=f"Materials Data on mp-{i} by Materials Project",
+            date_metadata_updated=self.UPDATED,
+        )
+
+    def query_records(self, **params):
+        self.queries.append(params)
+        record = self.records.get(params["site_unique_id"])
+        return [] if record is None else [record]
+
+
+@pytest.fixture
+def fake_elink():
+    return FakeElink()
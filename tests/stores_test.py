@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+import mongomock_ng
+import pytest
+
+from mp_cite.stores import (
+    MongoDOIStateStore,
+    SQLiteDOIStateStore,
+    open_doi_state_store,
+)
+
+NOW = datetime(2024, 1, 1)
+
+
+@pytest.fixture(params=["sqlite", "mongo"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        store = SQLiteDOIStateStore(tmp_path / "dois.db")
+    else:
+        store = MongoDOIStateStore(mongomock_ng.MongoClient().db.dois)
+    store.ensure_indexes()
+    yield store
+    store.close()
+
+
+def record(i: int, status: str = "PENDING", valid: bool = False) -> dict:
+    return {
+        "material_id": f"mp-{i}",
+        "doi": f"10.17188/{i}",
+        "status": status,
+        "valid": valid,
+        "last_updated": NOW - timedelta(days=i),
+    }
+
+
+def test_bulk_upsert_and_queries(store):
+    assert store.upsert(record(i) for i in range(600)) == 600
+    # partial update, the doi is kept
+    store.upsert(
+        [
+            {"material_id": f"mp-{i}", "status": "COMPLETED", "valid": True}
+            for i in range(0, 600, 2)
+        ]
+    )
+    assert store.counts() == {"PENDING": 300, "COMPLETED": 300}
+    assert store.count(valid=True) == 300
+    assert store.count(status="PENDING", valid=True) == 0
+    assert store.get("mp-2") == {**record(2), "status": "COMPLETED", "valid": True}
+    oldest = list(store.find(status="PENDING", limit=2))
+    assert [doc["material_id"] for doc in oldest] == ["mp-599", "mp-597"]
+    assert oldest[0]["last_updated"] == NOW - timedelta(days=599)
+    assert set(store.get_many(["mp-1", "mp-5000"])) == {"mp-1"}
+
+
+def test_sqlite_state_persists(tmp_path):
+    uri = f"sqlite://{tmp_path / 'dois.db'}"
+    store = open_doi_state_store(uri)
+    store.upsert([record(1)])
+    store.close()
+    assert open_doi_state_store(uri).get("mp-1") == record(1)
@@ -0,0 +1,32 @@
+from mp_cite.stores import open_doi_state_store
+from mp_cite.sync import sync_doi_state
+
+
+def test_sync_into_sqlite(tmp_path, fake_elink):
+    uri = f"sqlite://{tmp_path / 'dois.db'}"
+    for i in range(5):
+        fake_elink.add(i, "R")
+    fake_elink.add(5, "SO")
+    fake_elink.add(6, "SF")
+    store = open_doi_state_store(uri)
+    material_ids = [f"mp-{i}" for i in range(8)]
+    assert sync_doi_state(store, fake_elink, material_ids, batch_size=3) == 7
+    store.close()
+    assert len(fake_elink.queries) == 8
+
+    store = open_doi_state_store(uri)
+    assert store.counts() == {"COMPLETED": 5, "PENDING": 1, "FAILURE": 1}
+    assert store.count(valid=False) == 2
+    assert store.get("mp-6") == {
+        "material_id": "mp-6",
+        "doi": "10.17188/1006",
+        "osti_id": 1006,
+        "status": "FAILURE",
+        "valid": False,
+        "last_updated": fake_elink.UPDATED,
+    }
+    assert store.get("mp-7") is None
+    # a later sync only changes what E-Link changed
+    fake_elink.add(5, "R")
+    sync_doi_state(store, fake_elink, ["mp-5"])
+    assert store.counts() == {"COMPLETED": 6, "FAILURE": 1}